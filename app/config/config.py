@@ -1,5 +1,6 @@
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -8,6 +9,9 @@ load_dotenv()
 # OpenAI API Key (required for transcription and analysis)
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# OpenAI-compatible API base URL (point at a local stand-in for load tests)
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+
 # You can add other configuration variables here as needed
 # For example:
 # GROQ_API_KEY = os.getenv('GROQ_API_KEY')
@@ -19,7 +23,146 @@ if not OPENAI_API_KEY:
     print("   Please set your OpenAI API key in a .env file or as an environment variable")
     print("   Example: export OPENAI_API_KEY='your-api-key-here'")
 
+# Document conversion process pool
+CONVERSION_WORKERS = int(os.getenv('CONVERSION_WORKERS', os.cpu_count() or 2))  # 0 = convert in-process
+CONVERSION_TIMEOUT_SECONDS = float(os.getenv('CONVERSION_TIMEOUT_SECONDS', '120'))
+CONVERSION_MEMORY_LIMIT_MB = int(os.getenv('CONVERSION_MEMORY_LIMIT_MB', '2048'))  # 0 = unlimited
+# Workers are replaced after this many jobs (0 = never); ignored before Python 3.12,
+# where ProcessPoolExecutor stalls once it has replaced a worker
+CONVERSION_MAX_TASKS_PER_CHILD = int(os.getenv('CONVERSION_MAX_TASKS_PER_CHILD', '50'))
+
+# Converted-PDF cache (keyed by source bytes hash + converter version)
+CONVERSION_CACHE_DIR = os.getenv('CONVERSION_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'kelz_conversion_cache'))
+CONVERSION_CACHE_MAX_MB = int(os.getenv('CONVERSION_CACHE_MAX_MB', '512'))  # 0 = disabled
+
+# Per-request scratch workspaces
+WORKSPACE_ROOT = os.getenv('WORKSPACE_ROOT')  # defaults to <tempdir>/kelz_workspaces
+WORKSPACE_USE_TMPFS = os.getenv('WORKSPACE_USE_TMPFS', 'false').lower() in ('1', 'true', 'yes')
+WORKSPACE_QUOTA_MB = int(os.getenv('WORKSPACE_QUOTA_MB', '512'))  # uploads, converted PDFs and OCR chunks; 0 = unlimited
+WORKSPACE_STALE_SECONDS = int(os.getenv('WORKSPACE_STALE_SECONDS', '3600'))
+
+# Document AI endpoint override (e.g. http://127.0.0.1:9100 for a local stand-in; plain
+# http:// endpoints are called without Google credentials) and transport ('grpc' or 'rest')
+DOCUMENTAI_API_ENDPOINT = os.getenv('DOCUMENTAI_API_ENDPOINT')  # defaults to <location>-documentai.googleapis.com
+DOCUMENTAI_TRANSPORT = os.getenv('DOCUMENTAI_TRANSPORT', 'grpc')
+
+# Lazy service registry: build services in the background right after startup
+SERVICE_PRELOAD = os.getenv('SERVICE_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# Structured logging: level, output format ('json' or 'console') and the fraction of
+# debug/info events kept (warnings and errors are never sampled)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+
+# Request tracing: spans are exported as OTLP/JSON, one trace per line to TRACE_EXPORT_PATH
+# and/or POSTed to an OTLP/HTTP collector (e.g. http://otel-collector:4318/v1/traces)
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')
+OTLP_TRACES_ENDPOINT = os.getenv('OTLP_TRACES_ENDPOINT')
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'ai-analysis-api')
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# On-demand profiling: requests carrying this token (X-Profile-Token header or
+# ?profile_token=) are run under cProfile; unset disables profiling entirely
+PROFILING_ADMIN_TOKEN = os.getenv('PROFILING_ADMIN_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'kelz_profiles'))
+PROFILE_RETENTION = int(os.getenv('PROFILE_RETENTION', '50'))  # most recent profiles kept
+
+# LLM token accounting: usage is aggregated in memory and written to the
+# llm_usage table every TOKEN_USAGE_FLUSH_SECONDS (0 = only on shutdown)
+TOKEN_USAGE_FLUSH_SECONDS = float(os.getenv('TOKEN_USAGE_FLUSH_SECONDS', '60'))
+TOKEN_RATE_WINDOW_SECONDS = int(os.getenv('TOKEN_RATE_WINDOW_SECONDS', '300'))  # window for /usage/endpoints rates
+# Optional JSON overriding the per-model prices (USD per 1M tokens), e.g.
+# {"gpt-4.1": {"prompt": 2.0, "cached": 0.5, "completion": 8.0}}
+LLM_PRICING_JSON = os.getenv('LLM_PRICING_JSON')
+
+# Structured completions are requested up to this many times in total: a streamed one
+# is abandoned as soon as the partial JSON breaks the response schema, a blocking one
+# is re-asked only when local JSON repair could not make the answer valid
+STRUCTURED_OUTPUT_ATTEMPTS = int(os.getenv('STRUCTURED_OUTPUT_ATTEMPTS', '2'))
+
+# Final investigation report: 'single' asks for the whole report in one completion,
+# 'sections' generates independent sections concurrently and writes the conclusion last
+FINAL_REPORT_MODE = os.getenv('FINAL_REPORT_MODE', 'single').lower()
+# Threads for concurrent report-section calls, shared by all requests
+REPORT_SECTION_WORKERS = int(os.getenv('REPORT_SECTION_WORKERS', '12'))
+
+# Modify/repeat endpoints: a routing call picks the sections a change request affects
+# and only those are regenerated; the rest of the report is copied through unchanged
+SECTION_EDIT_ENABLED = os.getenv('SECTION_EDIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SECTION_EDIT_ROUTER_MODEL = os.getenv('SECTION_EDIT_ROUTER_MODEL', 'gpt-4.1-mini')
+
+# QTA final/repeat endpoints: 'full' has the model re-emit the revised document,
+# 'patch' asks for anchored paragraph edits that are applied to the original locally
+QTA_DOCUMENT_OUTPUT = os.getenv('QTA_DOCUMENT_OUTPUT', 'full').lower()
+# Documents at least this long (characters) are revised part by part concurrently,
+# split at their headings into parts of about QTA_SECTION_CHARS; 0 disables
+QTA_SECTION_REVISION_MIN_CHARS = int(os.getenv('QTA_SECTION_REVISION_MIN_CHARS', '24000'))
+QTA_SECTION_CHARS = int(os.getenv('QTA_SECTION_CHARS', '6000'))
+
+# QTA review prompts carry only the regions where the reference document differs from
+# the original (plus context lines) instead of the whole reference, unless that diff
+# would exceed QTA_REFERENCE_DIFF_MAX_SHARE of the reference (unrelated documents)
+QTA_REFERENCE_DIFF = os.getenv('QTA_REFERENCE_DIFF', 'true').lower() in ('1', 'true', 'yes')
+QTA_REFERENCE_DIFF_CONTEXT_LINES = int(os.getenv('QTA_REFERENCE_DIFF_CONTEXT_LINES', '2'))
+QTA_REFERENCE_DIFF_MAX_SHARE = float(os.getenv('QTA_REFERENCE_DIFF_MAX_SHARE', '0.6'))
+
+# Upload-once document store (/documents): text is extracted in the background on
+# DOCUMENT_EXTRACTION_WORKERS threads and documents unused for DOCUMENT_TTL_SECONDS are dropped.
+# Records live in DOCUMENT_STORE_DIR so every worker sharing it resolves the same
+# document ids; with workers on several hosts/pods point it at a shared volume
+DOCUMENT_STORE_DIR = os.getenv('DOCUMENT_STORE_DIR', os.path.join(tempfile.gettempdir(), 'kelz_documents'))
+DOCUMENT_EXTRACTION_WORKERS = int(os.getenv('DOCUMENT_EXTRACTION_WORKERS', '4'))
+DOCUMENT_TTL_SECONDS = int(os.getenv('DOCUMENT_TTL_SECONDS', '14400'))  # 0 = keep until deleted
+# How long a request referencing a document that is still being extracted waits for it
+# (QTA final review) before answering 409; 0 = wait until the extraction finishes
+DOCUMENT_WAIT_TIMEOUT_SECONDS = float(os.getenv('DOCUMENT_WAIT_TIMEOUT_SECONDS', '300'))
+
 class Settings:
     OPENAI_API_KEY = OPENAI_API_KEY
+    OPENAI_BASE_URL = OPENAI_BASE_URL
+    CONVERSION_WORKERS = CONVERSION_WORKERS
+    CONVERSION_TIMEOUT_SECONDS = CONVERSION_TIMEOUT_SECONDS
+    CONVERSION_MEMORY_LIMIT_MB = CONVERSION_MEMORY_LIMIT_MB
+    CONVERSION_MAX_TASKS_PER_CHILD = CONVERSION_MAX_TASKS_PER_CHILD
+    CONVERSION_CACHE_DIR = CONVERSION_CACHE_DIR
+    CONVERSION_CACHE_MAX_MB = CONVERSION_CACHE_MAX_MB
+    WORKSPACE_ROOT = WORKSPACE_ROOT
+    WORKSPACE_USE_TMPFS = WORKSPACE_USE_TMPFS
+    WORKSPACE_QUOTA_MB = WORKSPACE_QUOTA_MB
+    WORKSPACE_STALE_SECONDS = WORKSPACE_STALE_SECONDS
+    DOCUMENTAI_API_ENDPOINT = DOCUMENTAI_API_ENDPOINT
+    DOCUMENTAI_TRANSPORT = DOCUMENTAI_TRANSPORT
+    SERVICE_PRELOAD = SERVICE_PRELOAD
+    LOG_LEVEL = LOG_LEVEL
+    LOG_FORMAT = LOG_FORMAT
+    LOG_SAMPLE_RATE = LOG_SAMPLE_RATE
+    TRACING_ENABLED = TRACING_ENABLED
+    TRACE_EXPORT_PATH = TRACE_EXPORT_PATH
+    OTLP_TRACES_ENDPOINT = OTLP_TRACES_ENDPOINT
+    TRACE_SERVICE_NAME = TRACE_SERVICE_NAME
+    SERVER_TIMING_ENABLED = SERVER_TIMING_ENABLED
+    PROFILING_ADMIN_TOKEN = PROFILING_ADMIN_TOKEN
+    PROFILE_DIR = PROFILE_DIR
+    PROFILE_RETENTION = PROFILE_RETENTION
+    TOKEN_USAGE_FLUSH_SECONDS = TOKEN_USAGE_FLUSH_SECONDS
+    TOKEN_RATE_WINDOW_SECONDS = TOKEN_RATE_WINDOW_SECONDS
+    LLM_PRICING_JSON = LLM_PRICING_JSON
+    STRUCTURED_OUTPUT_ATTEMPTS = STRUCTURED_OUTPUT_ATTEMPTS
+    FINAL_REPORT_MODE = FINAL_REPORT_MODE
+    REPORT_SECTION_WORKERS = REPORT_SECTION_WORKERS
+    SECTION_EDIT_ENABLED = SECTION_EDIT_ENABLED
+    SECTION_EDIT_ROUTER_MODEL = SECTION_EDIT_ROUTER_MODEL
+    QTA_DOCUMENT_OUTPUT = QTA_DOCUMENT_OUTPUT
+    QTA_SECTION_REVISION_MIN_CHARS = QTA_SECTION_REVISION_MIN_CHARS
+    QTA_SECTION_CHARS = QTA_SECTION_CHARS
+    QTA_REFERENCE_DIFF = QTA_REFERENCE_DIFF
+    QTA_REFERENCE_DIFF_CONTEXT_LINES = QTA_REFERENCE_DIFF_CONTEXT_LINES
+    QTA_REFERENCE_DIFF_MAX_SHARE = QTA_REFERENCE_DIFF_MAX_SHARE
+    DOCUMENT_STORE_DIR = DOCUMENT_STORE_DIR
+    DOCUMENT_EXTRACTION_WORKERS = DOCUMENT_EXTRACTION_WORKERS
+    DOCUMENT_TTL_SECONDS = DOCUMENT_TTL_SECONDS
+    DOCUMENT_WAIT_TIMEOUT_SECONDS = DOCUMENT_WAIT_TIMEOUT_SECONDS
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Structured Logging
+structlog configuration shared by every module. Events below LOG_LEVEL are
+dropped before any formatting happens, debug/info events can be sampled with
+LOG_SAMPLE_RATE, and rendered lines are handed to a background thread so
+request handlers never block on stdout.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+
+import structlog
+
+from app.config.config import LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE
+
+LOGGER_NAME = 'app'
+SAMPLED_LEVELS = ('debug', 'info')
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+
+
+def _sample(logger, method_name, event_dict):
+    """Keep LOG_SAMPLE_RATE of debug/info events; warnings and errors always pass"""
+    if LOG_SAMPLE_RATE < 1.0 and method_name in SAMPLED_LEVELS and random.random() >= LOG_SAMPLE_RATE:
+        raise structlog.DropEvent
+    return event_dict
+
+
+def _queued_stdlib_logger():
+    """A stdlib logger whose handler only enqueues; a listener thread does the writing"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    stdlib_logger = logging.getLogger(LOGGER_NAME)
+    stdlib_logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    stdlib_logger.setLevel(logging.DEBUG)  # level filtering happens in structlog
+    stdlib_logger.propagate = False
+    return stdlib_logger
+
+
+def configure_logging():
+    """Configure structlog once per process (safe to call repeatedly)"""
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if _configured:
+            return
+        level = logging.getLevelName(LOG_LEVEL)
+        if not isinstance(level, int):
+            level = logging.INFO
+        renderer = (
+            structlog.dev.ConsoleRenderer(colors=False) if LOG_FORMAT == 'console'
+            else structlog.processors.JSONRenderer()
+        )
+        stdlib_logger = _queued_stdlib_logger()
+        structlog.configure(
+            processors=[
+                _sample,
+                structlog.contextvars.merge_contextvars,
+                structlog.processors.add_log_level,
+                structlog.processors.TimeStamper(fmt='iso', utc=True),
+                structlog.processors.format_exc_info,
+                renderer,
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(level),
+            logger_factory=lambda *args: stdlib_logger,
+            cache_logger_on_first_use=True,
+        )
+        _configured = True
+
+
+def get_logger(name=None):
+    """Return a structlog logger bound to the component name"""
+    configure_logging()
+    logger = structlog.get_logger()
+    return logger.bind(component=name) if name else logger
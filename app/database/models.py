@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, Float, Integer, String
+
+from app.database.database_connection import Base
+
+
+class LLMUsage(Base):
+    """LLM token usage aggregated per flush window, endpoint, service method, meeting and model"""
+    __tablename__ = "llm_usage"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False, index=True)
+    route = Column(String(255), nullable=False, index=True)
+    service = Column(String(64), nullable=False)
+    method = Column(String(128), nullable=False)
+    meeting_id = Column(String(128), nullable=True, index=True)
+    model = Column(String(64), nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0.0)
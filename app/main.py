@@ -1,29 +1,63 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter
-from fastapi.responses import JSONResponse
-from app.services.utils.ai_analysis import AIAnalyzer
-from app.services.utils.transcription import VoiceTranscriber
-from app.services.utils.document_ocr import DocumentOCR
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, APIRouter, Request, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from contextlib import asynccontextmanager
+from app.config.config import SERVICE_PRELOAD
+from app.services.registry import registry, get_ai_analyzer, get_voice_transcriber, get_document_ocr
 from app.services.utils.document_ocr import router as ocr_router
+from app.services.utils.http_client import close_http_client, run_until_disconnected
+from app.services.utils.conversion_service import get_conversion_service
+from app.services.utils.document_store import document_entry, get_document_store, router as documents_router
+from app.services.utils.metrics import metrics_available, render_metrics
+from app.services.utils.profiling import ProfilingMiddleware, profiled, router as profiling_router
+from app.services.utils.tracing import TracingMiddleware
+from app.services.utils.usage import UsageContextMiddleware, get_token_accountant, router as usage_router
+from app.services.utils.workspace import Workspace, get_workspace_manager, request_workspace
+import asyncio
 import os
-import tempfile
 import shutil
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Remove scratch workspaces left behind by crashed workers
+    get_workspace_manager().purge_stale()
+    # Spawn conversion workers in the background so startup isn't delayed
+    conversion_service = get_conversion_service()
+    asyncio.get_running_loop().run_in_executor(None, conversion_service.warm_up)
+    # Services are created on first use; optionally build them now without blocking startup
+    if SERVICE_PRELOAD:
+        asyncio.get_running_loop().run_in_executor(None, registry.preload)
+    yield
+    # Release pooled outbound connections and worker processes on shutdown
+    await close_http_client()
+    conversion_service.shutdown(wait=False)
+    get_document_store().shutdown(wait=False)
+    # Persist token usage aggregated since the last periodic flush
+    await asyncio.to_thread(get_token_accountant().shutdown)
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Analysis API",
     description="API for AI-powered analysis of documents, audio, and text files",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Attribute LLM token usage to the route and X-Meeting-Id of each request
+app.add_middleware(UsageContextMiddleware)
+
+# On-demand cProfile of admin-flagged requests (added first so it runs inside
+# the tracing middleware and can store the profile under the trace id)
+app.add_middleware(ProfilingMiddleware)
+
+# Per-request trace id, nested stage spans and a Server-Timing response header
+app.add_middleware(TracingMiddleware)
+
 # Create main router
 router = APIRouter()
 
-# Initialize services
-ai_analyzer = AIAnalyzer()
-voice_transcriber = VoiceTranscriber()
-document_ocr = DocumentOCR()
-
 # Import and include routers
 from app.services.deviation.initiation.initiation_route import router as initiation_router
 
@@ -44,10 +78,13 @@ router.include_router(quality_review_router, prefix="/quality-review", tags=["re
 router.include_router(qta_revision_router, tags=["qta-revision"])
 router.include_router(qta_review_router, tags=["qta-review"])
 router.include_router(ocr_router, prefix="/ocr", tags=["ocr"])
+router.include_router(documents_router, prefix="/documents", tags=["documents"])
+router.include_router(profiling_router, prefix="/admin/profiles", tags=["admin"])
+router.include_router(usage_router, prefix="/usage", tags=["usage"])
 
 # --- DEFAULT TAG ENDPOINTS ---
 @router.post("/ai-analysis/", tags=["default"])
-async def ai_analysis(file: UploadFile = File(...)):
+async def ai_analysis(request: Request, file: UploadFile = File(...)):
     """AI analysis of uploaded text file."""
     try:
         # Validate file type
@@ -59,7 +96,7 @@ async def ai_analysis(file: UploadFile = File(...)):
         text_content = content.decode('utf-8')
         
         # Perform AI analysis
-        result = ai_analyzer.analyze_incident(text_content)
+        result = await run_until_disconnected(request, get_ai_analyzer().analyze_incident(text_content))
         
         if result:
             return JSONResponse(
@@ -74,25 +111,33 @@ async def ai_analysis(file: UploadFile = File(...)):
         else:
             raise HTTPException(status_code=500, detail="AI analysis failed")
             
+    except HTTPException:
+        raise
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="File encoding not supported. Please upload a UTF-8 text file.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 @router.post("/extract-text/", tags=["default"])
-async def text_extraction(files: list[UploadFile] = File(...)):
-    """Extract text from multiple uploaded files using OCR and conversion."""
-    temp_file_paths = []
+async def text_extraction(files: Optional[List[UploadFile]] = File(None),
+                          document_ids: Optional[List[str]] = Form(None),
+                          workspace: Workspace = Depends(request_workspace)):
+    """
+    Extract text from multiple uploaded files using OCR and conversion.
+    Documents already uploaded to /documents are referenced by `document_ids` instead.
+    """
+    if not files and not document_ids:
+        raise HTTPException(status_code=400, detail="Upload files or reference stored documents by document_ids")
+    # Stored documents are resolved first: 404/409 for unknown or unfinished ones
+    stored = [document_entry(document_id) for document_id in document_ids or []]
     try:
-        # Save all uploaded files to temp and collect paths
-        for file in files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-                temp_file_path = temp_file.name
-                content = await file.read()
-                temp_file.write(content)
-                temp_file_paths.append(temp_file_path)
-        # Extract text from all files
-        results = document_ocr.extract_text_from_files(temp_file_paths)
+        # Save all uploaded files into this request's workspace (removed when the request ends)
+        temp_file_paths = []
+        for file in files or []:
+            temp_file_paths.append(await workspace.save_upload(file))
+        # Extract text from all files (conversion waits and OCR calls block: off the event loop)
+        results = await asyncio.to_thread(profiled(get_document_ocr().extract_text_from_files), temp_file_paths, workspace.root)
+        results.update({entry['filename'] or entry['document_id']: entry['text'] for entry in stored})
         return JSONResponse(
             status_code=200,
             content={
@@ -101,18 +146,14 @@ async def text_extraction(files: list[UploadFile] = File(...)):
                 "message": "Text extraction completed for all files"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Text extraction error: {str(e)}")
-    finally:
-        # Clean up all temporary files
-        for path in temp_file_paths:
-            if os.path.exists(path):
-                os.unlink(path)
 
 @router.post("/transcription/audio/", tags=["default"])
-async def transcription_audio(audio: UploadFile = File(...)):
+async def transcription_audio(request: Request, audio: UploadFile = File(...), workspace: Workspace = Depends(request_workspace)):
     """Transcribe uploaded audio file."""
-    temp_file_path = None
     try:
         # Validate file type
         supported_audio_types = [
@@ -126,23 +167,26 @@ async def transcription_audio(audio: UploadFile = File(...)):
                 detail=f"Unsupported audio type: {audio.content_type}. Supported types: {', '.join(supported_audio_types)}"
             )
         
-        # Check file size (25MB limit for OpenAI Whisper)
-        content = await audio.read()
-        if len(content) > 25 * 1024 * 1024:  # 25MB
+        # Stream the upload into the workspace, then check file size (25MB limit for OpenAI Whisper)
+        temp_file_path = await workspace.save_upload(audio)
+        if os.path.getsize(temp_file_path) > 25 * 1024 * 1024:  # 25MB
             raise HTTPException(status_code=400, detail="Audio file too large (max 25MB)")
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio.filename)[1]) as temp_file:
-            temp_file_path = temp_file.name
-            temp_file.write(content)
-        
         # Transcribe audio
-        original_transcription, polished_transcription = voice_transcriber.process_file_with_results(temp_file_path)
+        original_transcription, polished_transcription = await run_until_disconnected(
+            request, get_voice_transcriber().process_file_with_results(temp_file_path)
+        )
         
         if original_transcription:
-            # Also perform AI analysis on the transcription
-            incident_analysis = ai_analyzer.analyze_incident(original_transcription)
-            summary_analysis = ai_analyzer.get_summary_analysis(original_transcription)
+            # Also perform AI analysis on the transcription (both calls run concurrently)
+            ai_analyzer = get_ai_analyzer()
+            incident_analysis, summary_analysis = await run_until_disconnected(
+                request,
+                asyncio.gather(
+                    ai_analyzer.analyze_incident(original_transcription),
+                    ai_analyzer.get_summary_analysis(original_transcription)
+                )
+            )
             
             return JSONResponse(
                 status_code=200,
@@ -160,12 +204,10 @@ async def transcription_audio(audio: UploadFile = File(...)):
         else:
             raise HTTPException(status_code=500, detail="Audio transcription failed")
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription error: {str(e)}")
-    finally:
-        # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
 
 # --- DEVIATION TAG ENDPOINTS ---
 
@@ -183,6 +225,7 @@ def read_root():
         "endpoints": {
             "ai_analysis": "/ai-analysis/",
             "text_extraction": "/extract-text/",
+            "documents": "/documents",
             "transcription": "/transcription/audio/",
             "deviation_file_extract": "/deviation/file-extract",
             "deviation_investigation": "/deviation/investigation/",
@@ -199,6 +242,14 @@ def read_root():
 def health_check():
     return {"status": "healthy", "message": "API is running normally"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    if not metrics_available():
+        return PlainTextResponse("prometheus_client is not installed", status_code=503)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
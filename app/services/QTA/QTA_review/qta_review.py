@@ -1,17 +1,57 @@
 import os
 import json
-import openai
 from fastapi import HTTPException
 from dotenv import load_dotenv
-from .qta_review_schema import per_minute_qta_review_request, per_minute_qta_review_response, final_qta_review_request, final_qta_review_response, repeat_qta_review_request
-from app.services.utils.document_ocr import DocumentOCR
+from .qta_review_schema import per_minute_qta_review_request, per_minute_qta_review_response, final_qta_review_request, final_qta_review_response, final_qta_review_result, final_qta_review_patch, final_qta_review_summary, repeat_qta_review_request
+from app.config.config import (
+    QTA_DOCUMENT_OUTPUT,
+    QTA_REFERENCE_DIFF,
+    QTA_REFERENCE_DIFF_CONTEXT_LINES,
+    QTA_REFERENCE_DIFF_MAX_SHARE,
+    QTA_SECTION_CHARS,
+    QTA_SECTION_REVISION_MIN_CHARS,
+)
+from app.services.registry import get_openai_client, get_document_ocr
+from app.services.utils.llm import StructuredOutputError, create_chat_completion, create_structured_completion
+from app.services.utils.document_diff import reference_differences
+from app.services.utils.document_patch import EDIT_INSTRUCTIONS, AnchoredDocument, PatchError, apply_document_edits
+from app.services.utils.document_sections import RevisedSection, reassemble, split_sections
+from app.services.utils.report_sections import SectionEditor, run_sections
+from app.services.utils.tracing import span
+from app.config.logging_config import get_logger
 
 load_dotenv()
 
+logger = get_logger('qta_review')
+
+# repeat_final_summary: only the parts a change request affects are rewritten;
+# edits to the document itself also refresh the summaries that describe it
+REPEAT_REVIEW_EDITOR = SectionEditor(
+    'qta_review', 'repeat_final_summary', final_qta_review_response, 'QTA review',
+    dependents={'document_text': ('change_summary', 'quality_review')},
+    guidance={
+        'quality_review': [{"criterion": "<criterion>", "assessment": "<assessment>"}],
+        'change_summary': "Single string describing actions completed on documents",
+        'review_summary': "Single string with observations and findings",
+        'document_text': "The fully revised client document incorporating the user changes",
+    }
+)
+
+REFERENCE_DIFF_INTRO = '''The reference document was compared with the original document locally; it is identical
+to the original except in the regions below. Each region is listed under the original section heading; lines
+starting with "-" appear only in the original, lines starting with "+" only in the reference, other lines are
+unchanged context and "..." separates regions.
+
+'''
+
 class QTAreview:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.document_ocr = DocumentOCR()
+        self.client = get_openai_client()
+
+    @property
+    def document_ocr(self):
+        """Shared DocumentOCR instance from the service registry"""
+        return get_document_ocr()
     
 
 
@@ -54,28 +94,128 @@ class QTAreview:
                 }}
                 """
 
-        response = self.get_openai_response(prompt).strip()
-
         try:
-            response_dict = json.loads(response)
-        except json.JSONDecodeError as e:
-            print("Model response:", response)
+            return self.get_structured_response(prompt, per_minute_qta_review_response, 'get_per_minute_summary')
+        except StructuredOutputError as e:
+            logger.warning("json_parse_failed", method='get_per_minute_summary', reason=str(e))
             raise HTTPException(status_code=500, detail="Failed to parse model response as JSON.")
 
-        return per_minute_qta_review_response(**response_dict)
-
     
-    def get_final_summary(self, input_data:final_qta_review_request) -> final_qta_review_response:
-        """Process review request with optional document text"""
+    def get_final_summary(self, input_data:final_qta_review_request, output: str = None) -> final_qta_review_response:
+        """
+        Process review request with optional document text. `output` is 'full'
+        (the model re-emits the document) or 'patch' (anchored edits applied
+        locally); defaults to QTA_DOCUMENT_OUTPUT.
+        """
+        if (output or QTA_DOCUMENT_OUTPUT) == 'patch':
+            document = AnchoredDocument(input_data.original_document)
+            result = self.get_patched_summary(
+                self.create_patch_prompt(input_data, document), document, 'get_final_summary'
+            )
+            if result is not None:
+                return result
+        if QTA_SECTION_REVISION_MIN_CHARS and len(input_data.original_document) >= QTA_SECTION_REVISION_MIN_CHARS:
+            return self.get_final_summary_by_section(input_data)
         prompt = self.create_prompt(input_data)
         
         
-        response = self.get_openai_response(prompt)
-        print(response)
-        response_dict = json.loads(response)
-        return final_qta_review_response(**response_dict)
+        return self.get_structured_response(prompt, final_qta_review_response, 'get_final_summary')
+
+    def get_final_summary_by_section(self, input_data: final_qta_review_request) -> final_qta_review_response:
+        """
+        Revise a long original document part by part: the parts (split at its
+        headings) are revised concurrently with the same instructions, put back
+        in order, and one short call writes the review from the per-part change notes.
+        """
+        parts = split_sections(input_data.original_document, QTA_SECTION_CHARS)
+        reference = self.reference_for_prompt(input_data)
+        with span('qta_review.sections', sections=len(parts)):
+            revised = run_sections(
+                lambda index: self.get_structured_response(
+                    self.create_section_prompt(input_data, parts, index, reference), RevisedSection,
+                    'get_final_summary:section'
+                ),
+                range(len(parts))
+            )
+            revised = [revised[index] for index in range(len(parts))]
+            summary = self.get_structured_response(
+                self.create_summary_prompt(input_data, revised), final_qta_review_summary, 'get_final_summary:summary'
+            )
+        return final_qta_review_response(
+            **summary.model_dump(), document_text=reassemble(parts, [part.document_text for part in revised])
+        )
+
+    def create_section_prompt(self, input_data: final_qta_review_request, parts: list, index: int, reference: str) -> str:
+        return f"""
+                You are an AI assistant responsible for updating a client document. The document is long, so you are
+                revising part {index + 1} of {len(parts)}; the other parts are revised separately with the same instructions.
+
+                Revise this part using:
+                1. The user's instructions provided in the **transcribed_text**.
+                2. The **reference_document**, which includes content on a similar topic but is a good example of how the document should be.
+
+                Apply the instructions and the reference only where they concern this part. Keep everything else in the
+                part exactly as it is, including headings, numbering and formatting.
+
+                ### User Instructions:
+                {input_data.transcribed_text}
+
+                ### Reference Document (With Intended Changes):
+                {reference}
+
+                ### Part {index + 1} of the Original Document (To Be Updated):
+                {parts[index]}
+
+                Return only a JSON object:
+                {{
+                  "document_text": "The full revised text of this part",
+                  "changes": "Short list of the changes made to this part, or 'No changes'"
+                }}
+                """
+
+    def create_summary_prompt(self, input_data: final_qta_review_request, revised: list) -> str:
+        notes = '\n'.join(f"- Part {index + 1}: {part.changes}" for index, part in enumerate(revised))
+        return f"""
+                You are an AI assistant reviewing the revision of a client document. The document was revised part by part
+                following the user's instructions; these are the changes made to each part.
+
+                ### User Instructions:
+                {input_data.transcribed_text}
+
+                ### Changes Per Part:
+                {notes}
+
+                Return only a JSON object with the following fields:
+                {{
+                  "quality_review": [
+                    {{"criterion": "Actions Completed", "assessment": "Description of completion status"}},
+                    {{"criterion": "Content Updates", "assessment": "Assessment of content updates"}},
+                    {{"criterion": "Template Updates", "assessment": "Assessment of template updates"}}
+                  ],
+                  "change_summary": "Single string with detailed summary of actions to be completed by AI on attachment or new documents",
+                  "review_summary": "Single string with observations and findings from the review"
+                }}
+                """
+
+    def reference_for_prompt(self, input_data: final_qta_review_request) -> str:
+        """
+        The reference document as the prompts carry it: only the regions where it
+        differs from the original (QTA_REFERENCE_DIFF), else the full text
+        """
+        if not QTA_REFERENCE_DIFF or not input_data.reference_document:
+            return input_data.reference_document
+        differences = reference_differences(
+            input_data.original_document, input_data.reference_document,
+            QTA_REFERENCE_DIFF_CONTEXT_LINES, QTA_REFERENCE_DIFF_MAX_SHARE
+        )
+        if differences is None:
+            logger.debug("reference_diff_skipped", reference_chars=len(input_data.reference_document))
+            return input_data.reference_document
+        logger.info("reference_diff", reference_chars=len(input_data.reference_document), diff_chars=len(differences))
+        return REFERENCE_DIFF_INTRO + differences
 
     def create_prompt(self, input_data: final_qta_review_request) -> str:
+        reference = self.reference_for_prompt(input_data)
         return f"""
                 You are an AI assistant responsible for updating a client document.
 
@@ -104,7 +244,7 @@ class QTAreview:
                 {input_data.transcribed_text}
 
                 ### Reference Document (With Intended Changes):
-                {input_data.reference_document}
+                {reference}
 
                 ### Original Document (To Be Updated):
                 {input_data.original_document}
@@ -125,7 +265,69 @@ class QTAreview:
                 """
 
                 
-    def repeat_final_summary(self, input_data: repeat_qta_review_request) -> final_qta_review_response:
+    def get_patched_summary(self, prompt: str, document: AnchoredDocument, method: str):
+        """
+        Ask for the review plus edits to `document` and apply them locally.
+        None when the edits don't fit the document (the caller asks for the full text instead).
+        """
+        answer = self.get_structured_response(prompt, final_qta_review_patch, f'{method}:patch')
+        try:
+            document_text = apply_document_edits(document, answer.edits, 'qta_review', method)
+        except PatchError as e:
+            logger.warning("document_patch_failed", method=method, reason=str(e))
+            return None
+        logger.info("document_patch_applied", method=method, edits=len(answer.edits), paragraphs=len(document.paragraphs))
+        return final_qta_review_result(**answer.model_dump(), document_text=document_text)
+
+    def create_patch_prompt(self, input_data: final_qta_review_request, document: AnchoredDocument) -> str:
+        reference = self.reference_for_prompt(input_data)
+        return f"""
+                You are an AI assistant responsible for updating a client document.
+
+                Your task is to revise the **original_document** using:
+                1. The user's instructions provided in the **transcribed_text**.
+                2. The **reference_document**, which includes content on a similar topic but is a good example of how the document should be.
+
+                ### Instructions:
+                - First, analyze the **transcribed_text** to extract key instructions or intent behind the changes.
+                - Then, compare the **original_document** with the **reference_document** to identify edits such as additions, removals, or rewritten sections.
+                - Use both sources (instructions and reference) to make accurate and complete updates to the **original_document**.
+
+                {EDIT_INSTRUCTIONS}
+
+                Your response must be a valid JSON object with the following fields:
+
+                - **quality_review**: A list of objects with criterion and assessment (e.g., [{{"criterion": "Content Updates", "assessment": "Content updates are satisfactory"}}]).
+                - **change_summary**: A single string with detailed summary of actions to be completed by AI on attachment or new documents as required auto transcription.
+                - **review_summary**: A single string with observations and findings from the review.
+                - **edits**: The list of edits that turns the original document into the revised one.
+
+                ### User Instructions:
+                {input_data.transcribed_text}
+
+                ### Reference Document (With Intended Changes):
+                {reference}
+
+                ### Original Document (To Be Updated):
+                {document.render()}
+
+                Example format:
+                {{
+                  "quality_review": [{{"criterion": "Actions Completed", "assessment": "All user instructions have been addressed"}}],
+                  "change_summary": "Single string describing actions completed on documents",
+                  "review_summary": "Single string with observations and findings",
+                  "edits": [{{"op": "replace", "anchor": "P3", "text": "Revised paragraph text"}}]
+                }}
+                """
+
+    def repeat_final_summary(self, input_data: repeat_qta_review_request, output: str = None) -> final_qta_review_response:
+        if (output or QTA_DOCUMENT_OUTPUT) == 'patch':
+            document = AnchoredDocument(input_data.document)
+            result = self.get_patched_summary(
+                self.create_repeat_patch_prompt(input_data, document), document, 'repeat_final_summary'
+            )
+            if result is not None:
+                return result
         prompt = f"""
         You are an AI assistant tasked with revising a client document based on user-provided feedback.
 
@@ -167,24 +369,71 @@ class QTAreview:
         Begin processing now and return only the final JSON output.
         """
         
+        existing = {
+            'quality_review': input_data.quality_review,
+            'change_summary': input_data.change_summary,
+            'review_summary': input_data.review_summary,
+            'document_text': input_data.document,
+        }
         try:
-            response_text = self.get_openai_response(prompt)
-            parsed = json.loads(response_text)
-            return final_qta_review_response(**parsed)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse LLM response as JSON: {e}\nRaw response:\n{response_text}")
+            edited = REPEAT_REVIEW_EDITOR.edit(
+                self.client, self.get_structured_response, existing, input_data.transcribed_text
+            )
+            if edited is not None:
+                return edited
+            return self.get_structured_response(prompt, final_qta_review_response, 'repeat_final_summary')
+        except StructuredOutputError as e:
+            raise ValueError(f"Failed to parse LLM response as JSON: {e}")
         except Exception as e:
             raise ValueError(f"Error in repeat final summary: {e}")
 
     
-    def get_openai_response (self, prompt:str)->str:
-        completion =self.client.chat.completions.create(
+    def create_repeat_patch_prompt(self, input_data: repeat_qta_review_request, document: AnchoredDocument) -> str:
+        return f"""
+        You are an AI assistant tasked with revising a client document based on user-provided feedback.
+
+        ### Instructions:
+        1. Carefully review the user changes below and interpret the intended modifications:
+        {input_data.transcribed_text}
+
+        2. Apply these changes to the existing document, given below as anchored paragraphs.
+        {EDIT_INSTRUCTIONS}
+
+        {document.render()}
+
+        3. Based on the applied updates, revise the following summaries as needed:
+        - Existing Quality Review: {input_data.quality_review}
+        - Existing Change Summary: {input_data.change_summary}
+        - Existing Review Summary: {input_data.review_summary}
+
+        ### Response Format:
+        Return a valid JSON object with the following fields:
+        - "quality_review": List of objects, each with "criterion" and "assessment" fields
+        - "change_summary": Single string with detailed summary of actions to be completed by AI on attachment or new documents as required auto transcription
+        - "review_summary": Single string with observations and findings from the review
+        - "edits": The list of edits that applies the user changes to the document
+
+        Return **only** the JSON object. No explanations or extra text.
+        """
+
+    def get_openai_response (self, prompt:str, method:str='get_openai_response')->str:
+        completion = create_chat_completion(
+            self.client, 'qta_review', method,
             model="gpt-4.1",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7            
         )
         return completion.choices[0].message.content
 
+    def get_structured_response(self, prompt: str, response_model, method: str):
+        """Same request as get_openai_response, answered as a validated `response_model`"""
+        return create_structured_completion(
+            self.client, 'qta_review', method, response_model,
+            model="gpt-4.1",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7
+        )
+
 
 
 
@@ -1,24 +1,26 @@
+import asyncio
 import os
-import tempfile
 import json
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status, Depends
 from fastapi.responses import JSONResponse
 from app.services.QTA.QTA_review.qta_review_schema import (
     per_minute_qta_review_request, 
     per_minute_qta_review_response, 
     final_qta_review_request, 
     final_qta_review_response,
+    final_qta_review_result,
     repeat_qta_review_request
 )
-from app.services.QTA.QTA_review.qta_review import QTAreview
-from app.services.utils.convert_file import FileConverter
-from app.services.utils.document_ocr import DocumentOCR
-from typing import Optional, Dict, Any
+from app.services.registry import get_qta_review_service, get_document_ocr
+from app.services.utils.conversion_service import get_conversion_service
+from app.services.utils.document_store import get_document_store, text_or_document, wait_for_document_text
+from app.services.utils.profiling import profiled
+from app.services.utils.workspace import Workspace, WorkspaceQuotaExceeded, request_workspace
+from typing import Literal, Optional, Dict, Any
 
 router = APIRouter(prefix="/qta-review", tags=["qta-review"])
-converter=FileConverter()
-qta_service = QTAreview()
-document_ocr = DocumentOCR()
+
+REFERENCE_FILE_TYPES = ['.pdf', '.docx', '.doc']
 
 @router.post("/per-minute-qta-review", response_model=per_minute_qta_review_response)
 async def process_per_minute_review(request: per_minute_qta_review_request):
@@ -26,7 +28,7 @@ async def process_per_minute_review(request: per_minute_qta_review_request):
     Process per-minute QTA review with direct text input
     """
     try:
-        result = qta_service.get_per_minute_summary(request)
+        result = get_qta_review_service().get_per_minute_summary(request)
         return result
     
     except HTTPException:
@@ -37,15 +39,42 @@ async def process_per_minute_review(request: per_minute_qta_review_request):
             detail=f"Error processing per-minute review: {str(e)}"
         )
 
-@router.post("/final-qta-review", response_model=final_qta_review_response)
+@router.post("/reference-document", status_code=status.HTTP_202_ACCEPTED)
+async def upload_reference_document(file: UploadFile = File(...)):
+    """
+    Attach the reference document ahead of the final review: conversion and OCR
+    start right away in the background. Pass the returned document_id to
+    /final-qta-review as `reference_document_id`; the review awaits the
+    extraction if it is still running.
+    """
+    file_ext = os.path.splitext(file.filename or '')[1].lower()
+    if file_ext not in REFERENCE_FILE_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported file type: {file_ext}. Please upload a PDF, DOCX, or DOC file."
+        )
+    document = await get_document_store().add_upload(file)
+    return document.describe()
+
+
+@router.post("/final-qta-review", response_model=final_qta_review_result)
 async def process_final_review(
     transcribed_text: str = Form(...),
-    original_document: str = Form(...),
-    file: Optional[UploadFile] = File(None)
+    original_document: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    original_document_id: Optional[str] = Form(None),
+    reference_document_id: Optional[str] = Form(None),
+    output: Optional[Literal['full', 'patch']] = None,
+    workspace: Workspace = Depends(request_workspace)
 ):
     """
     Process final QTA review using transcribed text, the original document (as string),
-    and an optional uploaded reference document file.
+    and an optional uploaded reference document file. Documents uploaded once to
+    /documents (or /qta-review/reference-document) are referenced by `original_document_id` /
+    `reference_document_id` instead of the string and the file; a document whose
+    extraction is still running is awaited. `output=patch` has the model
+    return paragraph edits (also listed in `edits`) that are applied to the original
+    document; by default QTA_DOCUMENT_OUTPUT decides.
     """
     try:
         if not transcribed_text.strip():
@@ -54,59 +83,51 @@ async def process_final_review(
                 detail="Transcribed text must be provided."
             )
 
-        if not original_document.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Original document must be provided as a string."
-            )
+        if original_document_id and not (original_document or '').strip():
+            original_document = await wait_for_document_text(original_document_id)
+        original_document = text_or_document(original_document, None, 'original_document')
 
         reference_document_text = "No reference document provided"
-        temp_doc_paths = []
 
-        if file and file.filename:
+        if reference_document_id:
+            # Extraction started when the file was attached; usually done by now
+            reference_document_text = await wait_for_document_text(reference_document_id)
+        elif file and file.filename:
             file_ext = os.path.splitext(file.filename)[1].lower()
 
-            if file_ext not in ['.pdf', '.docx', '.doc']:
+            if file_ext not in REFERENCE_FILE_TYPES:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Unsupported file type: {file_ext}. Please upload a PDF, DOCX, or DOC file."
                 )
 
+            # Upload and converted PDF live in this request's workspace (removed when the request ends)
+            temp_input_path = await workspace.save_upload(file)
+
+            if file_ext in ['.docx', '.doc']:
+                temp_output_path = workspace.path(f"{os.path.splitext(file.filename)[0]}.pdf")
+
+                # Render in the conversion process pool so the event loop stays free
+                await get_conversion_service().convert_async(temp_input_path, temp_output_path)
+                # The converted PDF counts against the workspace quota like the upload
+                workspace.check_quota()
+
+                pdf_path = temp_output_path
+            else:
+                pdf_path = temp_input_path
+
             try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-                    temp_input_path = temp_file.name
-                    temp_doc_paths.append(temp_input_path)
-                    content = await file.read()
-                    temp_file.write(content)
-
-                if file_ext in ['.docx', '.doc']:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as out_file:
-                        temp_output_path = out_file.name
-                        temp_doc_paths.append(temp_output_path)
-
-                    if file_ext == '.docx':
-                        converter.docx_to_pdf(temp_input_path, temp_output_path)
-                    else:
-                        converter.doc_to_pdf(temp_input_path, temp_output_path)
-
-                    pdf_path = temp_output_path
-                else:
-                    pdf_path = temp_input_path
-
-                try:
-                    reference_document_text = document_ocr.extract_text(pdf_path)
-                    if not reference_document_text:
-                        reference_document_text = f"Could not extract text from {file.filename}"
-                except Exception as e:
-                    reference_document_text = f"Error extracting text from {file.filename}: {str(e)}"
-
-            finally:
-                for temp_path in temp_doc_paths:
-                    if os.path.exists(temp_path):
-                        try:
-                            os.remove(temp_path)
-                        except Exception as e:
-                            print(f"Warning: Could not remove temporary file: {e}")
+                # OCR and the LLM call below run in a worker thread so the event loop (and the
+                # background document waits it serves) stays free
+                reference_document_text = await asyncio.to_thread(
+                    profiled(get_document_ocr().extract_text), pdf_path, workspace.root
+                )
+                if not reference_document_text:
+                    reference_document_text = f"Could not extract text from {file.filename}"
+            except WorkspaceQuotaExceeded:
+                raise
+            except Exception as e:
+                reference_document_text = f"Error extracting text from {file.filename}: {str(e)}"
 
         input_data = final_qta_review_request(
             transcribed_text=transcribed_text,
@@ -114,7 +135,7 @@ async def process_final_review(
             reference_document=reference_document_text
         )
 
-        result = qta_service.get_final_summary(input_data)
+        result = await asyncio.to_thread(profiled(get_qta_review_service().get_final_summary), input_data, output)
         return result
 
     except HTTPException:
@@ -129,10 +150,15 @@ async def process_final_review(
 
 
 
-@router.post("/final-qta-review-repeat", response_model=final_qta_review_response)
-async def process_final_review_repeat(request: repeat_qta_review_request):
+@router.post("/final-qta-review-repeat", response_model=final_qta_review_result)
+async def process_final_review_repeat(request: repeat_qta_review_request,
+                                      output: Optional[Literal['full', 'patch']] = None):
+    if request.document is None or not request.document.strip():
+        request = request.model_copy(update={
+            'document': text_or_document(request.document, request.document_id, 'document')
+        })
     try:
-        result = qta_service.repeat_final_summary(request)
+        result = await asyncio.to_thread(profiled(get_qta_review_service().repeat_final_summary), request, output)
         return result
     except Exception as e:
         raise HTTPException(
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional,Dict,Any,List
+from app.services.utils.document_patch import DocumentEdit
 
 
 class per_minute_qta_review_request(BaseModel):
@@ -24,9 +25,27 @@ class final_qta_review_response(BaseModel):
     review_summary:str
     document_text:str
 
+class final_qta_review_result(final_qta_review_response):
+    """Final/repeat endpoint response: with output=patch, also the edits applied to the document"""
+    edits:Optional[List[DocumentEdit]]=None
+
+class final_qta_review_summary(BaseModel):
+    """What the model returns after a document was revised part by part: the review only"""
+    quality_review:List[Dict[str,Any]]
+    change_summary:str
+    review_summary:str
+
+class final_qta_review_patch(BaseModel):
+    """What the model returns for output=patch: the review plus edits to the document"""
+    quality_review:List[Dict[str,Any]]
+    change_summary:str
+    review_summary:str
+    edits:List[DocumentEdit]
+
 class repeat_qta_review_request(BaseModel):
     transcribed_text: str
-    document: str
+    document: Optional[str] = None
+    document_id: Optional[str] = None  # a document in /documents, used when `document` is not given
     quality_review: List[Dict[str,Any]]
     change_summary: str
     review_summary: str
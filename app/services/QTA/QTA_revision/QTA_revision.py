@@ -1,19 +1,61 @@
 import os
 import json
-import openai
 from fastapi import HTTPException
 from dotenv import load_dotenv
-from .QTA_revision_schema import per_minute_qta_revision_request, per_minute_qta_revision_response, final_qta_revision_request, final_qta_revision_response, repeat_qta_revision_request
-from app.services.utils.document_ocr import DocumentOCR
-from pydantic import ValidationError
+from .QTA_revision_schema import per_minute_qta_revision_request, per_minute_qta_revision_response, final_qta_revision_request, final_qta_revision_response, final_qta_revision_result, final_qta_revision_patch, final_qta_revision_summary, repeat_qta_revision_request
+from app.config.config import QTA_DOCUMENT_OUTPUT, QTA_SECTION_CHARS, QTA_SECTION_REVISION_MIN_CHARS
+from app.services.registry import get_openai_client, get_document_ocr
+from app.services.utils.llm import StructuredOutputError, create_chat_completion, create_structured_completion, stream_chat_completion
+from app.services.utils.document_patch import EDIT_INSTRUCTIONS, AnchoredDocument, PatchError, apply_document_edits
+from app.services.utils.document_sections import RevisedSection, reassemble, split_sections
+from app.services.utils.report_sections import SectionEditor, run_sections
+from app.services.utils.tracing import span
+from app.services.utils.structured_output import parse_structured_output
+from app.config.logging_config import get_logger
 
 
 load_dotenv()
 
+logger = get_logger('qta_revision')
+
+# repeat_final_summary: only the parts a change request affects are rewritten;
+# edits to the document itself also refresh the summaries that describe it
+REPEAT_REVISION_EDITOR = SectionEditor(
+    'qta_revision', 'repeat_final_summary', final_qta_revision_response, 'QTA document revision',
+    dependents={'document_text': ('action_summary', 'change_details')},
+    guidance={
+        'action_summary': "A concise summary of all changes made",
+        'change_details': "A detailed single string of changes using markdown bullet points per category (e.g. CAPA, SME Inputs and Concerns, Gap Assessment)",
+        'document_text': "The complete final revised client document text",
+    }
+)
+
+# Keys a document entry of final_qta_revision_request.documents may carry
+DOCUMENT_NAME_KEYS = ('filename', 'name', 'title')
+DOCUMENT_TEXT_KEYS = ('text', 'content', 'document_text')
+
+QTA_REVISION_ROLE = """You are an AI assistant specialized in QTA (Quality Technical Agreement) document revision.
+
+Your role and capabilities:
+- Expert in quality management documents including SOPs, CAPA, SME reviews, Contracts and compliance requirements
+- Skilled in document structure analysis and professional formatting
+- Focused on maintaining regulatory compliance and quality standards
+
+Your task process:
+1. Analyze user instructions to understand exactly what changes are requested
+2. Examine all provided documents to understand their content and relationships
+3. Apply requested changes to create revised versions of documents
+4. Ensure all revisions maintain professional structure and formatting
+5. Focus on quality-related aspects like SOPs, CAPA, SME inputs, and compliance requirements"""
+
 class QTARevision:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.document_ocr = DocumentOCR()
+        self.client = get_openai_client()
+
+    @property
+    def document_ocr(self):
+        """Shared DocumentOCR instance from the service registry"""
+        return get_document_ocr()
     
 
 
@@ -66,51 +108,163 @@ class QTARevision:
         
 
         
-        response = self.get_openai_response(prompt)
-        print(response)
         try:
-            response_dict = json.loads(response)
-        except json.JSONDecodeError:
+            return self.get_structured_response(prompt, per_minute_qta_revision_response, method='get_per_minute_summary')
+        except StructuredOutputError:
              raise HTTPException(status_code=500, detail="Failed to parse model response as JSON.")
-        
-        return per_minute_qta_revision_response(**response_dict)
     
     
-    def get_final_summary(self, input_data:final_qta_revision_request) -> final_qta_revision_response:
-        """Process review request with optional document text"""
+    def get_final_summary(self, input_data:final_qta_revision_request, output: str = None) -> final_qta_revision_response:
+        """
+        Process review request with optional document text. `output` is 'full'
+        (the model re-emits the document) or 'patch' (anchored edits applied
+        locally); defaults to QTA_DOCUMENT_OUTPUT.
+        """
+        if (output or QTA_DOCUMENT_OUTPUT) == 'patch':
+            document = AnchoredDocument(self.combine_documents(input_data.documents))
+            result = self.get_patched_summary(
+                self.create_patch_user_prompt(input_data, document), document, 'get_final_summary',
+                self.create_system_prompt(output='patch')
+            )
+            if result is not None:
+                return result
+        system_prompt = self.create_system_prompt()
+        user_prompt = self.create_user_prompt(input_data)
         try:
-            system_prompt = self.create_system_prompt()
-            user_prompt = self.create_user_prompt(input_data)
-            response = self.get_openai_response(user_prompt, system_prompt)
-            print(f"OpenAI Response: {response}")
-            
-            if not response or response.strip() == "":
-                raise ValueError("Empty response from OpenAI")
-            
-            response_dict = json.loads(response)
-            return final_qta_revision_response(**response_dict)
-        
-        except json.JSONDecodeError as e:
+            document_text = self.combine_documents(input_data.documents)
+            if QTA_SECTION_REVISION_MIN_CHARS and len(document_text) >= QTA_SECTION_REVISION_MIN_CHARS:
+                return self.get_final_summary_by_section(input_data, document_text)
+            return self.get_structured_response(
+                user_prompt, final_qta_revision_response, system_prompt, method='get_final_summary'
+            )
+        except StructuredOutputError as e:
             raise HTTPException(status_code=500, detail=f"Failed to parse OpenAI response as JSON: {str(e)}")
-        except ValidationError as e:
-            raise HTTPException(status_code=500, detail=f"Response validation failed: {str(e)}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error in get_final_summary: {str(e)}")
 
-    def create_system_prompt(self) -> str:
-        return """You are an AI assistant specialized in QTA (Quality Technical Agreement) document revision.
+    def get_final_summary_by_section(self, input_data: final_qta_revision_request, document_text: str) -> final_qta_revision_response:
+        """
+        Revise long documents part by part: the parts (split at their headings)
+        are revised concurrently with the same instructions, put back in order,
+        and one short call writes the summaries from the per-part change notes.
+        """
+        parts = split_sections(document_text, QTA_SECTION_CHARS)
+        system_prompt = self.create_section_system_prompt()
+        with span('qta_revision.sections', sections=len(parts)):
+            revised = run_sections(
+                lambda index: self.get_structured_response(
+                    self.create_section_prompt(input_data, parts, index), RevisedSection, system_prompt,
+                    method='get_final_summary:section'
+                ),
+                range(len(parts))
+            )
+            revised = [revised[index] for index in range(len(parts))]
+            notes = '\n'.join(f"- Part {index + 1}: {part.changes}" for index, part in enumerate(revised))
+            summary = self.get_structured_response(
+                f"""The documents below were revised part by part according to the user instructions.
 
-Your role and capabilities:
-- Expert in quality management documents including SOPs, CAPA, SME reviews, Contracts and compliance requirements
-- Skilled in document structure analysis and professional formatting
-- Focused on maintaining regulatory compliance and quality standards
+                    User Instructions:
+                    {input_data.transcribed_text}
 
-Your task process:
-1. Analyze user instructions to understand exactly what changes are requested
-2. Examine all provided documents to understand their content and relationships
-3. Apply requested changes to create revised versions of documents
-4. Ensure all revisions maintain professional structure and formatting
-5. Focus on quality-related aspects like SOPs, CAPA, SME inputs, and compliance requirements
+                    Changes Per Part:
+                    {notes}
+
+                    Provide your response as a JSON object with the keys "action_summary" and "change_details".""",
+                final_qta_revision_summary, self.create_system_prompt(output='summary'), method='get_final_summary:summary'
+            )
+        return final_qta_revision_response(
+            **summary.model_dump(), document_text=reassemble(parts, [part.document_text for part in revised])
+        )
+
+    def create_section_system_prompt(self) -> str:
+        return QTA_REVISION_ROLE + """
+
+The documents are long, so each request holds one part of them; the other parts are revised separately with the same instructions.
+
+Response requirements:
+- Return ONLY valid JSON with exactly two keys: "document_text", "changes"
+- "document_text": Complete revised text of this part (never abbreviated)
+- "changes": Short list of the changes made to this part, or "No changes"
+- Apply the instructions only where they concern this part; keep everything else exactly as it is
+- Preserve the part's structure, headings, numbering and professional formatting"""
+
+    def create_section_prompt(self, input_data: final_qta_revision_request, parts: list, index: int) -> str:
+        return f"""Please revise part {index + 1} of {len(parts)} of the following documents according to the user instructions.
+
+                    User Instructions:
+                    {input_data.transcribed_text}
+
+                    Part {index + 1}:
+                    {parts[index]}
+
+                    Provide your response as a JSON object with the keys "document_text" and "changes"."""
+
+    def stream_final_summary(self, input_data:final_qta_revision_request):
+        """
+        Streaming variant of get_final_summary: yields the raw model output as it
+        arrives; pass the joined text to parse_final_summary.
+        """
+        return self.stream_openai_response(
+            self.create_user_prompt(input_data), self.create_system_prompt(), method='get_final_summary',
+            response_model=final_qta_revision_response
+        )
+
+    def parse_final_summary(self, response: str) -> final_qta_revision_response:
+        """Parse the model's JSON answer into a final_qta_revision_response"""
+        try:
+            return parse_structured_output(response, final_qta_revision_response, 'qta_revision', 'get_final_summary')
+        except StructuredOutputError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to parse OpenAI response as JSON: {str(e)}")
+
+    def get_patched_summary(self, prompt: str, document: AnchoredDocument, method: str, system_prompt: str = None):
+        """
+        Ask for the summaries plus edits to `document` and apply them locally.
+        None when the edits don't fit the document (the caller asks for the full text instead).
+        """
+        try:
+            answer = self.get_structured_response(prompt, final_qta_revision_patch, system_prompt, method=f'{method}:patch')
+        except StructuredOutputError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to parse OpenAI response as JSON: {str(e)}")
+        try:
+            document_text = apply_document_edits(document, answer.edits, 'qta_revision', method)
+        except PatchError as e:
+            logger.warning("document_patch_failed", method=method, reason=str(e))
+            return None
+        logger.info("document_patch_applied", method=method, edits=len(answer.edits), paragraphs=len(document.paragraphs))
+        return final_qta_revision_result(**answer.model_dump(), document_text=document_text)
+
+    def combine_documents(self, documents) -> str:
+        """The request's documents as one text: a string as is, a list entry by entry under its name"""
+        if isinstance(documents, str):
+            return documents
+        parts = []
+        for entry in documents:
+            name = next((entry[key] for key in DOCUMENT_NAME_KEYS if entry.get(key)), None)
+            text = next((entry[key] for key in DOCUMENT_TEXT_KEYS if isinstance(entry.get(key), str)), None)
+            if text is None:
+                text = json.dumps(entry, indent=2, default=str)
+            parts.append(f"{name}\n\n{text}" if name else text)
+        return '\n\n'.join(parts)
+
+    def create_system_prompt(self, output: str = 'full') -> str:
+        if output == 'summary':
+            return QTA_REVISION_ROLE + """
+
+Response requirements:
+- Return ONLY valid JSON with exactly two keys: "action_summary", "change_details"
+- "action_summary": Brief summary of changes made to which documents
+- "change_details": Detailed breakdown using markdown formatting with categories like Document Structure Changes, Content Additions/Modifications, Safety and Compliance Updates, Process Improvements
+- "change_details" must be a single string with \\n for line breaks, not an object or array"""
+        if output == 'patch':
+            return QTA_REVISION_ROLE + """
+
+Response requirements:
+- Return ONLY valid JSON with exactly three keys: "action_summary", "change_details", "edits"
+- "action_summary": Brief summary of changes made to which documents
+- "change_details": Detailed breakdown using markdown formatting with categories like Document Structure Changes, Content Additions/Modifications, Safety and Compliance Updates, Process Improvements
+- "change_details" must be a single string with \\n for line breaks, not an object or array
+- "edits": The anchored paragraph edits that produce the revised document; paragraphs you do not list stay unchanged"""
+        return QTA_REVISION_ROLE + """
 
 Response requirements:
 - Return ONLY valid JSON with exactly three keys: "action_summary", "change_details", "document_text"
@@ -140,10 +294,46 @@ Critical formatting rules:
                     Provide your response as a JSON object with the three required keys."""
                 
                 
+    def create_patch_user_prompt(self, input_data: final_qta_revision_request, document: AnchoredDocument) -> str:
+        return f"""Please revise the following documents according to the user instructions.
+
+                    User Instructions:
+                    {input_data.transcribed_text}
+
+                    {EDIT_INSTRUCTIONS}
+
+                    Documents:
+                    {document.render()}
+
+                    Provide your response as a JSON object with the keys "action_summary", "change_details" and "edits"."""
+                
+                
     def repeat_final_summary(
     self,
-    input_data: repeat_qta_revision_request
+    input_data: repeat_qta_revision_request,
+    output: str = None
 ) -> final_qta_revision_response:
+        if (output or QTA_DOCUMENT_OUTPUT) == 'patch':
+            document = AnchoredDocument(input_data.document_text)
+            patch_prompt = f"""
+        You are an AI assistant tasked with revising a client document according to user-provided changes.
+
+        Instructions:
+        1. Carefully analyze the user changes: {input_data.transcribed_text}
+        2. Apply these changes to the existing document below.
+        3. Update the existing action summary: {input_data.action_summary} and existing change details: {input_data.change_details} based on the new revisions.
+
+        {EDIT_INSTRUCTIONS}
+
+        Document:
+        {document.render()}
+
+        Your response must be a single JSON object with the keys "action_summary" (string), "change_details"
+        (a single markdown string, not an object or array) and "edits". Return **ONLY** the JSON object.
+        """
+            result = self.get_patched_summary(patch_prompt, document, 'repeat_final_summary')
+            if result is not None:
+                return result
         prompt = f"""
         You are an AI assistant tasked with revising a client document according to user-provided changes and an updated document.
 
@@ -172,51 +362,70 @@ Critical formatting rules:
         Now, proceed with the analysis and revision, then respond with the JSON output only.
         """
 
+        existing = {
+            'action_summary': input_data.action_summary,
+            'change_details': input_data.change_details,
+            'document_text': input_data.document_text,
+        }
         try:
-            response_text = self.get_openai_response(prompt)
-
-            parsed = json.loads(response_text)
-
-            return final_qta_revision_response(
-                action_summary=parsed["action_summary"],
-                change_details=parsed["change_details"],
-                document_text=parsed["document_text"]
+            edited = REPEAT_REVISION_EDITOR.edit(
+                self.client, self.get_structured_response, existing, input_data.transcribed_text
             )
-
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse LLM response as JSON: {e}\nRaw response:\n{response_text}")
-        except KeyError as e:
-            raise ValueError(f"Missing expected key in LLM response: {e}")
-        except ValidationError as e:
-            raise ValueError(f"Response validation failed: {e}")
+            if edited is not None:
+                return edited
+            return self.get_structured_response(prompt, final_qta_revision_response, method='repeat_final_summary')
+        except StructuredOutputError as e:
+            raise ValueError(f"Failed to parse LLM response as JSON: {e}")
     
-    def get_openai_response(self, prompt: str, system_prompt: str = None) -> str:
+    def get_openai_response(self, prompt: str, system_prompt: str = None, method: str = 'get_openai_response') -> str:
         try:
-            print(f"Sending request to OpenAI with model: gpt-4")
-            
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
-            
-            completion = self.client.chat.completions.create(
+            completion = create_chat_completion(
+                self.client, 'qta_revision', method,
                 model="gpt-4",
-                messages=messages,
+                messages=self.create_messages(prompt, system_prompt),
                 temperature=0.7            
             )
             
             response_content = completion.choices[0].message.content
-            print(f"Received response length: {len(response_content) if response_content else 0}")
-            
+            logger.debug("llm_response_received", method=method, length=len(response_content) if response_content else 0)
+
             if not response_content:
                 raise ValueError("OpenAI returned empty response")
                 
             return response_content
             
         except Exception as e:
-            print(f"Error in OpenAI API call: {str(e)}")
+            logger.error("llm_call_failed", service='qta_revision', method=method, error=str(e))
             raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
 
+    def get_structured_response(self, prompt: str, response_model, system_prompt: str = None, method: str = 'get_structured_response'):
+        """Same request as get_openai_response, answered as a validated `response_model`"""
+        try:
+            return create_structured_completion(
+                self.client, 'qta_revision', method, response_model,
+                model="gpt-4",
+                messages=self.create_messages(prompt, system_prompt),
+                temperature=0.7
+            )
+        except StructuredOutputError:
+            raise
+        except Exception as e:
+            logger.error("llm_call_failed", service='qta_revision', method=method, error=str(e))
+            raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
 
-
-
+    def stream_openai_response(self, prompt: str, system_prompt: str = None, method: str = 'stream_openai_response',
+                               response_model=None):
+        """Same request as get_openai_response, yielding the content as it is generated"""
+        return stream_chat_completion(
+            self.client, 'qta_revision', method, response_model=response_model,
+            model="gpt-4",
+            messages=self.create_messages(prompt, system_prompt),
+            temperature=0.7
+        )
+
+    def create_messages(self, prompt: str, system_prompt: str = None) -> list:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
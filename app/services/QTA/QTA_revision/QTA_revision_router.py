@@ -7,17 +7,27 @@ from app.services.QTA.QTA_revision.QTA_revision_schema import (
     per_minute_qta_revision_response, 
     final_qta_revision_request, 
     final_qta_revision_response,
+    final_qta_revision_result,
     repeat_qta_revision_request
 )
-from app.services.QTA.QTA_revision.QTA_revision import QTARevision
-from app.services.utils.convert_file import FileConverter
-from app.services.utils.document_ocr import DocumentOCR
-from typing import Dict, Any
+from app.services.registry import get_qta_revision_service
+from app.services.utils.document_store import document_entry, text_or_document
+from app.services.utils.streaming import sse_response
+from typing import Dict, Any, Literal, Optional
 
 router = APIRouter(prefix="/qta-revision", tags=["qta-revision"])
-converter=FileConverter()
-qta_service = QTARevision()
-document_ocr = DocumentOCR()
+
+
+def with_stored_documents(request: final_qta_revision_request) -> final_qta_revision_request:
+    """The request with its document_ids resolved into `documents` entries (404/409 raised as is)"""
+    if not request.document_ids:
+        return request
+    documents = request.documents
+    if isinstance(documents, str):
+        documents = [{'text': documents}] if documents.strip() else []
+    return request.model_copy(update={
+        'documents': documents + [document_entry(document_id) for document_id in request.document_ids]
+    })
 
 @router.post("/per-minute-qta-revision", response_model=per_minute_qta_revision_response)
 async def process_per_minute_revision(request: per_minute_qta_revision_request):
@@ -25,7 +35,7 @@ async def process_per_minute_revision(request: per_minute_qta_revision_request):
     Process per-minute QTA revision with direct text input
     """
     try:
-        result = qta_service.get_per_minute_summary(request)
+        result = get_qta_revision_service().get_per_minute_summary(request)
         return result
     
     except HTTPException:
@@ -36,15 +46,20 @@ async def process_per_minute_revision(request: per_minute_qta_revision_request):
             detail=f"Error processing per-minute revision: {str(e)}"
         )
 
-@router.post("/final-qta-revision", response_model=final_qta_revision_response)
+@router.post("/final-qta-revision", response_model=final_qta_revision_result)
 async def process_final_revision(
-     request: final_qta_revision_request
+     request: final_qta_revision_request,
+     output: Optional[Literal['full', 'patch']] = None
 ):
     """
-    Process final QTA revision with transcribed text and document processing
+    Process final QTA revision with transcribed text and document processing.
+    `output=patch` has the model return paragraph edits (also listed in `edits`)
+    that are applied to the documents; by default QTA_DOCUMENT_OUTPUT decides.
+    Documents uploaded once to /documents can be referenced by `document_ids`.
     """
+    request = with_stored_documents(request)
     try:
-        response = qta_service.get_final_summary(request)
+        response = get_qta_revision_service().get_final_summary(request, output)
         return response
     except HTTPException:
         raise
@@ -55,10 +70,27 @@ async def process_final_revision(
         )
 
 
-@router.post("/final-qta-revision-repeat", response_model=final_qta_revision_response)
-async def process_final_revision_repeat(request: repeat_qta_revision_request):
+@router.post("/final-qta-revision/stream")
+async def stream_final_revision(request: final_qta_revision_request):
+    """
+    Streaming variant of /final-qta-revision (Server-Sent Events).
+    Sends `token` events as the revised document is generated, then a
+    `result` event carrying the final_qta_revision_response, or an `error` event.
+    """
+    request = with_stored_documents(request)
+    service = get_qta_revision_service()
+    return sse_response(service.stream_final_summary(request), service.parse_final_summary)
+
+
+@router.post("/final-qta-revision-repeat", response_model=final_qta_revision_result)
+async def process_final_revision_repeat(request: repeat_qta_revision_request,
+                                        output: Optional[Literal['full', 'patch']] = None):
+    if request.document_text is None or not request.document_text.strip():
+        request = request.model_copy(update={
+            'document_text': text_or_document(request.document_text, request.document_id, 'document_text')
+        })
     try:
-        result = qta_service.repeat_final_summary(request)
+        result = get_qta_revision_service().repeat_final_summary(request, output)
         return result
     except Exception as e:
         raise HTTPException(
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional,Dict,Any, Union
+from app.services.utils.document_patch import DocumentEdit
 
 
 class per_minute_qta_revision_request(BaseModel):
@@ -12,16 +13,33 @@ class per_minute_qta_revision_response(BaseModel):
     action_summary:str
 class final_qta_revision_request(BaseModel):
     transcribed_text:str
-    documents:Union[List[Dict[str,Any]],str]
+    documents:Union[List[Dict[str,Any]],str]=[]
+    document_ids:Optional[List[str]]=None  # documents in /documents, added to `documents` by the route
 
 class final_qta_revision_response(BaseModel):
     action_summary:str
     change_details:str
     document_text:str
+
+class final_qta_revision_result(final_qta_revision_response):
+    """Final/repeat endpoint response: with output=patch, also the edits applied to the document"""
+    edits:Optional[List[DocumentEdit]]=None
+
+class final_qta_revision_summary(BaseModel):
+    """What the model returns after a document was revised part by part: the summaries only"""
+    action_summary:str
+    change_details:str
+
+class final_qta_revision_patch(BaseModel):
+    """What the model returns for output=patch: the summaries plus edits to the document"""
+    action_summary:str
+    change_details:str
+    edits:List[DocumentEdit]
     
 class repeat_qta_revision_request(BaseModel):
     transcribed_text: str
     change_details: str
     action_summary: str
-    document_text: str
+    document_text: Optional[str] = None
+    document_id: Optional[str] = None  # a document in /documents, used when `document_text` is not given
     
\ No newline at end of file
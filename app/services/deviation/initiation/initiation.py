@@ -1,32 +1,67 @@
 import os
 import json
-import openai
 from fastapi import HTTPException
 from dotenv import load_dotenv
-from app.services.deviation.initiation.initiation_schema import PerMinuteInitiationRequest, PerMinuteInitiationResponse, FinalCheckRequest, FinalRequest, FormalIncidentReport, IncidentReportSection, ModifyIncidentReportRequest
+from app.services.deviation.initiation.initiation_schema import PerMinuteInitiationRequest, PerMinuteInitiationResponse, FinalCheckRequest, FinalRequest, FormalIncidentReport, IncidentReportSection, IncidentReportSections, ModifyIncidentReportRequest
+from app.services.registry import get_openai_client
+from app.services.utils.llm import (
+    StructuredOutputError,
+    create_chat_completion,
+    create_structured_completion,
+    stream_chat_completion,
+    stream_structured_completion,
+    structured_result,
+)
+from app.services.utils.report_sections import SectionEditor
+from app.services.utils.structured_output import parse_structured_output
+from app.config.logging_config import get_logger
 
 load_dotenv()
 
+logger = get_logger('initiation')
+
+# Section formats of the formal incident report (see create_incident_report_prompt)
+INCIDENT_REPORT_GUIDANCE = {
+    "incident_title": "1. Incident Title [Title] \nDeviation ID: [To be assigned] \nDate/Time of Occurrence: [Date], [Time] hrs \nLocation: [Location] \nProduct: [Product Name] \nDosage Form: [Form]",
+    "background": "2. Background \n[Detailed description of what happened] \n\nPersonnel involved include [list of names] \n\nImmediate Action \n[Actions taken immediately after detection] \n\nQuality Concerns/Controls \n[Quality concerns and controls] \n\nRCA Tools \n[Root cause analysis tools selected and rationale] \n\nExpected Interim action \n[Expected interim steps] \n\nCAPA \n[Corrective and preventive actions]",
+    "meeting_attendees": "3. Meeting Attendees \n[List of all attendee names]",
+    "impact_assessment": "4. Impact Assessment \n[Detailed assessment of impact on product quality, patient safety, validation, regulatory compliance]",
+    "criticality": "5. Criticality \nCriticality: [Minor/Major/Critical] \n[Rationale for criticality determination]",
+}
+
+# modify_incident_report: only the sections a modification affects are rewritten;
+# the criticality rationale follows the impact assessment
+MODIFY_REPORT_EDITOR = SectionEditor(
+    'initiation', 'modify_incident_report', IncidentReportSections, 'formal incident report',
+    dependents={'impact_assessment': ('criticality',)},
+    guidance=INCIDENT_REPORT_GUIDANCE,
+    instructions='Keep the numbered section headings and the line layout of each section.'
+)
+
 class Initiation:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_openai_client()
     
 
     def get_per_minute_summary(self, input_data: PerMinuteInitiationRequest) -> PerMinuteInitiationResponse:
-        import json
-        
-
-        prompt= self.create_prompt(input_data)
-        response = self.get_openai_response(prompt).strip()
-        print("Raw model response:", response)
-
         try:
-            response_dict = json.loads(response)
-        except json.JSONDecodeError as e:
-            print("Model response:", response)
+            return structured_result(self.stream_per_minute_summary(input_data))
+        except StructuredOutputError as e:
+            logger.warning("json_parse_failed", method='get_per_minute_summary', reason=str(e))
             raise HTTPException(status_code=500, detail="Failed to parse model response as JSON.")
 
-        return PerMinuteInitiationResponse(**response_dict)
+    def stream_per_minute_summary(self, input_data: PerMinuteInitiationRequest):
+        """
+        Per-minute summary as structured stream events: each field is reported as
+        soon as the model closes it, and schema-invalid output is retried early
+        (see llm.stream_structured_completion).
+        """
+        return stream_structured_completion(
+            self.client, 'initiation', 'get_per_minute_summary', PerMinuteInitiationResponse,
+            model="gpt-4-turbo",
+            messages=[{"role": "user", "content": self.create_prompt(input_data)}],
+            temperature=0.7
+        )
 
     def create_prompt(self, input_data: PerMinuteInitiationRequest) -> str:
         return  f"""
@@ -152,14 +187,33 @@ class Initiation:
                 
 
     
-    def get_openai_response (self, prompt:str)->str:
-        completion =self.client.chat.completions.create(
+    def get_openai_response (self, prompt:str, method:str='get_openai_response')->str:
+        completion = create_chat_completion(
+            self.client, 'initiation', method,
             model="gpt-4-turbo",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7            
         )
         return completion.choices[0].message.content
 
+    def get_structured_response(self, prompt: str, response_model, method: str):
+        """Same request as get_openai_response, answered as a validated `response_model`"""
+        return create_structured_completion(
+            self.client, 'initiation', method, response_model,
+            model="gpt-4-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7
+        )
+
+    def stream_openai_response(self, prompt: str, method: str = 'stream_openai_response', response_model=None):
+        """Same request as get_openai_response, yielding the content as it is generated"""
+        return stream_chat_completion(
+            self.client, 'initiation', method, response_model=response_model,
+            model="gpt-4-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7
+        )
+
 
 
     def check_initiation_details (self,input:FinalCheckRequest):
@@ -203,7 +257,7 @@ class Initiation:
 
                                 """
 
-        response = self.get_openai_response(prompt).strip()
+        response = self.get_openai_response(prompt, 'check_initiation_details').strip()
         return response
         
     def generate_formal_incident_report(self, input_data: FinalRequest) -> FormalIncidentReport:
@@ -217,28 +271,42 @@ class Initiation:
             FormalIncidentReport: A structured incident report with all required sections
         """
         prompt = self.create_incident_report_prompt(input_data)
-        response = self.get_openai_response(prompt)
-        
+        return self.get_incident_report(prompt, 'generate_formal_incident_report')
+
+    def stream_formal_incident_report(self, input_data: FinalRequest):
+        """
+        Streaming variant of generate_formal_incident_report: yields the raw model
+        output as it arrives; pass the joined text to parse_formal_incident_report.
+        """
+        prompt = self.create_incident_report_prompt(input_data)
+        return self.stream_openai_response(prompt, 'generate_formal_incident_report', IncidentReportSections)
+
+    def parse_formal_incident_report(self, response: str) -> FormalIncidentReport:
+        """Parse the model's JSON answer into a FormalIncidentReport"""
         try:
-            report_sections = json.loads(response)
-            
-            formal_report = FormalIncidentReport(
-                incident_title=IncidentReportSection(content=report_sections["incident_title"]),
-                background=IncidentReportSection(content=report_sections["background"]),
-                meeting_attendees=IncidentReportSection(content=report_sections["meeting_attendees"]),
-                impact_assessment=IncidentReportSection(content=report_sections["impact_assessment"]),
-                criticality=IncidentReportSection(content=report_sections["criticality"])
-            )
-            return formal_report
-            
-        except json.JSONDecodeError as e:
-            print("Raw response:", response)
-            raise HTTPException(status_code=500, detail="Failed to parse AI response as JSON")
-        except KeyError as e:
-            print("Raw response:", response)
-            raise HTTPException(status_code=500, detail=f"Missing required section in response: {str(e)}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error generating incident report: {str(e)}")
+            sections = parse_structured_output(response, IncidentReportSections, 'initiation', 'generate_formal_incident_report')
+        except StructuredOutputError as e:
+            logger.warning("json_parse_failed", reason=str(e), response_preview=response[:500])
+            raise HTTPException(status_code=500, detail=f"Failed to parse AI response as JSON: {str(e)}")
+        return self.to_formal_report(sections)
+
+    def get_incident_report(self, prompt: str, method: str) -> FormalIncidentReport:
+        """Request the five report sections and wrap them into a FormalIncidentReport"""
+        try:
+            sections = self.get_structured_response(prompt, IncidentReportSections, method)
+        except StructuredOutputError as e:
+            logger.warning("json_parse_failed", method=method, reason=str(e))
+            raise HTTPException(status_code=500, detail=f"Failed to parse AI response as JSON: {str(e)}")
+        return self.to_formal_report(sections)
+
+    def to_formal_report(self, sections: IncidentReportSections) -> FormalIncidentReport:
+        return FormalIncidentReport(
+            incident_title=IncidentReportSection(content=sections.incident_title),
+            background=IncidentReportSection(content=sections.background),
+            meeting_attendees=IncidentReportSection(content=sections.meeting_attendees),
+            impact_assessment=IncidentReportSection(content=sections.impact_assessment),
+            criticality=IncidentReportSection(content=sections.criticality)
+        )
     
     def create_incident_report_prompt(self, input_data: FinalRequest) -> str:
         """
@@ -327,6 +395,17 @@ class Initiation:
         """
     
     def modify_incident_report(self, input_data: ModifyIncidentReportRequest) -> FormalIncidentReport:
+        existing = {name: section.content for name, section in input_data.existing_report}
+        try:
+            sections = MODIFY_REPORT_EDITOR.edit(
+                self.client, self.get_structured_response, existing, input_data.modifications
+            )
+        except StructuredOutputError as e:
+            logger.warning("json_parse_failed", method='modify_incident_report', reason=str(e))
+            raise HTTPException(status_code=500, detail=f"Failed to parse AI response as JSON: {str(e)}")
+        if sections is not None:
+            return self.to_formal_report(sections)
+
         prompt= f"""
         You are an expert AI assistant for pharmaceutical quality management and deviation reporting.
         Your task is to generate a formal incident report based on the transcription and any existing details provided.
@@ -400,26 +479,4 @@ class Initiation:
            
         IMPORTANT: Return ONLY valid JSON with the five requested sections. No explanations, no markdown code blocks, just the JSON object.
         """
-        response = self.get_openai_response(prompt)
-        
-        try:
-            report_sections = json.loads(response)
-            
-            formal_report = FormalIncidentReport(
-                incident_title=IncidentReportSection(content=report_sections["incident_title"]),
-                background=IncidentReportSection(content=report_sections["background"]),
-                meeting_attendees=IncidentReportSection(content=report_sections["meeting_attendees"]),
-                impact_assessment=IncidentReportSection(content=report_sections["impact_assessment"]),
-                criticality=IncidentReportSection(content=report_sections["criticality"])
-            )
-            return formal_report
-            
-        except json.JSONDecodeError as e:
-            print("Raw response:", response)
-            raise HTTPException(status_code=500, detail="Failed to parse AI response as JSON")
-        except KeyError as e:
-            print("Raw response:", response)
-            raise HTTPException(status_code=500, detail=f"Missing required section in response: {str(e)}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error generating incident report: {str(e)}")
-
+        return self.get_incident_report(prompt, 'modify_incident_report')
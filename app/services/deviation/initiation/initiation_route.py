@@ -7,24 +7,35 @@ from app.services.deviation.initiation.initiation_schema import (
     FormalIncidentReport,
     ModifyIncidentReportRequest
 )
-from app.services.deviation.initiation.initiation import Initiation
+from app.services.registry import get_initiation_service
+from app.services.utils.streaming import sse_response, structured_sse_response
 
 router= APIRouter()
-summary= Initiation()
 
 @router.post("/per_minute_initiation", response_model=PerMinuteInitiationResponse)
 async def generate_per_minute_initiation(request_data: PerMinuteInitiationRequest):
     try:
-        response = summary.get_per_minute_summary(request_data)
+        response = get_initiation_service().get_per_minute_summary(request_data)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/per_minute_initiation/stream")
+async def stream_per_minute_initiation(request_data: PerMinuteInitiationRequest):
+    """
+    Streaming variant of /per_minute_initiation (Server-Sent Events).
+    Sends a `field` event for each field (incident_title, criticality,
+    impact_assessment entries, ...) as soon as the model completes it, then a
+    `result` event with the PerMinuteInitiationResponse.
+    """
+    return structured_sse_response(get_initiation_service().stream_per_minute_summary(request_data))
+
+
 @router.post("/check_initiation")
 async def check_initiation_details(request_data: FinalCheckRequest):
     try:
-        response = summary.check_initiation_details(request_data)
+        response = get_initiation_service().check_initiation_details(request_data)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -44,17 +55,28 @@ async def generate_incident_report(request_data: FinalRequest):
     Returns a structured incident report according to pharmaceutical quality standards.
     """
     try:
-        response = summary.generate_formal_incident_report(request_data)
+        response = get_initiation_service().generate_formal_incident_report(request_data)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate_incident_report/stream")
+async def stream_incident_report(request_data: FinalRequest):
+    """
+    Streaming variant of /generate_incident_report (Server-Sent Events).
+    Sends `token` events with the model output as it is generated, then a
+    `result` event carrying the FormalIncidentReport, or an `error` event.
+    """
+    service = get_initiation_service()
+    return sse_response(service.stream_formal_incident_report(request_data), service.parse_formal_incident_report)
     
 
 
 @router.post("/modify_incident_report", response_model=FormalIncidentReport)
 async def modify_incident_report(request_data: ModifyIncidentReportRequest):
     try:
-        response = summary.modify_incident_report(request_data)
+        response = get_initiation_service().modify_incident_report(request_data)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -54,6 +54,14 @@ class FinalRequest(BaseModel):
 class IncidentReportSection(BaseModel):
     content: str
 
+class IncidentReportSections(BaseModel):
+    """What the model returns for a report: plain text per section"""
+    incident_title: str
+    background: str
+    meeting_attendees: str
+    impact_assessment: str
+    criticality: str
+
 class FormalIncidentReport(BaseModel):
     incident_title: IncidentReportSection
     background: IncidentReportSection
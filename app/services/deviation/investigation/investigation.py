@@ -1,12 +1,98 @@
-import re
 import json
+from pydantic import create_model
+from app.config.config import FINAL_REPORT_MODE
 from app.services.utils.transcription import VoiceTranscriber
 from app.services.deviation.investigation.investigation_schema import FirstTimeInvestigationRequest, InvestigationResponse,InvestigationRequest, FinalInvestigationReportResponse,RepeateInvestigationRequest
-import openai
 import os
+from app.services.registry import get_openai_client
+from app.services.utils.llm import (
+    StructuredOutputError,
+    create_chat_completion,
+    create_structured_completion,
+    stream_chat_completion,
+    stream_structured_completion,
+    structured_result,
+)
+from app.services.utils.report_sections import SectionEditor, existing_report, run_sections, section_model
+from app.services.utils.structured_output import parse_structured_output
+from app.services.utils.tracing import span
+
+# What each field of the final report should contain (shared by the section prompts)
+FINAL_REPORT_GUIDANCE = {
+  "background": "2-3 sentences describing what happened, when, where, who was involved, and immediate circumstances. Example: During in-process weight checks on Line 5, tablets were found below specification. Deviation identified by operators Michael E., Saidi M., and Rana S. Immediate escalation was made to QA.",
+  "immediate_actions": "List the immediate steps taken when the deviation was discovered - quarantine, stopping processes, notifications, etc. Example: Quarantined all tablets from last compliant in-process check. Stopped compression until investigation. Secured machine and notified QA. Batch record and settings reviewed.",
+  "discussion": "Cover Product Quality impact, Validation Impact, Compliance implications, Process controls, Equipment factors, Personnel factors, Documentation adequacy, and Most probable root cause statement. Include detailed analysis of the overall process, variables, environmental factors, equipment settings, validated parameters, documentation controls, SOPs, personnel training, equipment qualification, and maintenance. End with the most probable root cause statement.",
+  "root_cause_analysis": {
+    "FishboneAnalysis": {
+      "machine": "Specific machine-related factors like feeder malfunction, compression force variation, tooling wear, speed and low fill",
+      "material": "Material-related factors like blend flow issues, granule size variability, bulk density",
+      "people": "Human factors like operator errors, training deficiencies, procedural non-compliance",
+      "method": "Process-related factors like in-process check frequency, SOP adherence",
+      "measurement": "Measurement system issues like equipment calibration, weight check accuracy",
+      "environment": "Environmental factors like humidity/temperature affecting blend flow"
+    },
+    "FiveWhy": "Complete 5 Why analysis for the root cause identification"
+  },
+  "fishbone_diagram": [
+    {"machine": ["feeder malfunction", "compression force variation", "tooling wear", "speed and low fill"]},
+    {"material": ["blend flow issues", "granule size variability", "bulk density"]},
+    {"people": ["setup error", "adjustment deviation", "training gaps"]},
+    {"method": ["in-process check frequency", "SOP adherence"]},
+    {"measurement": ["equipment calibration", "weight check accuracy"]},
+    {"environment": ["humidity/temperature affecting blend flow"]}
+  ],
+  "historical_review": "Review of previous occurrences, trends, data analysis, equipment calibration/qualification records verification. Example: No recent findings; review of last 6 months deviations and PQR data ongoing. Equipment calibration/qualification records to be verified.",
+  "capa": "CAPA plan to prevent and early detection of non-conformance. Include Correction (immediate fixes), Corrective Action (root cause prevention), and Preventive Action (system-wide improvements)",
+  "impact_assessment": "Cover Patient Safety, Product Quality, and Validation impacts with specific risk levels and implications",
+  "conclusion": "Deviation classification (Major/Minor), key findings, CAPA summary, and meeting attendees. Example: Major deviation due to product quality and validation impact. CAPA to include: investigation closure, operator retraining if required, equipment review, possible SOP/in-process check frequency update. Meeting attendees: [list names]."
+}
+
+FISHBONE_REQUIREMENTS = '''Important Fishbone Diagram Requirements:
+For each category (machine, material, people, method, measurement, environment), list a maximum of 2 reasons.
+Each reason should be no longer than 2 words.'''
+
+# Final report sections that only depend on the investigation data, so they can be
+# generated concurrently ('sections' mode); the conclusion is written afterwards
+# from the drafted sections
+FINAL_REPORT_SECTIONS = {
+  'background': ('background', 'immediate_actions'),
+  'discussion': ('discussion',),
+  'root_cause_analysis': ('root_cause_analysis', 'fishbone_diagram'),
+  'historical_review': ('historical_review',),
+  'capa': ('capa',),
+  'impact_assessment': ('impact_assessment',),
+}
+FINAL_REPORT_SECTION_MODELS = {
+  name: section_model(FinalInvestigationReportResponse, name, fields)
+  for name, fields in FINAL_REPORT_SECTIONS.items()
+}
+FinalReportConclusion = create_model('FinalReportSection_conclusion', conclusion=(str, ...))
+
+# repeat_investigation: only the sections a change request affects are regenerated;
+# the conclusion summarises the other sections, so it is rewritten with any of them
+REPEAT_INVESTIGATION_EDITOR = SectionEditor(
+  'investigation', 'repeat_investigation', FinalInvestigationReportResponse, 'Final Investigation Report',
+  groups={**FINAL_REPORT_SECTIONS, 'conclusion': ('conclusion',)},
+  dependents={name: ('conclusion',) for name in ('discussion', 'root_cause_analysis', 'capa', 'impact_assessment')},
+  guidance=FINAL_REPORT_GUIDANCE,
+  instructions=FISHBONE_REQUIREMENTS
+)
+
+def _root_cause_analysis_object(items):
+  """
+  The repeat request carries root_cause_analysis as a list (usually the report's
+  single object, sometimes its keys split over several entries); the report
+  field is one RootCauseAnalysis object
+  """
+  merged = {}
+  for item in items:
+    merged.update(item)
+  return merged
+
+
 class InvestigationService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_openai_client()
 
 
     def initial_investigation(self, input: FirstTimeInvestigationRequest) -> InvestigationResponse:
@@ -97,11 +183,28 @@ class InvestigationService:
                 }}
               }}
               '''
-      response = self.get_openai_response(prompt)
-      parsed_response = self.clean_and_parse_json(response)
-      return InvestigationResponse(**parsed_response)
+      return self.get_structured_response(prompt, InvestigationResponse, 'initial_investigation')
 
     def per_minute_investigation(self, input: InvestigationRequest) -> InvestigationResponse:
+      try:
+        return structured_result(self.stream_per_minute_investigation(input))
+      except StructuredOutputError as e:
+        raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+
+    def stream_per_minute_investigation(self, input: InvestigationRequest):
+      """
+      Per-minute investigation as structured stream events: each field is reported
+      as soon as the model closes it, and schema-invalid output is retried early
+      (see llm.stream_structured_completion).
+      """
+      return stream_structured_completion(
+        self.client, 'investigation', 'per_minute_investigation', InvestigationResponse,
+        model="gpt-4.1",
+        messages=[{"role": "user", "content": self.create_per_minute_prompt(input)}],
+        temperature=0.7
+      )
+
+    def create_per_minute_prompt(self, input: InvestigationRequest) -> str:
       prompt = f'''
               You are an expert pharmaceutical deviation investigator with 20+ years of experience in GMP, quality systems, and regulatory compliance. Analyze the following transcript and provide a comprehensive investigation analysis.
               
@@ -187,12 +290,101 @@ class InvestigationService:
                 }}
               }}
               '''
-      response = self.get_openai_response(prompt)
-      parsed_response = self.clean_and_parse_json(response)
-      return InvestigationResponse(**parsed_response)
+      return prompt
+
+
+    def final_investigation_report(self, input: InvestigationRequest, mode: str = None) -> FinalInvestigationReportResponse:
+      """`mode` is 'single' (one completion) or 'sections'; defaults to FINAL_REPORT_MODE"""
+      if (mode or FINAL_REPORT_MODE) == 'sections':
+        return self.final_investigation_report_by_section(input)
+      prompt = self.create_final_report_prompt(input)
+      return self.get_structured_response(prompt, FinalInvestigationReportResponse, 'final_investigation_report')
+
+    def final_investigation_report_by_section(self, input: InvestigationRequest) -> FinalInvestigationReportResponse:
+      """
+      Generate the independent sections concurrently from the shared investigation
+      data, then write the conclusion in one consistency pass over the drafts.
+      Wall time is the slowest section plus the conclusion, not the whole report
+      generated in a single output stream.
+      """
+      context = self.create_report_context(input)
+      with span('final_report.sections', sections=len(FINAL_REPORT_SECTIONS)):
+        sections = {}
+        for section in run_sections(lambda name: self.generate_report_section(context, name), FINAL_REPORT_SECTIONS).values():
+          sections.update(section.model_dump())
+
+        conclusion = self.get_structured_response(
+          self.create_conclusion_prompt(input, sections), FinalReportConclusion, 'final_investigation_report:conclusion'
+        )
+      return FinalInvestigationReportResponse(**sections, conclusion=conclusion.conclusion)
+
+    def generate_report_section(self, context: str, name: str):
+      return self.get_structured_response(
+        self.create_section_prompt(context, name), FINAL_REPORT_SECTION_MODELS[name], f'final_investigation_report:{name}'
+      )
 
+    def create_report_context(self, input: InvestigationRequest) -> str:
+      return f'''Existing Investigation Data:
+Transcript: {input.transcript}
+Background: {input.existing_background}
+Discussion: {input.existing_discussion}
+Root Cause Analysis: {input.existing_root_cause_analysis}
+Final Assessment: {input.existing_final_assessment}
+Historic Review: {input.existing_historic_review}
+CAPA: {input.existing_capa}
+Attendees: {input.existing_attendees}'''
+
+    def create_section_prompt(self, context: str, name: str) -> str:
+      structure = json.dumps({field: FINAL_REPORT_GUIDANCE[field] for field in FINAL_REPORT_SECTIONS[name]}, indent=2)
+      requirements = FISHBONE_REQUIREMENTS if 'fishbone_diagram' in FINAL_REPORT_SECTIONS[name] else ''
+      return f'''
+You are an expert pharmaceutical deviation investigator with 20+ years of experience in GMP, quality systems, and regulatory compliance. You will be given a audio transcript of the investigation meeting along with existing investigation information.
 
-    def final_investigation_report(self, input: InvestigationRequest) -> FinalInvestigationReportResponse:
+You are writing part of a Final Investigation Report; the other sections are written separately. Using the provided existing investigation fragments, write only the sections below and return them as a JSON object following this exact template format.
+
+JSON Structure Required:
+
+{structure}
+
+{context}
+
+{requirements}
+'''
+
+    def create_conclusion_prompt(self, input: InvestigationRequest, sections: dict) -> str:
+      return f'''
+You are an expert pharmaceutical deviation investigator with 20+ years of experience in GMP, quality systems, and regulatory compliance.
+
+Below are the drafted sections of a Final Investigation Report. Write its conclusion so that it is consistent with them (classification, findings and CAPA must match the drafts).
+
+JSON Structure Required:
+
+{json.dumps({"conclusion": FINAL_REPORT_GUIDANCE["conclusion"]}, indent=2)}
+
+Drafted Sections:
+{json.dumps(sections, indent=2)}
+
+Attendees: {input.existing_attendees}
+'''
+
+    def stream_final_investigation_report(self, input: InvestigationRequest):
+      """
+      Streaming variant of final_investigation_report: yields the raw model output
+      as it arrives; pass the joined text to parse_final_investigation_report.
+      """
+      return self.stream_openai_response(
+        self.create_final_report_prompt(input), 'final_investigation_report', FinalInvestigationReportResponse
+      )
+
+    def parse_final_investigation_report(self, response: str) -> FinalInvestigationReportResponse:
+      try:
+        return parse_structured_output(
+          response, FinalInvestigationReportResponse, 'investigation', 'final_investigation_report'
+        )
+      except StructuredOutputError as e:
+        raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+
+    def create_final_report_prompt(self, input: InvestigationRequest) -> str:
       prompt = f'''
 You are an expert pharmaceutical deviation investigator with 20+ years of experience in GMP, quality systems, and regulatory compliance. You will be given a audio transcript of the investigation meeting along with existing investigation information.
 
@@ -229,27 +421,22 @@ JSON Structure Required:
   "conclusion": "Deviation classification (Major/Minor), key findings, CAPA summary, and meeting attendees. Example: Major deviation due to product quality and validation impact. CAPA to include: investigation closure, operator retraining if required, equipment review, possible SOP/in-process check frequency update. Meeting attendees: [list names]."
 }}
 
-Existing Investigation Data:
-Transcript: {input.transcript}
-Background: {input.existing_background}
-Discussion: {input.existing_discussion}
-Root Cause Analysis: {input.existing_root_cause_analysis}
-Final Assessment: {input.existing_final_assessment}
-Historic Review: {input.existing_historic_review}
-CAPA: {input.existing_capa}
-Attendees: {input.existing_attendees}
+{self.create_report_context(input)}
 
-Important Fishbone Diagram Requirements:
-For each category (machine, material, people, method, measurement, environment), list a maximum of 2 reasons.
-Each reason should be no longer than 2 words.
+{FISHBONE_REQUIREMENTS}
 
 '''
-      response = self.get_openai_response(prompt)
-      parsed_response = self.clean_and_parse_json(response)
-      
-      return parsed_response
+      return prompt
     
     def repeat_investigation(self, input:RepeateInvestigationRequest) -> FinalInvestigationReportResponse:
+        existing = existing_report(input, FinalInvestigationReportResponse, renamed={'historical_review': 'historic_review'})
+        existing['root_cause_analysis'] = _root_cause_analysis_object(input.existing_root_cause_analysis)
+        edited = REPEAT_INVESTIGATION_EDITOR.edit(
+            self.client, self.get_structured_response, existing, input.transcription
+        )
+        if edited is not None:
+            return edited
+
         # Build a strict prompt that maps inputs to the expected output schema exactly.
         prompt = f'''
                 You are an expert pharmaceutical deviation investigation with 20+ years of experience in GMP, quality systems, and regulatory compliance. Change the existing investigation based on the new transcript provided. 
@@ -303,36 +490,34 @@ Each reason should be no longer than 2 words.
 
                 Use the provided transcription and existing fields to produce the final report now.
                 '''
-        response = self.get_openai_response(prompt)
-        parsed_response = self.clean_and_parse_json(response)
-        return FinalInvestigationReportResponse(**parsed_response)
+        return self.get_structured_response(prompt, FinalInvestigationReportResponse, 'repeat_investigation')
     
-    def get_openai_response(self, prompt: str) -> str:
-        completion = self.client.chat.completions.create(
+    def get_openai_response(self, prompt: str, method: str = 'get_openai_response') -> str:
+        completion = create_chat_completion(
+            self.client, 'investigation', method,
             model="gpt-4.1",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7
         )
         return completion.choices[0].message.content.strip()
-    
-    def clean_and_parse_json(self, response: str) -> dict:
-        """Clean AI response and parse as JSON, handling common formatting issues"""
+
+    def get_structured_response(self, prompt: str, response_model, method: str):
+        """Same request as get_openai_response, answered as a validated `response_model`"""
         try:
-            # Remove markdown code blocks if present
-            if response.startswith('```json'):
-                response = response.replace('```json', '').replace('```', '').strip()
-            elif response.startswith('```'):
-                response = response.replace('```', '').strip()
-            
-            # Try to parse the JSON
-            return json.loads(response)
-        except json.JSONDecodeError as e:
-            # If JSON parsing fails, try to fix common issues
-            try:
-                # Replace actual newlines with \\n in string values
-                import re
-                # This regex finds content between quotes and replaces actual newlines with \n
-                response = re.sub(r'"([^"]*)"', lambda m: '"' + m.group(1).replace('\n', '\\n').replace('\r', '') + '"', response)
-                return json.loads(response)
-            except Exception:
-                raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
\ No newline at end of file
+            return create_structured_completion(
+                self.client, 'investigation', method, response_model,
+                model="gpt-4.1",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7
+            )
+        except StructuredOutputError as e:
+            raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+
+    def stream_openai_response(self, prompt: str, method: str = 'stream_openai_response', response_model=None):
+        """Same request as get_openai_response, yielding the content as it is generated"""
+        return stream_chat_completion(
+            self.client, 'investigation', method, response_model=response_model,
+            model="gpt-4.1",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7
+        )
@@ -1,17 +1,22 @@
+from typing import Literal, Optional
 from fastapi import APIRouter, HTTPException
-from app.services.deviation.investigation.investigation import InvestigationService
+from app.services.registry import get_investigation_service
+from app.services.utils.document_store import document_entry
+from app.services.utils.streaming import sse_response, structured_sse_response
 from app.services.deviation.investigation.investigation_schema import (
    InvestigationResponse,FirstTimeInvestigationRequest,InvestigationRequest, FinalInvestigationReportResponse,RepeateInvestigationRequest
 )
 
 router = APIRouter()
-investigation= InvestigationService()
 
 @router.post("/first-time-request", response_model=InvestigationResponse)
 async def analyze_single_investigation(request: FirstTimeInvestigationRequest):
-
+    if request.document_ids:
+        request = request.model_copy(update={'document_information': request.document_information + [
+            document_entry(document_id) for document_id in request.document_ids
+        ]})
     try:
-        response = investigation.initial_investigation(request)
+        response = get_investigation_service().initial_investigation(request)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -19,25 +24,52 @@ async def analyze_single_investigation(request: FirstTimeInvestigationRequest):
 @router.post("/per_minute_investigation", response_model=InvestigationResponse)
 async def generate_per_minute_initiation(request_data: InvestigationRequest):
     try:
-        response = investigation.per_minute_investigation(request_data)
+        response = get_investigation_service().per_minute_investigation(request_data)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/per_minute_investigation/stream")
+async def stream_per_minute_investigation(request_data: InvestigationRequest):
+    """
+    Streaming variant of /per_minute_investigation (Server-Sent Events).
+    Sends a `field` event for each field as soon as the model completes it,
+    then a `result` event with the InvestigationResponse.
+    """
+    return structured_sse_response(get_investigation_service().stream_per_minute_investigation(request_data))
     
 
 @router.post("/final_investigation_report", response_model=FinalInvestigationReportResponse)
-async def generate_final_investigation_report(request_data: InvestigationRequest):
+async def generate_final_investigation_report(request_data: InvestigationRequest,
+                                              mode: Optional[Literal['single', 'sections']] = None):
+    """
+    `mode=sections` generates the report sections concurrently and writes the
+    conclusion from them; by default FINAL_REPORT_MODE decides.
+    """
     try:
-        response = investigation.final_investigation_report(request_data)
+        response = get_investigation_service().final_investigation_report(request_data, mode)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/final_investigation_report/stream")
+async def stream_final_investigation_report(request_data: InvestigationRequest):
+    """
+    Streaming variant of /final_investigation_report (Server-Sent Events).
+    Sends `token` events as the report is generated, then a `result` event
+    carrying the FinalInvestigationReportResponse, or an `error` event.
+    """
+    service = get_investigation_service()
+    return sse_response(service.stream_final_investigation_report(request_data),
+                        service.parse_final_investigation_report)
     
 
 @router.post("/modify_investigation_report", response_model=FinalInvestigationReportResponse)
 async def repeat_investigation_report(request_data: RepeateInvestigationRequest):
     try:
-        response = investigation.repeat_investigation(request_data)
+        response = get_investigation_service().repeat_investigation(request_data)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
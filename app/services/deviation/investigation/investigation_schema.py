@@ -36,7 +36,9 @@ class CAPA(BaseModel):
 class FirstTimeInvestigationRequest(BaseModel):
     existing_background_details:Dict[str, Any]
     existing_impact_assessment: Dict[str, Dict[str, Any]]
-    document_information: List[Dict[str, Any]]
+    document_information: List[Dict[str, Any]] = Field(default_factory=list)
+    # Documents uploaded to /documents, added to document_information by the route
+    document_ids: Optional[List[str]] = None
 
 class InvestigationRequest(BaseModel):
     transcript: str
@@ -1,8 +1,30 @@
 import os
 import json
-import openai
 from .quality_review_schema import PerMinuteReview, PerMinuteResponse, FinalQualityReviewRequest, FinalQualityReviewResponse,RepeatReviewRequest
-import re
+from app.services.registry import get_openai_client
+from app.services.utils.llm import StructuredOutputError, create_chat_completion, create_structured_completion, stream_chat_completion
+from app.services.utils.report_sections import SectionEditor, existing_report
+from app.services.utils.structured_output import parse_structured_output
+
+# repeat_review: only the sections a change request affects are regenerated; the
+# conclusion summarises the analysis sections, so it is rewritten with any of them
+REPEAT_REVIEW_EDITOR = SectionEditor(
+    'quality_review', 'repeat_review', FinalQualityReviewResponse, 'Final Quality Review',
+    groups={
+        'background': ('background', 'immediate_actions'),
+        'discussion': ('discussion',),
+        'root_cause_analysis': ('root_cause_analysis', 'fishbone_diagram'),
+        'historical_review': ('historical_review',),
+        'capa': ('capa',),
+        'impact_assessment': ('impact_assessment',),
+        'conclusion': ('conclusion',),
+    },
+    dependents={
+        name: ('conclusion',) for name in ('discussion', 'root_cause_analysis', 'capa', 'impact_assessment')
+    },
+    instructions='Preserve /red markers that are already there and do not add new /red markers. '
+                 'root_cause_analysis and fishbone_diagram must be lists of dictionaries matching the existing structure.'
+)
 
 class QualityReviewer:
     """
@@ -11,7 +33,7 @@ class QualityReviewer:
     """
     
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_openai_client()
 
 
 
@@ -58,11 +80,26 @@ class QualityReviewer:
                 }}
                 '''
 
-        response = self.get_openai_response(prompt)
-        parsed_response = self.clean_and_parse_json(response)
-        return PerMinuteResponse(**parsed_response)
+        return self.get_structured_response(prompt, PerMinuteResponse, 'per_minute_review')
 
     def final_review(self, input:FinalQualityReviewRequest) -> FinalQualityReviewResponse:
+        prompt = self.create_final_review_prompt(input)
+        return self.get_structured_response(prompt, FinalQualityReviewResponse, 'final_review')
+
+    def stream_final_review(self, input:FinalQualityReviewRequest):
+        """
+        Streaming variant of final_review: yields the raw model output as it
+        arrives; pass the joined text to parse_final_review.
+        """
+        return self.stream_openai_response(self.create_final_review_prompt(input), 'final_review', FinalQualityReviewResponse)
+
+    def parse_final_review(self, response: str) -> FinalQualityReviewResponse:
+        try:
+            return parse_structured_output(response, FinalQualityReviewResponse, 'quality_review', 'final_review')
+        except StructuredOutputError as e:
+            raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+
+    def create_final_review_prompt(self, input:FinalQualityReviewRequest) -> str:
         # Build a strict prompt that maps inputs to the expected output schema exactly.
         prompt = f'''
                 You are an expert pharmaceutical deviation investigation reviewer with 20+ years of experience in GMP, quality systems, and regulatory compliance.
@@ -106,12 +143,18 @@ class QualityReviewer:
 
                 Use the provided transcription and existing fields to produce the final report now.
                 '''
-        response = self.get_openai_response(prompt)
-        parsed_response = self.clean_and_parse_json(response)
-        return FinalQualityReviewResponse(**parsed_response)
+        return prompt
     
 
     def repeat_review(self, input:RepeatReviewRequest) -> FinalQualityReviewResponse:
+        edited = REPEAT_REVIEW_EDITOR.edit(
+            self.client, self.get_structured_response,
+            existing_report(input, FinalQualityReviewResponse, renamed={'historical_review': 'historic_review'}),
+            input.transcription
+        )
+        if edited is not None:
+            return edited
+
         # Build a strict prompt that maps inputs to the expected output schema exactly.
         prompt = f'''
                 You are an expert pharmaceutical deviation investigation with 20+ years of experience in GMP, quality systems, and regulatory compliance. Change the existing investigation based on the new transcript provided. 
@@ -153,31 +196,34 @@ class QualityReviewer:
 
                 Use the provided transcription and existing fields to produce the final report now.
                 '''
-        response = self.get_openai_response(prompt)
-        parsed_response = self.clean_and_parse_json(response)
-        return FinalQualityReviewResponse(**parsed_response)
+        return self.get_structured_response(prompt, FinalQualityReviewResponse, 'repeat_review')
 
-    def get_openai_response(self, prompt: str) -> str:
-        completion = self.client.chat.completions.create(
+    def get_openai_response(self, prompt: str, method: str = 'get_openai_response') -> str:
+        completion = create_chat_completion(
+            self.client, 'quality_review', method,
             model="gpt-4.1",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7
         )
         return completion.choices[0].message.content.strip()
-    
-    def clean_and_parse_json(self, response: str) -> dict:
-        """Clean AI response and parse as JSON, handling common formatting issues"""
-        try:
-            if response.startswith('```json'):
-                response = response.replace('```json', '').replace('```', '').strip()
-            elif response.startswith('```'):
-                response = response.replace('```', '').strip()
-
-            return json.loads(response)
-        except json.JSONDecodeError as e:
-            try:               
-                response = re.sub(r'"([^"]*)"', lambda m: '"' + m.group(1).replace('\n', '\\n').replace('\r', '') + '"', response)
-                return json.loads(response)
-            except Exception:
-                raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
 
+    def get_structured_response(self, prompt: str, response_model, method: str):
+        """Same request as get_openai_response, answered as a validated `response_model`"""
+        try:
+            return create_structured_completion(
+                self.client, 'quality_review', method, response_model,
+                model="gpt-4.1",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7
+            )
+        except StructuredOutputError as e:
+            raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+
+    def stream_openai_response(self, prompt: str, method: str = 'stream_openai_response', response_model=None):
+        """Same request as get_openai_response, yielding the content as it is generated"""
+        return stream_chat_completion(
+            self.client, 'quality_review', method, response_model=response_model,
+            model="gpt-4.1",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7
+        )
@@ -1,16 +1,24 @@
 from fastapi import APIRouter, HTTPException
-from app.services.deviation.quality_review.quality_review import QualityReviewer
+from app.services.registry import get_quality_reviewer
+from app.services.utils.document_store import document_entry
+from app.services.utils.streaming import sse_response
 from app.services.deviation.quality_review.quality_review_schema import PerMinuteReview, PerMinuteResponse, FinalQualityReviewRequest, FinalQualityReviewResponse,RepeatReviewRequest
 
 
 router = APIRouter()
-quality_reviewer = QualityReviewer()
+
+
+def with_stored_document(request: FinalQualityReviewRequest) -> FinalQualityReviewRequest:
+    """The request with `document` filled in from its document_id (404/409 raised as is)"""
+    if request.document_id and request.document is None:
+        return request.model_copy(update={'document': document_entry(request.document_id)})
+    return request
 
     
 @router.post("/per_minute_review", response_model=PerMinuteResponse)
 async def get_per_minute_review(request_data: PerMinuteReview):
     try:
-        response = quality_reviewer.per_minute_review(request_data)
+        response = get_quality_reviewer().per_minute_review(request_data)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -18,19 +26,31 @@ async def get_per_minute_review(request_data: PerMinuteReview):
 
 @router.post("/final_review", response_model=FinalQualityReviewResponse)
 async def get_final_review(request: FinalQualityReviewRequest):
-
+    request = with_stored_document(request)
     try:
-        response = quality_reviewer.final_review(request)
+        response = get_quality_reviewer().final_review(request)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/final_review/stream")
+async def stream_final_review(request: FinalQualityReviewRequest):
+    """
+    Streaming variant of /final_review (Server-Sent Events).
+    Sends `token` events as the review is generated, then a `result` event
+    carrying the FinalQualityReviewResponse, or an `error` event.
+    """
+    request = with_stored_document(request)
+    reviewer = get_quality_reviewer()
+    return sse_response(reviewer.stream_final_review(request), reviewer.parse_final_review)
+
+
 @router.post("/repeat_review", response_model=FinalQualityReviewResponse)
 async def get_repeat_review(request: RepeatReviewRequest):
 
     try:
-        response = quality_reviewer.repeat_review(request)
+        response = get_quality_reviewer().repeat_review(request)
         return response 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -14,6 +14,7 @@ class PerMinuteResponse(BaseModel):
 class FinalQualityReviewRequest(BaseModel):
     transcription: str
     document: Optional[Dict[str, Any]] = None
+    document_id: Optional[str] = None  # a document uploaded to /documents, used when `document` is not given
     existing_background: str
     existing_immediate_actions: str 
     existing_discussion: str
@@ -0,0 +1,178 @@
+"""
+Service Registry
+One shared instance per service, created lazily on first use. Service modules
+(and the heavy libraries they pull in) are only imported by the factories, so
+importing the app stays cheap and nothing is initialized twice.
+"""
+
+import threading
+
+from app.config.logging_config import get_logger
+
+logger = get_logger('service_registry')
+
+
+class ServiceRegistry:
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        """Register a zero-argument factory under `name`"""
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        """Return the shared instance for `name`, creating it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Unknown service: {name}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def is_created(self, name):
+        """Check whether a service has been instantiated yet"""
+        return name in self._instances
+
+    def preload(self, names=None):
+        """Instantiate services ahead of time (e.g. in the background after startup)"""
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning("preload_failed", service=name, error=str(e))
+
+    def reset(self, name=None):
+        """Drop cached instances so they are rebuilt on next use"""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+registry = ServiceRegistry()
+
+
+# ---------------------------------------------------------------------------
+# Factories (imports are deferred until the service is first needed)
+# ---------------------------------------------------------------------------
+
+def _openai_client():
+    import openai
+    from app.config.config import OPENAI_API_KEY, OPENAI_BASE_URL
+    return openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+
+def _file_converter():
+    from app.services.utils.convert_file import FileConverter
+    return FileConverter()
+
+
+def _file_processor():
+    from app.services.utils.process_file import FileProcessor
+    return FileProcessor()
+
+
+def _document_ocr():
+    from app.services.utils.document_ocr import DocumentOCR
+    return DocumentOCR()
+
+
+def _ai_analyzer():
+    from app.services.utils.ai_analysis import AIAnalyzer
+    return AIAnalyzer()
+
+
+def _voice_transcriber():
+    from app.services.utils.transcription import VoiceTranscriber
+    return VoiceTranscriber()
+
+
+def _initiation_service():
+    from app.services.deviation.initiation.initiation import Initiation
+    return Initiation()
+
+
+def _investigation_service():
+    from app.services.deviation.investigation.investigation import InvestigationService
+    return InvestigationService()
+
+
+def _quality_reviewer():
+    from app.services.deviation.quality_review.quality_review import QualityReviewer
+    return QualityReviewer()
+
+
+def _qta_review_service():
+    from app.services.QTA.QTA_review.qta_review import QTAreview
+    return QTAreview()
+
+
+def _qta_revision_service():
+    from app.services.QTA.QTA_revision.QTA_revision import QTARevision
+    return QTARevision()
+
+
+registry.register('openai_client', _openai_client)
+registry.register('file_converter', _file_converter)
+registry.register('file_processor', _file_processor)
+registry.register('document_ocr', _document_ocr)
+registry.register('ai_analyzer', _ai_analyzer)
+registry.register('voice_transcriber', _voice_transcriber)
+registry.register('initiation', _initiation_service)
+registry.register('investigation', _investigation_service)
+registry.register('quality_review', _quality_reviewer)
+registry.register('qta_review', _qta_review_service)
+registry.register('qta_revision', _qta_revision_service)
+
+
+def get_openai_client():
+    return registry.get('openai_client')
+
+
+def get_file_converter():
+    return registry.get('file_converter')
+
+
+def get_file_processor():
+    return registry.get('file_processor')
+
+
+def get_document_ocr():
+    return registry.get('document_ocr')
+
+
+def get_ai_analyzer():
+    return registry.get('ai_analyzer')
+
+
+def get_voice_transcriber():
+    return registry.get('voice_transcriber')
+
+
+def get_initiation_service():
+    return registry.get('initiation')
+
+
+def get_investigation_service():
+    return registry.get('investigation')
+
+
+def get_quality_reviewer():
+    return registry.get('quality_review')
+
+
+def get_qta_review_service():
+    return registry.get('qta_review')
+
+
+def get_qta_revision_service():
+    return registry.get('qta_revision')
@@ -4,7 +4,7 @@ Enhanced AI Analysis Module
 Improved incident analysis with better prompting and parsing
 """
 
-import requests
+import httpx
 import json
 import re
 import os
@@ -14,7 +14,17 @@ import sys
 app_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, app_dir)
 
-from app.config.config import OPENAI_API_KEY
+from app.config.config import OPENAI_API_KEY, OPENAI_BASE_URL
+from app.services.utils.http_client import get_http_client
+from app.services.registry import get_ai_analyzer
+from app.services.utils.metrics import JSON_PARSE_SECONDS, LLM_CALL_SECONDS, timed
+from app.services.utils.tracing import span
+from app.services.utils.usage import record_llm_usage
+from app.config.logging_config import get_logger
+
+logger = get_logger('ai_analyzer')
+
+OPENAI_CHAT_COMPLETIONS_URL = f'{OPENAI_BASE_URL}/chat/completions'
 
 class AIAnalyzer:
     def __init__(self):
@@ -25,10 +35,11 @@ class AIAnalyzer:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
     
-    def analyze_with_prompt(self, prompt: str) -> str:
+    async def analyze_with_prompt(self, prompt: str, method: str = 'analyze_with_prompt') -> str:
         """
         Analyze content with a custom prompt and return the AI's response as a string.
-        Enhanced with better error handling and debugging.
+        Uses the shared pooled HTTP client; cancelling the awaiting task aborts the request.
+        `method` labels the call in the LLM latency metrics.
         """
         try:
             headers = {
@@ -51,15 +62,21 @@ class AIAnalyzer:
                 'temperature': 0.3,
                 'top_p': 0.9
             }
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers=headers,
-                json=data,
-                timeout=120
-            )
-            print("DEBUG: Raw AI response:", response.text)
+            client = get_http_client()
+            with span('llm.chat', service='ai_analyzer', method=method, model=data['model']), \
+                    timed(LLM_CALL_SECONDS, service='ai_analyzer', method=method) as labels:
+                response = await client.post(
+                    OPENAI_CHAT_COMPLETIONS_URL,
+                    headers=headers,
+                    json=data,
+                    timeout=120
+                )
+                if response.status_code != 200:
+                    labels['outcome'] = 'error'
+            logger.debug("model_response", method=method, status_code=response.status_code, response=response.text)
             if response.status_code == 200:
                 result = response.json()
+                record_llm_usage('ai_analyzer', method, result.get('model') or data['model'], result.get('usage'))
                 ai_response = result['choices'][0]['message']['content'].strip()
                 if not ai_response:
                     return None
@@ -67,31 +84,34 @@ class AIAnalyzer:
                     return ai_response
                 return ai_response
             elif response.status_code == 429:
+                logger.warning("llm_rate_limited", method=method)
                 return None
             elif response.status_code == 401:
                 return None
             elif response.status_code == 400:
                 return None
             else:
+                logger.warning("llm_call_failed", method=method, status_code=response.status_code)
                 return None
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
+            logger.warning("llm_call_timed_out", method=method)
             return None
-        except requests.exceptions.ConnectionError:
+        except httpx.ConnectError:
             return None
-        except requests.exceptions.RequestException:
+        except httpx.HTTPError:
             return None
         except json.JSONDecodeError:
             return None
         except Exception:
-            import traceback
+            logger.exception("llm_call_failed", method=method)
             return None
 
-    def analyze_incident(self, transcribed_text):
+    async def analyze_incident(self, transcribed_text):
         """
         Analyze transcribed text and extract incident information
         """
         try:
-            structured_data = self._get_structured_analysis(transcribed_text)
+            structured_data = await self._get_structured_analysis(transcribed_text)
             if structured_data:
                 return structured_data
             else:
@@ -99,7 +119,7 @@ class AIAnalyzer:
         except Exception as e:
             return None
 
-    def _get_structured_analysis(self, transcribed_text):
+    async def _get_structured_analysis(self, transcribed_text):
         """
         Get structured analysis using improved prompting
         """
@@ -137,11 +157,11 @@ TRANSCRIPT TO ANALYZE:
             prompt += truncated_text
             prompt += """
 """
-            print("DEBUG: FINAL AI PROMPT SENT TO OPENAI:\n", prompt)
-            analysis_text = self.analyze_with_prompt(prompt)
-            print("DEBUG: analysis_text from AI:", analysis_text)
+            logger.debug("incident_prompt", prompt=prompt)
+            analysis_text = await self.analyze_with_prompt(prompt, 'analyze_incident')
             if analysis_text and self._validate_analysis_text(analysis_text):
-                incident_data = self._parse_enhanced_response(analysis_text)
+                with timed(JSON_PARSE_SECONDS, service='ai_analyzer'):
+                    incident_data = self._parse_enhanced_response(analysis_text)
                 if incident_data and self._validate_analysis(incident_data):
                     return incident_data
                 else:
@@ -248,7 +268,7 @@ TRANSCRIPT TO ANALYZE:
         # If nothing meaningful found, still return False
         return False
 
-    def get_summary_analysis(self, transcribed_text):
+    async def get_summary_analysis(self, transcribed_text):
         """
         Get a quick summary analysis of the incident
         """
@@ -260,13 +280,13 @@ Provide a brief 2-3 sentence summary of this incident:
 
 Focus on: what happened, who was involved, and the key concern.
 """
-            return self.analyze_with_prompt(prompt)
+            return await self.analyze_with_prompt(prompt, 'get_summary_analysis')
         except Exception as e:
             return None
 
 
 
-    def analyze_investigation_context(self, context: str) -> dict:
+    async def analyze_investigation_context(self, context: str) -> dict:
         """
         Specialized method for investigation context analysis.
         """
@@ -320,9 +340,10 @@ Focus on: what happened, who was involved, and the key concern.
         }}
         """
         try:
-            response = self.analyze_with_prompt(investigation_prompt)
+            response = await self.analyze_with_prompt(investigation_prompt, 'analyze_investigation_context')
             try:
-                return json.loads(response)
+                with timed(JSON_PARSE_SECONDS, service='ai_analyzer'):
+                    return json.loads(response)
             except json.JSONDecodeError:
                 return {
                     "analysis": response,
@@ -336,13 +357,13 @@ Focus on: what happened, who was involved, and the key concern.
             }
 
     @staticmethod
-    def analyze_prompt(prompt):
+    async def analyze_prompt(prompt):
         """
         Generic method to analyze any prompt using OpenAI
         """
         try:
-            analyzer = AIAnalyzer()
-            response_text = analyzer.analyze_with_prompt(prompt)
+            analyzer = get_ai_analyzer()
+            response_text = await analyzer.analyze_with_prompt(prompt, 'analyze_prompt')
             if response_text:
                 return {
                     "analysis": response_text,
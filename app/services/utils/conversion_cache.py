@@ -0,0 +1,97 @@
+"""
+Converted-PDF Cache
+On-disk cache of conversion outputs keyed by the SHA-256 of the source bytes
+plus the converter version, with least-recently-used eviction under a size cap.
+Safe to share between the API process and conversion pool workers.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from app.config.config import CONVERSION_CACHE_DIR, CONVERSION_CACHE_MAX_MB
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ConversionCache:
+    def __init__(self, cache_dir=None, max_size_mb=None):
+        """Initialize the cache directory and size cap"""
+        self.cache_dir = cache_dir or CONVERSION_CACHE_DIR
+        self.max_size_mb = CONVERSION_CACHE_MAX_MB if max_size_mb is None else max_size_mb
+        self.max_size_bytes = self.max_size_mb * 1024 * 1024
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, input_path, converter_version):
+        """Cache key: hash of the input bytes, its extension and the converter version"""
+        digest = hashlib.sha256()
+        with open(input_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        extension = Path(input_path).suffix.lower().lstrip('.')
+        return f"{digest.hexdigest()}-{extension}-v{converter_version}"
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, key, output_path):
+        """Materialize a cached PDF at output_path. Returns True on a hit."""
+        entry_path = self._entry_path(key)
+        try:
+            # Touch the entry so eviction treats it as recently used
+            os.utime(entry_path)
+            # A copy, not a hard link: callers may modify or append to the
+            # output, which must never reach the shared cache entry
+            shutil.copyfile(entry_path, output_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put(self, key, pdf_path):
+        """Store a freshly converted PDF and evict old entries if over the cap"""
+        fd, staging_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(pdf_path, staging_path)
+            # Atomic publish so concurrent readers never see a partial file
+            os.replace(staging_path, self._entry_path(key))
+        except Exception:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits its size cap"""
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+# Shared cache instance (None when caching is disabled)
+_conversion_cache = None
+def get_conversion_cache():
+    global _conversion_cache
+    if _conversion_cache is None and CONVERSION_CACHE_MAX_MB > 0:
+        _conversion_cache = ConversionCache()
+    return _conversion_cache
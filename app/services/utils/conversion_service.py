@@ -0,0 +1,359 @@
+"""
+Document Conversion Service
+Runs FileConverter jobs in a pool of warm worker processes so CPU-bound
+reportlab/pandas rendering scales across cores instead of holding the GIL
+of the API process.
+
+When a hung job forces the pool to be recycled (or a worker dies and breaks
+it), the other jobs that were queued or running in that pool are submitted
+again to the fresh pool instead of failing with it.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from app.config.config import (
+    CONVERSION_WORKERS,
+    CONVERSION_TIMEOUT_SECONDS,
+    CONVERSION_MEMORY_LIMIT_MB,
+    CONVERSION_MAX_TASKS_PER_CHILD,
+)
+from app.config.logging_config import get_logger
+from app.services.utils.metrics import CONVERSION_SECONDS, timed
+from app.services.utils.profiling import profile_artifact_path, profiled
+from app.services.utils.tracing import span
+
+# Extra time the parent waits beyond the in-worker timeout before it
+# considers the worker hung and recycles the whole pool
+HARD_TIMEOUT_GRACE_SECONDS = 10.0
+# Times a job is submitted in total when the pool it was queued on is recycled or breaks
+MAX_JOB_ATTEMPTS = 2
+# Before 3.12, ProcessPoolExecutor stops dispatching jobs once it has replaced a
+# worker that reached max_tasks_per_child (CPython gh-115634), so no recycling there
+WORKER_RECYCLING_SUPPORTED = sys.version_info >= (3, 12)
+
+logger = get_logger('conversion_service')
+
+
+class ConversionTimeoutError(Exception):
+    """Raised when a conversion job exceeds its time budget"""
+
+
+class ConversionInterruptedError(Exception):
+    """Raised when a job was lost with its pool more often than it may be retried (safe to retry later)"""
+
+
+# ---------------------------------------------------------------------------
+# Worker-side functions (executed inside pool processes)
+# ---------------------------------------------------------------------------
+
+_worker_converter = None
+_job_timed_out = False
+
+
+def _init_worker(memory_limit_bytes):
+    """Apply resource limits and pre-import heavy libraries once per worker"""
+    global _worker_converter
+
+    if memory_limit_bytes:
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ImportError, ValueError, OSError):
+            pass  # Limits unsupported on this platform
+
+    # Warm up: import pandas/reportlab and build the stylesheet before the first job
+    import pandas  # noqa: F401
+    from reportlab.lib.styles import getSampleStyleSheet
+    getSampleStyleSheet()
+
+    from app.services.utils.convert_file import FileConverter
+    _worker_converter = FileConverter()
+
+
+def _on_job_timeout(signum, frame):
+    global _job_timed_out
+    _job_timed_out = True
+    raise ConversionTimeoutError("Conversion exceeded its time limit")
+
+
+def _run_conversion(input_path, output_path, method, timeout, profile_path=None):
+    """
+    Convert a single file inside a worker, enforcing the per-job timeout.
+    With `profile_path` the job runs under cProfile and its stats are dumped
+    there (the parent's request profiler cannot see into worker processes).
+    """
+    global _job_timed_out
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(_run_conversion, input_path, output_path, method, timeout)
+        finally:
+            profiler.dump_stats(profile_path)
+
+    _job_timed_out = False
+    converter = _worker_converter
+    if converter is None:
+        from app.services.utils.convert_file import FileConverter
+        converter = FileConverter()
+
+    use_timer = bool(timeout) and hasattr(signal, 'setitimer')
+    if use_timer:
+        previous_handler = signal.signal(signal.SIGALRM, _on_job_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        if method:
+            getattr(converter, method)(input_path, output_path)
+            return output_path
+        return converter.convert_to_pdf(input_path, output_path)
+    except Exception:
+        # FileConverter wraps errors in a generic Exception; surface timeouts as such
+        if _job_timed_out:
+            raise ConversionTimeoutError(f"Conversion of {os.path.basename(input_path)} timed out after {timeout}s")
+        raise
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _format_label(input_path):
+    return Path(input_path).suffix.lower().lstrip('.') or 'unknown'
+
+
+# ---------------------------------------------------------------------------
+# Parent-side service
+# ---------------------------------------------------------------------------
+
+class ConversionService:
+    def __init__(self, max_workers=None, timeout=None, memory_limit_mb=None, max_tasks_per_child=None):
+        """Initialize the conversion service (the pool itself starts lazily)"""
+        self.max_workers = CONVERSION_WORKERS if max_workers is None else max_workers
+        self.timeout = CONVERSION_TIMEOUT_SECONDS if timeout is None else timeout
+        self.memory_limit_mb = CONVERSION_MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+        self.max_tasks_per_child = (
+            CONVERSION_MAX_TASKS_PER_CHILD if max_tasks_per_child is None else max_tasks_per_child
+        )
+        if self.max_tasks_per_child and not WORKER_RECYCLING_SUPPORTED:
+            logger.warning("worker_recycling_disabled", max_tasks_per_child=self.max_tasks_per_child,
+                           reason="max_tasks_per_child stalls the pool before Python 3.12")
+            self.max_tasks_per_child = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = set()  # jobs submitted to a pool and not finished yet
+
+    @property
+    def inline(self):
+        """True when conversions run in the calling process (max_workers=0)"""
+        return self.max_workers <= 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                memory_limit_bytes = self.memory_limit_mb * 1024 * 1024 if self.memory_limit_mb else 0
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(memory_limit_bytes,),
+                    max_tasks_per_child=self.max_tasks_per_child or None,
+                )
+            return self._executor
+
+    def _recycle_pool(self, executor, culprit=None):
+        """
+        Terminate a hung or broken pool; the next submission starts a fresh one.
+        Jobs lost with it (except `culprit`, the hung one) are submitted again.
+        """
+        if executor is None:
+            return
+        with self._lock:
+            if culprit is not None:
+                culprit.abandoned = True
+            if self._executor is not executor:
+                return
+            self._executor = None
+        for process in list(getattr(executor, '_processes', {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Start every worker process now so the first request doesn't pay for spawning"""
+        if self.inline:
+            return
+        executor = self._get_executor()
+        futures = [executor.submit(_ping) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def _submit(self, input_path, output_path, method, timeout):
+        """Submit a job, returning (job, future); job is None in inline mode"""
+        if self.inline:
+            future = Future()
+            try:
+                future.set_result(_run_conversion(input_path, output_path, method, None))
+            except BaseException as e:
+                future.set_exception(e)
+            return None, future
+
+        # Inline jobs are already covered by the request profiler
+        job = _Job((input_path, output_path, method, timeout, profile_artifact_path('conversion')))
+        with self._lock:
+            self._jobs.add(job)
+        self._dispatch(job)
+        return job, job.future
+
+    def _dispatch(self, job):
+        """Submit `job` to the current pool (starting a fresh one if the current pool is broken)"""
+        job.attempts += 1
+        executor = self._get_executor()
+        try:
+            inner = executor.submit(_run_conversion, *job.args)
+        except (BrokenProcessPool, RuntimeError):
+            # Broken, or shut down by a concurrent recycle
+            self._recycle_pool(executor)
+            executor = self._get_executor()
+            inner = executor.submit(_run_conversion, *job.args)
+        job.executor, job.inner = executor, inner
+        inner.add_done_callback(lambda done: self._on_job_done(job, done))
+
+    def _on_job_done(self, job, inner):
+        """Pass a pool result on to the caller's future, or resubmit a job lost with its pool"""
+        if inner is not job.inner or job.future.done():
+            return
+        lost = inner.cancelled() or isinstance(inner.exception(), BrokenProcessPool)
+        if lost and not job.abandoned:
+            # Cancelled by a recycle, or killed with a broken pool: this job is not the cause
+            self._recycle_pool(job.executor)
+            if job.attempts < MAX_JOB_ATTEMPTS:
+                logger.warning("conversion_resubmitted", file=os.path.basename(job.args[0]), attempt=job.attempts + 1)
+                try:
+                    self._dispatch(job)
+                    return
+                except Exception as e:
+                    self._finish(job, exception=e)
+                    return
+        if inner.cancelled():
+            self._finish(job, exception=ConversionInterruptedError(
+                f"Conversion of {os.path.basename(job.args[0])} was interrupted by a worker pool restart"
+            ))
+        elif inner.exception() is not None:
+            self._finish(job, exception=inner.exception())
+        else:
+            self._finish(job, result=inner.result())
+
+    def _finish(self, job, result=None, exception=None):
+        with self._lock:
+            self._jobs.discard(job)
+        if job.future.done():
+            return
+        if exception is not None:
+            job.future.set_exception(exception)
+        else:
+            job.future.set_result(result)
+
+    def submit(self, input_path, output_path=None, method=None, timeout=None) -> Future:
+        """
+        Queue a conversion and return a Future resolving to the output PDF path.
+        `method` selects a specific FileConverter method (e.g. 'docx_to_pdf');
+        by default the converter is chosen from the file extension.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return self._submit(input_path, output_path, method, timeout)[1]
+
+    def convert(self, input_path, output_path=None, method=None, timeout=None):
+        """Blocking conversion (for synchronous callers)"""
+        with span('conversion', format=_format_label(input_path), method=method or 'convert_to_pdf'), \
+                timed(CONVERSION_SECONDS, format=_format_label(input_path)):
+            return self._convert(input_path, output_path, method, timeout)
+
+    def _convert(self, input_path, output_path, method, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        job, future = self._submit(input_path, output_path, method, timeout)
+        try:
+            return future.result(timeout=timeout + HARD_TIMEOUT_GRACE_SECONDS if timeout else None)
+        except FutureTimeoutError:
+            self._abandon(job)
+            raise ConversionTimeoutError(f"Conversion of {os.path.basename(input_path)} timed out")
+        except BrokenProcessPool:
+            raise Exception(f"Conversion worker crashed while converting {os.path.basename(input_path)} "
+                            f"(memory limit {self.memory_limit_mb} MB)")
+
+    async def convert_async(self, input_path, output_path=None, method=None, timeout=None):
+        """Await a conversion without blocking the event loop"""
+        with span('conversion', format=_format_label(input_path), method=method or 'convert_to_pdf'), \
+                timed(CONVERSION_SECONDS, format=_format_label(input_path)):
+            return await self._convert_async(input_path, output_path, method, timeout)
+
+    async def _convert_async(self, input_path, output_path, method, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        if self.inline:
+            return await asyncio.to_thread(profiled(_run_conversion), input_path, output_path, method, None)
+
+        job, future = self._submit(input_path, output_path, method, timeout)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                timeout=timeout + HARD_TIMEOUT_GRACE_SECONDS if timeout else None
+            )
+        except asyncio.TimeoutError:
+            self._abandon(job)
+            raise ConversionTimeoutError(f"Conversion of {os.path.basename(input_path)} timed out")
+        except BrokenProcessPool:
+            raise Exception(f"Conversion worker crashed while converting {os.path.basename(input_path)} "
+                            f"(memory limit {self.memory_limit_mb} MB)")
+
+    def _abandon(self, job):
+        """Give up on a hung job: recycle its pool, the jobs lost with it are resubmitted"""
+        if job is None:
+            return
+        self._finish(job, exception=ConversionTimeoutError(
+            f"Conversion of {os.path.basename(job.args[0])} timed out"
+        ))
+        self._recycle_pool(job.executor, culprit=job)
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            # Cancelled by the shutdown itself: nothing to resubmit them to
+            for job in self._jobs:
+                job.abandoned = True
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class _Job:
+    def __init__(self, args):
+        """One conversion request; `future` is what callers see, `inner` its current pool future"""
+        self.args = args
+        self.future = Future()
+        self.inner = None
+        self.executor = None
+        self.attempts = 0
+        self.abandoned = False  # given up on (hung): not resubmitted when its pool is recycled
+
+
+# Shared service instance
+_conversion_service = None
+def get_conversion_service():
+    global _conversion_service
+    if _conversion_service is None:
+        _conversion_service = ConversionService()
+    return _conversion_service
@@ -1,21 +1,66 @@
 import os
 import tempfile
 from pathlib import Path
-from docx import Document
-import pandas as pd
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-import openpyxl
-from pptx import Presentation
 import csv
+import textwrap
+from app.services.utils.conversion_cache import get_conversion_cache
+from app.services.utils.metrics import CONVERSION_CACHE_REQUESTS
+from app.config.logging_config import get_logger
+
+logger = get_logger('file_converter')
+
+
+class _LazyStory(list):
+    """
+    Flowable list that pulls from a generator as reportlab consumes it.
+    SimpleDocTemplate.build() only ever looks at the front of the story, so
+    keeping a small prefetch buffer bounds memory for very large documents.
+    """
+
+    def __init__(self, flowables, prefetch=8):
+        super().__init__()
+        self._source = iter(flowables)
+        self._prefetch = prefetch
+        self._fill()
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._prefetch:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
 
 class FileConverter:
-    def __init__(self):
+    # Bump whenever conversion output changes so cached PDFs are invalidated
+    CONVERTER_VERSION = 3
+
+    # Spreadsheet rendering: rows per LongTable block and cell font sizes
+    TABLE_BATCH_ROWS = 500
+    TABLE_HEADER_FONT_SIZE = 8
+    TABLE_BODY_FONT_SIZE = 6
+    # Long cells wrap inside their column; a row taller than TABLE_ROW_MAX_LINES
+    # continues in the next table row so it always fits on a page
+    TABLE_ROW_MAX_LINES = 40
+    TABLE_HEADER_MAX_LINES = 3
+
+    def __init__(self, cache=None):
         """Initialize file converter"""
+        self.cache = cache if cache is not None else get_conversion_cache()
         self.supported_formats = {
             '.docx': self.docx_to_pdf,
             '.doc': self.doc_to_pdf,
@@ -42,24 +87,41 @@ class FileConverter:
         if extension not in self.supported_formats:
             raise ValueError(f"Unsupported file format: {extension}")
         
-        # Generate output path if not provided
+        # Generate a unique output path if not provided (never shared between callers)
         if output_path is None:
             input_stem = Path(input_path).stem
-            output_path = os.path.join(tempfile.gettempdir(), f"{input_stem}_converted.pdf")
+            fd, output_path = tempfile.mkstemp(prefix=f"{input_stem}_", suffix="_converted.pdf")
+            os.close(fd)
+        
+        # Repeat uploads of the same source skip rendering entirely
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key_for(input_path, self.CONVERTER_VERSION)
+            if self.cache.get(cache_key, output_path):
+                CONVERSION_CACHE_REQUESTS.labels(result='hit').inc()
+                logger.debug("conversion_cache_hit", file=os.path.basename(input_path))
+                return output_path
+            CONVERSION_CACHE_REQUESTS.labels(result='miss').inc()
         
-        print(f"FileConverter: Converting {extension} file to PDF...")
+        logger.debug("converting", format=extension)
         
         # Call appropriate conversion function
         converter_func = self.supported_formats[extension]
         converter_func(input_path, output_path)
         
-        print(f"FileConverter: Successfully converted to {os.path.basename(output_path)}")
+        if cache_key is not None:
+            try:
+                self.cache.put(cache_key, output_path)
+            except OSError as e:
+                logger.warning("conversion_cache_write_failed", error=str(e))
+        
+        logger.info("converted", format=extension, output=os.path.basename(output_path))
         return output_path
     
     def docx_to_pdf(self, input_path, output_path):
         """Convert DOCX to PDF"""
         try:
-            print(f"FileConverter: Processing DOCX file...")
+            from docx import Document
             doc = Document(input_path)
             
             # Create PDF
@@ -77,7 +139,7 @@ class FileConverter:
                     paragraph_count += 1
             
             pdf_doc.build(story)
-            print(f"FileConverter: Processed {paragraph_count} paragraphs from DOCX")
+            logger.debug("converted_docx", paragraphs=paragraph_count)
             
         except Exception as e:
             raise Exception(f"Error converting DOCX to PDF: {e}")
@@ -85,7 +147,6 @@ class FileConverter:
     def doc_to_pdf(self, input_path, output_path):
         """Convert DOC to PDF (requires python-docx2txt or similar)"""
         try:
-            print(f"FileConverter: Processing DOC file...")
             # For .doc files, we need additional libraries like python-docx2txt
             # This is a simplified version - you might need to install additional packages
             import docx2txt
@@ -106,106 +167,164 @@ class FileConverter:
                     paragraph_count += 1
             
             pdf_doc.build(story)
-            print(f"FileConverter: Processed {paragraph_count} paragraphs from DOC")
+            logger.debug("converted_doc", paragraphs=paragraph_count)
             
         except ImportError:
             raise Exception("python-docx2txt package required for .doc files. Install with: pip install docx2txt")
         except Exception as e:
             raise Exception(f"Error converting DOC to PDF: {e}")
     
+    def _table_style(self):
+        """Shared style for spreadsheet tables"""
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), self.TABLE_HEADER_FONT_SIZE),
+            ('LEADING', (0, 0), (-1, 0), self.TABLE_HEADER_FONT_SIZE + 1),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('FONTSIZE', (0, 1), (-1, -1), self.TABLE_BODY_FONT_SIZE),
+            ('LEADING', (0, 1), (-1, -1), self.TABLE_BODY_FONT_SIZE + 1),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+
+    def _cell_lines(self, value, max_chars):
+        """Wrap a cell value into lines that fit its fixed-width column"""
+        if value is None:
+            return ['']
+        text = str(value).replace('\r\n', '\n').replace('\r', '\n')
+        if len(text) <= max_chars and '\n' not in text:
+            return [text]
+        lines = []
+        for line in text.split('\n'):
+            lines.extend(textwrap.wrap(line, max_chars) or [''])
+        return lines
+
+    def _table_rows(self, row, ncols, max_chars, max_lines):
+        """
+        Yield (cells, line count) table rows for one data row; a row whose
+        wrapped cells exceed max_lines continues in the following rows
+        """
+        cells = [self._cell_lines(v, max_chars) for v in row] + [['']] * (ncols - len(row))
+        height = max(len(lines) for lines in cells)
+        for start in range(0, height, max_lines):
+            yield ['\n'.join(lines[start:start + max_lines]) for lines in cells], min(max_lines, height - start)
+
+    def _table_blocks(self, header, rows, stats):
+        """
+        Yield paginated LongTable blocks of at most TABLE_BATCH_ROWS rows.
+        Column widths and row heights are fixed up front so layout cost is
+        linear in the number of rows (reportlab never measures cell content);
+        cells are wrapped by an estimate of the characters a column holds.
+        """
+        page_width = A4[0] - 2 * inch - 12  # SimpleDocTemplate default margins and frame padding
+        header = list(header or [])
+        style = self._table_style()
+
+        def flush(batch):
+            ncols = max([len(header)] + [len(row) for row in batch]) or 1
+            col_width = page_width / ncols
+            max_chars = max(int(col_width / (self.TABLE_BODY_FONT_SIZE * 0.6)), 4)
+            header_chars = max(int(col_width / (self.TABLE_HEADER_FONT_SIZE * 0.65)), 4)
+            header_cells, header_lines = next(self._table_rows(header, ncols, header_chars, self.TABLE_HEADER_MAX_LINES))
+            data = [header_cells]
+            row_heights = [header_lines * (self.TABLE_HEADER_FONT_SIZE + 1) + 15]
+            for row in batch:
+                for cells, lines in self._table_rows(row, ncols, max_chars, self.TABLE_ROW_MAX_LINES):
+                    data.append(cells)
+                    row_heights.append(lines * (self.TABLE_BODY_FONT_SIZE + 1) + 5)
+            table = LongTable(data, colWidths=[col_width] * ncols, rowHeights=row_heights, repeatRows=1)
+            table.setStyle(style)
+            return table
+
+        batch = []
+        for row in rows:
+            batch.append(list(row))
+            stats['rows'] += 1
+            if len(batch) >= self.TABLE_BATCH_ROWS:
+                yield flush(batch)
+                batch = []
+        if batch or stats['rows'] == 0:
+            yield flush(batch)
+
+    def _sheet_flowables(self, sheets, styles, stats):
+        """Yield heading + table blocks for each (sheet_name, row iterator) pair"""
+        for sheet_name, rows in sheets:
+            yield Paragraph(f"Sheet: {sheet_name}", styles['Heading1'])
+            yield Spacer(1, 12)
+            rows = iter(rows)
+            header = next(rows, None)
+            yield from self._table_blocks(header, rows, stats)
+            yield Spacer(1, 20)
+            stats['sheets'] += 1
+
     def xlsx_to_pdf(self, input_path, output_path):
-        """Convert XLSX to PDF"""
+        """Convert XLSX to PDF, streaming rows with openpyxl in read-only mode"""
         try:
-            print(f"FileConverter: Processing XLSX file...")
-            # Read Excel file
-            df = pd.read_excel(input_path, sheet_name=None)  # Read all sheets
-            
-            # Create PDF
-            pdf_doc = SimpleDocTemplate(output_path, pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            sheet_count = 0
-            total_rows = 0
+            import openpyxl
+            workbook = openpyxl.load_workbook(input_path, read_only=True, data_only=True)
             
-            for sheet_name, sheet_df in df.items():
-                # Add sheet title
-                title = Paragraph(f"Sheet: {sheet_name}", styles['Heading1'])
-                story.append(title)
-                story.append(Spacer(1, 12))
-                
-                # Convert dataframe to table
-                data = [sheet_df.columns.tolist()] + sheet_df.values.tolist()
-                
-                # Create table with limited width to fit page
-                table = Table(data)
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 8),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('FONTSIZE', (0, 1), (-1, -1), 6),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
+            try:
+                pdf_doc = SimpleDocTemplate(output_path, pagesize=A4)
+                styles = getSampleStyleSheet()
+                stats = {'sheets': 0, 'rows': 0}
                 
-                story.append(table)
-                story.append(Spacer(1, 20))
-                
-                sheet_count += 1
-                total_rows += len(sheet_df)
+                sheets = ((ws.title, ws.iter_rows(values_only=True)) for ws in workbook.worksheets)
+                pdf_doc.build(_LazyStory(self._sheet_flowables(sheets, styles, stats)))
+            finally:
+                workbook.close()
             
-            pdf_doc.build(story)
-            print(f"FileConverter: Processed {sheet_count} sheets with {total_rows} total rows from XLSX")
+            logger.debug("converted_xlsx", sheets=stats['sheets'], rows=stats['rows'])
             
         except Exception as e:
             raise Exception(f"Error converting XLSX to PDF: {e}")
     
     def xls_to_pdf(self, input_path, output_path):
         """Convert XLS to PDF"""
-        print(f"FileConverter: Processing XLS file (using XLSX converter)...")
-        # Similar to xlsx_to_pdf but for older Excel format
-        self.xlsx_to_pdf(input_path, output_path)
-    
-    def csv_to_pdf(self, input_path, output_path):
-        """Convert CSV to PDF"""
         try:
-            print(f"FileConverter: Processing CSV file...")
-            # Read CSV file
-            df = pd.read_csv(input_path)
+            # openpyxl cannot read the legacy format, so sheets are loaded with pandas
+            # and then rendered through the same paginated table blocks
+            import pandas as pd
+            df = pd.read_excel(input_path, sheet_name=None)
             
-            # Create PDF
             pdf_doc = SimpleDocTemplate(output_path, pagesize=A4)
             styles = getSampleStyleSheet()
-            story = []
+            stats = {'sheets': 0, 'rows': 0}
             
-            # Add title
-            title = Paragraph("CSV Data", styles['Heading1'])
-            story.append(title)
-            story.append(Spacer(1, 12))
+            def sheet_rows(sheet_df):
+                yield sheet_df.columns.tolist()
+                yield from sheet_df.itertuples(index=False, name=None)
             
-            # Convert dataframe to table
-            data = [df.columns.tolist()] + df.values.tolist()
+            sheets = ((name, sheet_rows(sheet_df)) for name, sheet_df in df.items())
+            pdf_doc.build(_LazyStory(self._sheet_flowables(sheets, styles, stats)))
+            logger.debug("converted_xls", sheets=stats['sheets'], rows=stats['rows'])
             
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('FONTSIZE', (0, 1), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+        except Exception as e:
+            raise Exception(f"Error converting XLS to PDF: {e}")
+    
+    def csv_to_pdf(self, input_path, output_path):
+        """Convert CSV to PDF, reading rows with the csv module in batches"""
+        try:
+            pdf_doc = SimpleDocTemplate(output_path, pagesize=A4)
+            styles = getSampleStyleSheet()
+            stats = {'rows': 0}
             
-            story.append(table)
-            pdf_doc.build(story)
+            with open(input_path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+                reader = csv.reader(f)
+                
+                def story():
+                    # Add title
+                    yield Paragraph("CSV Data", styles['Heading1'])
+                    yield Spacer(1, 12)
+                    header = next(reader, None)
+                    yield from self._table_blocks(header, reader, stats)
+                
+                pdf_doc.build(_LazyStory(story()))
             
-            print(f"FileConverter: Processed {len(df)} rows from CSV")
+            logger.debug("converted_csv", rows=stats['rows'])
             
         except Exception as e:
             raise Exception(f"Error converting CSV to PDF: {e}")
@@ -213,7 +332,6 @@ class FileConverter:
     def txt_to_pdf(self, input_path, output_path):
         """Convert TXT to PDF"""
         try:
-            print(f"FileConverter: Processing TXT file...")
             with open(input_path, 'r', encoding='utf-8') as f:
                 text = f.read()
             
@@ -232,7 +350,7 @@ class FileConverter:
                 story.append(Spacer(1, 6))
             
             pdf_doc.build(story)
-            print(f"FileConverter: Processed {paragraph_count} paragraphs from TXT")
+            logger.debug("converted_txt", paragraphs=paragraph_count)
             
         except Exception as e:
             raise Exception(f"Error converting TXT to PDF: {e}")
@@ -240,7 +358,7 @@ class FileConverter:
     def pptx_to_pdf(self, input_path, output_path):
         """Convert PPTX to PDF"""
         try:
-            print(f"FileConverter: Processing PPTX file...")
+            from pptx import Presentation
             prs = Presentation(input_path)
             
             # Create PDF
@@ -269,7 +387,7 @@ class FileConverter:
                 slide_count += 1
             
             pdf_doc.build(story)
-            print(f"FileConverter: Processed {slide_count} slides with {text_count} text elements from PPTX")
+            logger.debug("converted_pptx", slides=slide_count, text_elements=text_count)
             
         except Exception as e:
             raise Exception(f"Error converting PPTX to PDF: {e}")
@@ -277,7 +395,6 @@ class FileConverter:
     def ppt_to_pdf(self, input_path, output_path):
         """Convert PPT to PDF (requires additional libraries)"""
         try:
-            print(f"FileConverter: Processing PPT file...")
             # For .ppt files, you might need win32com (Windows only) or other libraries
             # This is a placeholder - actual implementation depends on your system
             raise Exception("PPT conversion requires additional setup. Consider converting to PPTX first.")
@@ -295,8 +412,8 @@ def convert_file_to_pdf(file_path, output_path=None):
     
     try:
         pdf_path = converter.convert_to_pdf(file_path, output_path)
-        print(f"Successfully converted {file_path} to {pdf_path}")
+        logger.info("converted_file", input=file_path, output=pdf_path)
         return pdf_path
     except Exception as e:
-        print(f"Conversion failed: {e}")
+        logger.error("conversion_failed", input=file_path, error=str(e))
         raise e
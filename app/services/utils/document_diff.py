@@ -0,0 +1,100 @@
+"""
+Document Diff
+Local comparison of an original document with its reference version, so a
+prompt can carry only the regions where they differ instead of the whole
+reference. Sections are aligned by their headings first (so a moved or
+renumbered section is still compared with its counterpart), then compared
+line by line with a few lines of unchanged context around each change.
+"""
+
+import difflib
+import re
+
+from app.services.utils.document_sections import split_headings
+
+# Leading clause numbers / markdown markers ignored when aligning headings
+HEADING_NUMBER = re.compile(r'^[#\s]*(?:\d+(?:\.\d+)*\.?|[A-Z]\.|[ivxlc]+\.)?\s*', re.IGNORECASE)
+
+
+def reference_differences(original: str, reference: str, context_lines: int = 2, max_share: float = 0.6):
+    """
+    The regions where `reference` differs from `original`, rendered for a
+    prompt ("-" lines only in the original, "+" lines only in the reference,
+    others unchanged context). None when the rendering would not be clearly
+    shorter than the reference (unrelated documents, or no usable reference).
+    """
+    original_sections = split_headings(original)
+    reference_sections = split_headings(reference)
+    blocks = []
+    for original_section, reference_section, moved_after in _align(original_sections, reference_sections):
+        if moved_after is not None:
+            blocks.append(f"## Section moved in the reference: {_title(original_section)} (now after: {moved_after})")
+        if reference_section is None:
+            blocks.append(f"## Section only in the original: {_title(original_section)}")
+        elif original_section is None:
+            blocks.append(f"## Section only in the reference: {_title(reference_section)}\n"
+                          + '\n'.join(f'+{line}' for line in reference_section.strip('\n').split('\n')))
+        elif _normalize(original_section) != _normalize(reference_section):
+            hunks = _hunks(original_section, reference_section, context_lines)
+            if hunks:
+                blocks.append(f"## {_title(original_section)}\n{hunks}")
+    rendered = '\n\n'.join(blocks) if blocks else "No differences: the reference matches the original document."
+    if len(rendered) > max_share * len(reference):
+        return None
+    return rendered
+
+
+def _align(original_sections, reference_sections):
+    """
+    (original, reference, moved_after) in original order: None for a section
+    without counterpart; moved_after titles the section a moved one now follows
+    """
+    original_keys = [_key(section) for section in original_sections]
+    reference_keys = [_key(section) for section in reference_sections]
+    matcher = difflib.SequenceMatcher(None, original_keys, reference_keys, autojunk=False)
+    pairs, moved, unmatched_original, unmatched_reference = [], set(), [], {}
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('equal', 'replace'):
+            # A replaced run is compared section by section (a reworded heading);
+            # whatever the shorter side leaves over goes to the moved-section pass
+            pairs += [(i, j) for i, j in zip(range(i1, i2), range(j1, j2))]
+            i1, j1 = i1 + min(i2 - i1, j2 - j1), j1 + min(i2 - i1, j2 - j1)
+        unmatched_original += range(i1, i2)
+        for j in range(j1, j2):
+            unmatched_reference.setdefault(reference_keys[j], []).append(j)
+    # Sections that moved: same heading, different position
+    for i in unmatched_original:
+        candidates = unmatched_reference.get(original_keys[i])
+        pairs.append((i, candidates.pop(0) if candidates else None))
+        if candidates is not None and pairs[-1][1] is not None:
+            moved.add(i)
+    matched = {j for _, j in pairs}
+    pairs.sort(key=lambda pair: pair[0])
+    result = [
+        (original_sections[i], reference_sections[j] if j is not None else None,
+         (_title(reference_sections[j - 1]) if j else '(start)') if i in moved else None)
+        for i, j in pairs
+    ]
+    result += [(None, reference_sections[j], None) for j in range(len(reference_sections)) if j not in matched]
+    return result
+
+
+def _hunks(original, reference, context_lines):
+    diff = difflib.unified_diff(
+        original.strip('\n').split('\n'), reference.strip('\n').split('\n'), n=context_lines, lineterm=''
+    )
+    # Skip the ---/+++ file header; hunk headers carry section-relative line
+    # numbers, a plain marker reads better in a prompt
+    return '\n'.join('...' if line.startswith('@@') else line for line in list(diff)[2:])
+
+
+def _key(section):
+    return HEADING_NUMBER.sub('', _title(section)).lower()
+
+
+def _title(section):
+    return section.strip().split('\n', 1)[0].strip()[:120]
+
+
+def _normalize(section):
+    return ' '.join(section.split())
@@ -1,28 +1,30 @@
+import asyncio
 import os
 import tempfile
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
-from google.cloud import documentai
-from google.api_core.client_options import ClientOptions
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from fastapi.responses import JSONResponse
 
-# Import the file converter and processor
-from app.services.utils.convert_file import FileConverter
-from app.services.utils.process_file import FileProcessor
+# Shared file converter/processor instances come from the service registry
+from app.config.config import DOCUMENTAI_API_ENDPOINT, DOCUMENTAI_TRANSPORT
+from app.services.registry import get_document_ocr, get_file_converter, get_file_processor
+from app.services.utils.conversion_service import get_conversion_service
+from app.services.utils.metrics import OCR_CALL_SECONDS, timed
+from app.services.utils.profiling import profiled
+from app.services.utils.tracing import span
+from app.services.utils.workspace import Workspace, WorkspaceQuotaExceeded, check_work_dir_quota, request_workspace
 
 # Load environment variables
 load_dotenv()
 
 router = APIRouter()
 
-# Create a reusable service instance for endpoints
-_ocr_service = None
+# Endpoints use the registry's shared instance
 def _get_ocr_service():
-    global _ocr_service
-    if _ocr_service is None:
-        _ocr_service = DocumentOCR()
-    return _ocr_service
+    return get_document_ocr()
+
 class DocumentOCR:
 
     def process_file(self, file_path):
@@ -39,9 +41,13 @@ class DocumentOCR:
         self.processor_id = os.getenv('PROCESSOR_ID')
         self.processor_version = os.getenv('PROCESSOR_VERSION')
         
-        # Initialize file converter and processor
-        self.file_converter = FileConverter()
-        self.file_processor = FileProcessor()
+        # Shared file converter and processor
+        self.file_converter = get_file_converter()
+        self.file_processor = get_file_processor()
+
+        # Document AI client is created on first OCR call and reused afterwards
+        self._documentai_client = None
+        self._client_lock = threading.Lock()
         
         # Set size and page limits
         self.max_size_mb = 10
@@ -57,6 +63,26 @@ class DocumentOCR:
         self.pdf_image_formats = ['.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.tiff', '.tif']
         self.convertible_formats = list(self.file_converter.supported_formats.keys())
 
+    def _get_documentai_client(self):
+        """Return the cached Document AI client (google.cloud is imported on first use)"""
+        if self._documentai_client is None:
+            with self._client_lock:
+                if self._documentai_client is None:
+                    from google.cloud import documentai
+                    from google.api_core.client_options import ClientOptions
+                    endpoint = DOCUMENTAI_API_ENDPOINT or f"{self.location}-documentai.googleapis.com"
+                    credentials = None
+                    if endpoint.startswith('http://'):
+                        # Local stand-in: no TLS, no Google credentials
+                        from google.auth.credentials import AnonymousCredentials
+                        credentials = AnonymousCredentials()
+                    self._documentai_client = documentai.DocumentProcessorServiceClient(
+                        credentials=credentials,
+                        transport=DOCUMENTAI_TRANSPORT,
+                        client_options=ClientOptions(api_endpoint=endpoint)
+                    )
+        return self._documentai_client
+
     def get_mime_type(self, file_path):
         """Get MIME type from file extension"""
         mime_types = {
@@ -100,10 +126,11 @@ class DocumentOCR:
         
         return size_exceeds, pages_exceed, file_size, page_count
 
-    def prepare_file_for_ocr(self, file_path):
+    def prepare_file_for_ocr(self, file_path, work_dir=None):
         """
         Step 1: Prepare file for OCR processing.
         If file is not PDF/image, convert it to PDF using convert_file.py
+        The converted PDF gets a unique name (inside work_dir if given).
         Returns: (file_path_to_process, is_temporary_file)
         """
         extension = Path(file_path).suffix.lower()
@@ -119,14 +146,16 @@ class DocumentOCR:
         
         # Convert file to PDF using convert_file.py
         try:
-            # Create temporary PDF file path
-            temp_pdf_path = os.path.join(
-                tempfile.gettempdir(), 
-                f"{Path(file_path).stem}_converted_for_ocr.pdf"
+            # Create a unique temporary PDF file path
+            fd, temp_pdf_path = tempfile.mkstemp(
+                prefix=f"{Path(file_path).stem}_",
+                suffix="_converted_for_ocr.pdf",
+                dir=work_dir
             )
+            os.close(fd)
             
-            # Use FileConverter to convert the file
-            converted_pdf = self.file_converter.convert_to_pdf(file_path, temp_pdf_path)
+            # Convert in the conversion process pool (keeps CPU-bound rendering off this process)
+            converted_pdf = get_conversion_service().convert(file_path, temp_pdf_path)
             
             # Verify the conversion was successful
             if not os.path.exists(converted_pdf):
@@ -134,9 +163,14 @@ class DocumentOCR:
                 
             if not converted_pdf.lower().endswith('.pdf'):
                 raise Exception(f"Conversion did not produce a PDF file: {converted_pdf}")
+
+            # The converted PDF counts against the request's disk quota like its uploads
+            check_work_dir_quota(work_dir)
             
             return converted_pdf, True
             
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             raise Exception(f"Failed to convert {extension} file to PDF: {e}")
 
@@ -156,12 +190,8 @@ class DocumentOCR:
             if mime_type not in supported_mime_types:
                 raise ValueError(f"Unsupported MIME type for OCR: {mime_type}")
             
-            # Create Document AI client
-            client = documentai.DocumentProcessorServiceClient(
-                client_options=ClientOptions(
-                    api_endpoint=f"{self.location}-documentai.googleapis.com"
-                )
-            )
+            from google.cloud import documentai
+            client = self._get_documentai_client()
             
             # Get processor name
             name = client.processor_version_path(
@@ -184,7 +214,9 @@ class DocumentOCR:
             )
             
             # Process document
-            result = client.process_document(request=request)
+            with span('ocr.call', mime_type=mime_type, bytes=len(file_content)), \
+                    timed(OCR_CALL_SECONDS, mime_type=mime_type):
+                result = client.process_document(request=request)
             document = result.document
             
             # Extract text
@@ -195,13 +227,18 @@ class DocumentOCR:
         except Exception as e:
             raise e
 
-    def extract_text(self, file_path):
+    def extract_text(self, file_path, work_dir=None):
         """
         Main text extraction method following the complete workflow:
         1. Check file type - if not PDF/image, convert to PDF using convert_file.py
         2. Check size and pages - if exceeds limits, send to process_file.py
         3. Extract text and return combined result
+        Intermediate files are written to work_dir (system temp dir if None).
         """
+        with span('ocr.extract_text', file=os.path.basename(file_path)):
+            return self._extract_text(file_path, work_dir)
+
+    def _extract_text(self, file_path, work_dir=None):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         
@@ -210,7 +247,7 @@ class DocumentOCR:
         
         try:
             # STEP 1: Prepare file for OCR (convert if necessary)
-            processed_file_path, is_temporary = self.prepare_file_for_ocr(file_path)
+            processed_file_path, is_temporary = self.prepare_file_for_ocr(file_path, work_dir)
             
             # STEP 2: Check file limits
             size_exceeds, pages_exceed, file_size, page_count = self.check_file_limits(processed_file_path)
@@ -218,7 +255,7 @@ class DocumentOCR:
             # STEP 3: Process based on limits
             if size_exceeds or pages_exceed:
                 # Use process_file.py to handle large files
-                extracted_text = self.file_processor.process_file_with_ocr(processed_file_path, self)
+                extracted_text = self.file_processor.process_file_with_ocr(processed_file_path, self, work_dir)
                 
                 if not extracted_text:
                     return "Error: Failed to process large file"
@@ -229,6 +266,8 @@ class DocumentOCR:
             
             return extracted_text if extracted_text else "Error: No text could be extracted"
             
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             return f"Error: {str(e)}"
             
@@ -240,19 +279,22 @@ class DocumentOCR:
                 except Exception:
                     pass  # Silent cleanup
 
-    def extract_text_from_files(self, file_paths):
+    def extract_text_from_files(self, file_paths, work_dir=None):
         """
         Extract text from multiple files.
         Args:
             file_paths (list): List of file paths to process
+            work_dir (str): Optional scratch directory for intermediate files
         Returns:
             dict: {filename: extracted_text}
         """
         results = {}
         for file_path in file_paths:
             try:
-                text = self.extract_text(file_path)
+                text = self.extract_text(file_path, work_dir)
                 results[os.path.basename(file_path)] = text
+            except WorkspaceQuotaExceeded:
+                raise
             except Exception as e:
                 results[os.path.basename(file_path)] = f"Error: {str(e)}"
         
@@ -284,7 +326,7 @@ class DocumentOCR:
             supported = self.get_supported_formats()['all_supported_formats']
             return False, f"Unsupported format: {extension}. Supported: {', '.join(supported)}"
 
-    def process_single_file(self, file_path):
+    def process_single_file(self, file_path, work_dir=None):
         """Process a single file and return the extracted text"""
         # Validate file first
         is_valid, message = self.validate_file(file_path)
@@ -293,31 +335,29 @@ class DocumentOCR:
         
         # Process the file
         try:
-            text = self.extract_text(file_path)
+            text = self.extract_text(file_path, work_dir)
             
             if text and not text.startswith("Error:"):
                 return text
             else:
                 return None
                 
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             return None
 
 # API Endpoints
 @router.post("/document", tags=["ocr"])
-async def ocr_document(file: UploadFile = File(...)):
+async def ocr_document(file: UploadFile = File(...), workspace: Workspace = Depends(request_workspace)):
     """Extract text from a single uploaded document using OCR (and conversion if needed)."""
-    temp_path = None
     try:
-        # Persist upload to a temporary file with proper suffix
-        suffix = os.path.splitext(file.filename)[1] or ""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            temp_path = tmp.name
-            content = await file.read()
-            tmp.write(content)
+        # Persist upload into this request's workspace (removed when the request ends)
+        temp_path = await workspace.save_upload(file)
 
         service = _get_ocr_service()
-        text = service.process_single_file(temp_path)
+        # Conversion waits and OCR calls block: keep them off the event loop
+        text = await asyncio.to_thread(profiled(service.process_single_file), temp_path, workspace.root)
 
         if text is None:
             raise HTTPException(status_code=500, detail="OCR failed to extract text")
@@ -335,35 +375,25 @@ async def ocr_document(file: UploadFile = File(...)):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR error: {str(e)}")
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
 
 @router.post("/documents", tags=["ocr"])
-async def ocr_documents(files: list[UploadFile] = File(...)):
+async def ocr_documents(files: list[UploadFile] = File(...), workspace: Workspace = Depends(request_workspace)):
     """Extract text from multiple uploaded documents; returns a mapping of filename -> text/error."""
-    temp_paths = []
     try:
-        # Save uploads to temp files and track mapping
+        # Save uploads into this request's workspace and track mapping
         upload_map = {}
         for f in files:
-            suffix = os.path.splitext(f.filename)[1] or ""
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                path = tmp.name
-                content = await f.read()
-                tmp.write(content)
-                temp_paths.append(path)
-                upload_map[path] = f.filename
+            path = await workspace.save_upload(f)
+            upload_map[path] = f.filename
 
         service = _get_ocr_service()
         results = {}
         for path, original_name in upload_map.items():
             try:
-                text = service.extract_text(path)
+                text = await asyncio.to_thread(profiled(service.extract_text), path, workspace.root)
                 results[original_name] = text
+            except WorkspaceQuotaExceeded:
+                raise
             except Exception as e:
                 results[original_name] = f"Error: {str(e)}"
 
@@ -375,15 +405,10 @@ async def ocr_documents(files: list[UploadFile] = File(...)):
                 "message": "OCR completed for uploaded documents"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR error: {str(e)}")
-    finally:
-        for p in temp_paths:
-            if os.path.exists(p):
-                try:
-                    os.remove(p)
-                except Exception:
-                    pass
 
 # Example usage and testing functions
 def test_single_file(file_path):
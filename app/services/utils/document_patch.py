@@ -0,0 +1,118 @@
+"""
+Document Patches
+Lets the model revise a long document by answering with edit operations
+instead of re-emitting the whole text. The document is split into anchored
+paragraphs ([P1], [P2], ...) for the prompt; the model returns DocumentEdit
+operations keyed to those anchors and they are applied locally to the
+original text, so unchanged paragraphs come back byte for byte.
+
+Kept free of app config imports: the QTA schemas use DocumentEdit.
+"""
+
+import re
+from collections import defaultdict
+from typing import List, Literal
+
+from pydantic import BaseModel, Field
+
+from app.services.utils.metrics import DOCUMENT_PATCHES
+
+PARAGRAPH_BREAK = re.compile(r'(\n[ \t]*\n\s*)')
+# Blocks with more lines than this (OCR text without blank lines, tables) are
+# anchored line by line, so an edit doesn't have to repeat the whole block
+MAX_PARAGRAPH_LINES = 8
+
+EDIT_INSTRUCTIONS = '''The document is given as paragraphs, each starting with its anchor in square brackets ([P1], [P2], ...).
+Do not repeat the document. Describe the revision as a list of edits, each an object
+{"op": "replace" | "insert_before" | "insert_after" | "delete", "anchor": "P<n>", "text": "<paragraph text>"}:
+- replace: "text" is the complete new text of the anchored paragraph (without the anchor)
+- insert_before / insert_after: "text" is a new paragraph placed before / after the anchored one
+- delete: removes the anchored paragraph; "text" is ""
+Use an anchor at most once for replace or delete, and leave paragraphs that do not change out of the list.'''
+
+
+class DocumentEdit(BaseModel):
+    op: Literal['replace', 'insert_before', 'insert_after', 'delete']
+    anchor: str = Field(description="Anchor of the paragraph the edit applies to, e.g. P12")
+    text: str = Field(description="New paragraph text for replace/insert; empty for delete")
+
+
+class PatchError(ValueError):
+    """An edit list that does not fit the document it was made for"""
+
+
+class Paragraph:
+    def __init__(self, anchor: str, text: str, separator: str):
+        self.anchor = anchor
+        self.text = text
+        self.separator = separator  # whitespace up to the next paragraph
+
+
+class AnchoredDocument:
+    """A document split into anchored paragraphs; prefix + text + separator of each + suffix rebuilds it exactly"""
+
+    def __init__(self, text: str):
+        self.prefix = ''
+        self.paragraphs = []
+        # Trailing whitespace belongs to the document, not to its last paragraph,
+        # so edits at the end keep it in place
+        body = text.rstrip()
+        self.suffix = text[len(body):]
+        pieces = PARAGRAPH_BREAK.split(body)
+        for block, separator in zip(pieces[0::2], pieces[1::2] + ['']):
+            lines = block.split('\n')
+            if len(lines) > MAX_PARAGRAPH_LINES:
+                chunks = [(line, '\n') for line in lines[:-1]] + [(lines[-1], separator)]
+            else:
+                chunks = [(block, separator)]
+            for chunk, chunk_separator in chunks:
+                if chunk.strip():
+                    self.paragraphs.append(Paragraph(f'P{len(self.paragraphs) + 1}', chunk, chunk_separator))
+                elif self.paragraphs:
+                    self.paragraphs[-1].separator += chunk + chunk_separator
+                else:
+                    self.prefix += chunk + chunk_separator
+
+    def render(self) -> str:
+        """The document as the model sees it, one anchored paragraph per entry"""
+        return '\n\n'.join(f'[{paragraph.anchor}] {paragraph.text}' for paragraph in self.paragraphs)
+
+    def apply(self, edits: List[DocumentEdit]) -> str:
+        """The document with `edits` applied; raises PatchError for unknown or conflicting anchors"""
+        anchors = {paragraph.anchor for paragraph in self.paragraphs}
+        replaced = {}
+        inserted = {'insert_before': defaultdict(list), 'insert_after': defaultdict(list)}
+        for edit in edits:
+            anchor = edit.anchor.strip().strip('[]')
+            if anchor not in anchors:
+                raise PatchError(f"Edit refers to unknown anchor {edit.anchor!r}")
+            text = edit.text.strip('\n')
+            if edit.op in inserted:
+                inserted[edit.op][anchor].append(text)
+            elif anchor in replaced:
+                raise PatchError(f"More than one replace/delete for anchor {anchor}")
+            else:
+                replaced[anchor] = text if edit.op == 'replace' else None
+
+        out = []
+        for paragraph in self.paragraphs:
+            text = replaced.get(paragraph.anchor, paragraph.text)
+            body = inserted['insert_before'][paragraph.anchor] + ([text] if text is not None else []) \
+                + inserted['insert_after'][paragraph.anchor]
+            if body:
+                gap = '\n' if paragraph.separator == '\n' else '\n\n'
+                out.append([gap.join(body), paragraph.separator])
+        if out:
+            out[-1][1] = ''  # a deleted last paragraph must not leave its predecessor's break behind
+        return self.prefix + ''.join(text + separator for text, separator in out) + self.suffix
+
+
+def apply_document_edits(document: AnchoredDocument, edits: List[DocumentEdit], service: str, method: str) -> str:
+    """document.apply(edits), counted per outcome; raises PatchError"""
+    try:
+        text = document.apply(edits)
+    except PatchError:
+        DOCUMENT_PATCHES.labels(service=service, method=method, outcome='failed').inc()
+        raise
+    DOCUMENT_PATCHES.labels(service=service, method=method, outcome='applied').inc()
+    return text
@@ -0,0 +1,71 @@
+"""
+Document Sections
+Splits a long controlled document into sections at its headings (markdown
+headings, numbered clauses, "Section 4" / "Appendix A" style titles and
+ALL-CAPS title lines) and packs neighbouring sections into parts of roughly
+even size, so the parts can be revised concurrently and put back together
+in order. Joining the parts gives back the original text exactly.
+
+Kept free of app config imports: the stand-in server loads RevisedSection.
+"""
+
+import re
+from typing import List
+
+from pydantic import BaseModel
+
+HEADING = re.compile(
+    r'^[ \t]*(?:'
+    r'#{1,6}[ \t]+\S'                                                   # markdown heading
+    r'|\d+(?:\.\d+)*\.?[ \t]+\S'                                        # 4 / 4.2 / 4.2.1 numbered clause
+    r'|(?i:section|article|clause|appendix|annex|schedule|part)[ \t]+[\dA-Z]+\b'
+    r'|[A-Z][A-Z0-9 &/,()\-]{3,}[ \t]*$'                                # ALL CAPS title line
+    r')',
+    re.MULTILINE
+)
+# Where an oversized section may be cut, coarsest first
+BREAKS = (re.compile(r'(?<=\n\n)'), re.compile(r'(?<=\n)'))
+
+
+class RevisedSection(BaseModel):
+    """What the model returns for one part of a document revised section by section"""
+    document_text: str
+    changes: str
+
+
+def split_headings(text: str) -> List[str]:
+    """`text` cut at every heading; the first section holds whatever precedes the first heading"""
+    starts = sorted({0} | {match.start() for match in HEADING.finditer(text)})
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+
+
+def split_sections(text: str, target_chars: int) -> List[str]:
+    """`text` cut at headings into parts of at most ~target_chars (a longer section is cut at paragraph breaks)"""
+    parts, current = [], ''
+    for piece in (piece for section in split_headings(text) for piece in _split_long(section, target_chars)):
+        if current and len(current) + len(piece) > target_chars:
+            parts.append(current)
+            current = ''
+        current += piece
+    if current or not parts:
+        parts.append(current)
+    return parts
+
+
+def reassemble(parts: List[str], revised: List[str]) -> str:
+    """Revised parts in order, each keeping the whitespace that followed the original part"""
+    out = []
+    for part, text in zip(parts, revised):
+        trailing = part[len(part.rstrip()):]
+        out.append(text.rstrip() + trailing)
+    return ''.join(out)
+
+
+def _split_long(text, target_chars):
+    if len(text) <= target_chars:
+        return [text]
+    for pattern in BREAKS:
+        pieces = [piece for piece in pattern.split(text) if piece]
+        if len(pieces) > 1:
+            return [small for piece in pieces for small in _split_long(piece, target_chars)]
+    return [text[start:start + target_chars] for start in range(0, len(text), target_chars)]
@@ -0,0 +1,373 @@
+"""
+Document Store
+Upload-once registry behind /documents. A document is uploaded (or its text
+posted) once and gets a document_id; text extraction (conversion + OCR) runs
+in the background on a small thread pool, and the other endpoints take the
+document_id instead of the file bytes or the full text on every call.
+
+Each document is one JSON record (status + extracted text) in
+DOCUMENT_STORE_DIR, so an id works on every API worker sharing that
+directory, not just the one that took the upload. The upload itself is
+removed from its workspace as soon as extraction finishes, and records not
+used for DOCUMENT_TTL_SECONDS are dropped.
+
+Extraction starts as soon as the file is attached, so a request that needs
+the text later (the QTA final review) usually finds it ready; if not, it
+awaits the running job (or, on another worker, polls the record) instead of
+converting and OCR-ing the file itself.
+"""
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import APIRouter, File, HTTPException, UploadFile, status
+from pydantic import BaseModel
+
+from app.config.config import (
+    DOCUMENT_EXTRACTION_WORKERS,
+    DOCUMENT_STORE_DIR,
+    DOCUMENT_TTL_SECONDS,
+    DOCUMENT_WAIT_TIMEOUT_SECONDS,
+)
+from app.config.logging_config import get_logger
+from app.services.registry import get_document_ocr
+from app.services.utils.metrics import DOCUMENT_EXTRACTION_SECONDS, DOCUMENT_WAIT_SECONDS, timed
+from app.services.utils.tracing import span, start_trace
+from app.services.utils.workspace import get_workspace_manager
+
+logger = get_logger('document_store')
+
+PROCESSING = 'processing'
+READY = 'ready'
+FAILED = 'failed'
+
+DOCUMENT_ID = re.compile(r'^[0-9a-f]{32}$')
+# How often a worker without the extraction job re-reads a record it waits for
+WAIT_POLL_SECONDS = 0.5
+
+
+class StoredDocument:
+    def __init__(self, document_id, filename, source):
+        """A registered document; text is set once extraction has finished"""
+        self.document_id = document_id
+        self.filename = filename
+        self.source = source  # 'upload' or 'text'
+        self.status = PROCESSING
+        self.text = None
+        self.error = None
+        self.created_at = time.time()
+
+    def describe(self):
+        """Status view returned by the /documents endpoints"""
+        return {
+            'document_id': self.document_id,
+            'filename': self.filename,
+            'source': self.source,
+            'status': self.status,
+            'characters': len(self.text) if self.text is not None else None,
+            'error': self.error,
+        }
+
+    def to_record(self):
+        return {**self.describe(), 'text': self.text, 'created_at': self.created_at}
+
+    @classmethod
+    def from_record(cls, record):
+        document = cls(record['document_id'], record.get('filename'), record.get('source'))
+        document.status = record['status']
+        document.text = record.get('text')
+        document.error = record.get('error')
+        document.created_at = record.get('created_at', document.created_at)
+        return document
+
+
+class DocumentStore:
+    def __init__(self, root=None, ttl_seconds=None, workers=None):
+        """Initialize the record directory; the extraction pool is started on first upload"""
+        self.root = root or DOCUMENT_STORE_DIR
+        self.ttl_seconds = DOCUMENT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.workers = workers or DOCUMENT_EXTRACTION_WORKERS
+        self._jobs = {}  # document_id -> extraction future, for jobs running in this process
+        self._lock = threading.Lock()
+        self._executor = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='document-extract')
+            return self._executor
+
+    def _record_path(self, document_id):
+        if not DOCUMENT_ID.match(document_id or ''):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown document_id: {document_id}")
+        return os.path.join(self.root, f"{document_id}.json")
+
+    def _save(self, document, create=True):
+        """Write the record atomically; with create=False only if it still exists (not deleted meanwhile)"""
+        path = self._record_path(document.document_id)
+        if not create and not os.path.exists(path):
+            return False
+        fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.root)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(document.to_record(), f)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return True
+
+    def _register(self, document):
+        self.purge_expired()
+        self._save(document)
+        return document
+
+    async def add_upload(self, upload: UploadFile):
+        """Store an upload and start extracting its text in the background"""
+        # The upload lives in its own workspace until extraction is done
+        workspace = get_workspace_manager().create()
+        try:
+            path = await workspace.save_upload(upload)
+            valid, message = get_document_ocr().validate_file(path)
+            if not valid:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
+            document = self._register(StoredDocument(uuid.uuid4().hex, upload.filename, 'upload'))
+        except BaseException:
+            workspace.cleanup()
+            raise
+        job = self._get_executor().submit(self._extract, document, path, workspace)
+        with self._lock:
+            self._jobs[document.document_id] = job
+        # Runs right away if the job already finished
+        job.add_done_callback(lambda _: self._forget_job(document.document_id))
+        logger.info("document_uploaded", document_id=document.document_id, filename=document.filename)
+        return document
+
+    def add_text(self, text: str, filename: Optional[str] = None):
+        """Store text that is already extracted (nothing runs in the background)"""
+        document = StoredDocument(uuid.uuid4().hex, filename, 'text')
+        document.text = text
+        document.status = READY
+        return self._register(document)
+
+    def _extract(self, document, path, workspace):
+        # Runs on the pool after the upload request has returned: its own trace
+        try:
+            with start_trace('document.extract', document_id=document.document_id), \
+                    timed(DOCUMENT_EXTRACTION_SECONDS) as labels:
+                text = get_document_ocr().extract_text(path, workspace.root)
+                if not text or text.startswith('Error:'):
+                    labels['outcome'] = 'failed'
+                    document.error = text or 'No text could be extracted'
+                    document.status = FAILED
+                else:
+                    document.text = text
+                    document.status = READY
+        except Exception as e:
+            document.error = f"Error: {str(e)}"
+            document.status = FAILED
+        finally:
+            workspace.cleanup()
+            # A document deleted (or expired) while it was extracted stays gone
+            try:
+                self._save(document, create=False)
+            except OSError as e:
+                logger.error("document_save_failed", document_id=document.document_id, error=str(e))
+        logger.info("document_extracted", document_id=document.document_id,
+                    status=document.status, error=document.error)
+        return document.text
+
+    def _forget_job(self, document_id):
+        with self._lock:
+            self._jobs.pop(document_id, None)
+
+    def get(self, document_id: str) -> StoredDocument:
+        """The document registered under document_id; 404 if unknown or expired"""
+        path = self._record_path(document_id)
+        try:
+            with open(path, encoding='utf-8') as f:
+                record = json.load(f)
+            # The record's mtime is its last use (see purge_expired)
+            os.utime(path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown document_id: {document_id}")
+        return StoredDocument.from_record(record)
+
+    def text(self, document_id: str) -> str:
+        """Extracted text of a document; 409 while extraction is running, 422 if it failed"""
+        return self._text(self.get(document_id))
+
+    def _text(self, document):
+        if document.status == PROCESSING:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Document {document.document_id} is still being processed; retry once its status is '{READY}'"
+            )
+        if document.status == FAILED:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Text extraction failed for document {document.document_id}: {document.error}"
+            )
+        return document.text
+
+    async def wait_text(self, document_id: str, timeout=None) -> str:
+        """
+        Extracted text of a document, awaiting its extraction if it is still
+        running; 409 if it has not finished within `timeout` seconds
+        (DOCUMENT_WAIT_TIMEOUT_SECONDS by default, 0 = no limit).
+        """
+        document = self.get(document_id)
+        if document.status != PROCESSING:
+            return self._text(document)
+        timeout = DOCUMENT_WAIT_TIMEOUT_SECONDS if timeout is None else timeout
+        with span('document.wait', document_id=document_id), timed(DOCUMENT_WAIT_SECONDS) as labels:
+            try:
+                await asyncio.wait_for(self._finished(document_id), timeout or None)
+            except asyncio.TimeoutError:
+                labels['outcome'] = 'timeout'
+        return self.text(document_id)
+
+    async def _finished(self, document_id):
+        with self._lock:
+            job = self._jobs.get(document_id)
+        if job is not None:
+            # shield: a timed-out wait must not cancel the job for later requests
+            await asyncio.shield(asyncio.wrap_future(job))
+            return
+        # Extracted by another worker: follow its record
+        while (await asyncio.to_thread(self.get, document_id)).status == PROCESSING:
+            await asyncio.sleep(WAIT_POLL_SECONDS)
+
+    def entry(self, document_id: str) -> dict:
+        """The document as an entry of a request's document list"""
+        document = self.get(document_id)
+        return {'document_id': document_id, 'filename': document.filename, 'text': self._text(document)}
+
+    def delete(self, document_id: str):
+        """Forget a document (a running extraction finishes but its result is dropped)"""
+        document = self.get(document_id)
+        try:
+            os.remove(self._record_path(document_id))
+        except FileNotFoundError:
+            pass
+        return document
+
+    def purge_expired(self):
+        """
+        Drop records not used for ttl_seconds. A record still 'processing' that
+        old was left behind by a worker that died during extraction.
+        """
+        if not self.ttl_seconds:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for entry in os.scandir(self.root):
+            # Records, and half-written ones from a worker that died while saving
+            if not (entry.name.endswith('.json') or entry.name.startswith('.tmp-')):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def shutdown(self, wait=True):
+        """Stop the extraction pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Shared store instance
+_document_store = None
+def get_document_store():
+    global _document_store
+    if _document_store is None:
+        _document_store = DocumentStore()
+    return _document_store
+
+
+def document_text(document_id: str) -> str:
+    """Text of a stored document for a request that references it (see DocumentStore.text)"""
+    with span('document.resolve', document_id=document_id):
+        return get_document_store().text(document_id)
+
+
+async def wait_for_document_text(document_id: str) -> str:
+    """Text of a stored document, awaiting its background extraction (see DocumentStore.wait_text)"""
+    return await get_document_store().wait_text(document_id)
+
+
+def text_or_document(text: Optional[str], document_id: Optional[str], field: str) -> str:
+    """`text` if given, else the text of the stored document `document_id`; 400 when neither is"""
+    if text is not None and text.strip():
+        return text
+    if document_id:
+        return document_text(document_id)
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Either {field} or {field}_id (a document uploaded to /documents) must be provided."
+    )
+
+
+def document_entry(document_id: str) -> dict:
+    """{'document_id', 'filename', 'text'} of a stored document for a request's document list"""
+    with span('document.resolve', document_id=document_id):
+        return get_document_store().entry(document_id)
+
+
+# API Endpoints
+router = APIRouter()
+
+
+class DocumentTextRequest(BaseModel):
+    text: str
+    filename: Optional[str] = None
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def upload_document(file: UploadFile = File(...)):
+    """
+    Upload a document once; its text is extracted in the background. Poll
+    GET /documents/{document_id}. Ids are valid on every API worker that shares
+    DOCUMENT_STORE_DIR (one host, or a shared volume across pods).
+    """
+    document = await get_document_store().add_upload(file)
+    return document.describe()
+
+
+@router.post("/text", status_code=status.HTTP_201_CREATED)
+async def register_text(request: DocumentTextRequest):
+    """Register document text that is already extracted, to reference it by document_id afterwards"""
+    return get_document_store().add_text(request.text, request.filename).describe()
+
+
+@router.get("/{document_id}")
+async def document_status(document_id: str):
+    """Status of a document: 'processing' while its text is extracted, then 'ready' or 'failed'"""
+    return get_document_store().get(document_id).describe()
+
+
+@router.get("/{document_id}/text")
+async def get_document_text(document_id: str):
+    """Extracted text of a document (409 while it is still being processed)"""
+    return document_entry(document_id)
+
+
+@router.delete("/{document_id}")
+async def delete_document(document_id: str):
+    """Forget a document"""
+    return get_document_store().delete(document_id).describe()
@@ -0,0 +1,83 @@
+"""
+Shared async HTTP transport
+One long-lived httpx client (keep-alive pooling, HTTP/2 when available)
+reused by every outbound API call in the process.
+"""
+
+import asyncio
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException, Request
+
+# Pool sizing for outbound API traffic
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+
+# Default timeouts (seconds)
+REQUEST_TIMEOUT = 120.0
+CONNECT_TIMEOUT = 10.0
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared AsyncClient, creating it on first use.
+    The client is bound to the running event loop, so a new one is created
+    if the loop changed (e.g. standalone scripts using asyncio.run).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client (called on application shutdown)"""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def run_until_disconnected(request: Request, coro, poll_interval: float = 0.5):
+    """
+    Await `coro`, cancelling it if the HTTP client disconnects first.
+    Cancellation propagates into in-flight httpx calls, so upstream requests
+    are aborted instead of running to completion for nobody.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,192 @@
+"""
+LLM Call Helper
+Single entry point for OpenAI chat completions made through the SDK client,
+so every call is timed by service and method and its retries and token usage
+are counted and attributed to the calling endpoint and meeting.
+
+Passing `response_model` requests output constrained to that pydantic model
+(see structured_output.response_format_for).
+"""
+
+import time
+
+from pydantic import ValidationError
+
+from app.config.config import STRUCTURED_OUTPUT_ATTEMPTS
+from app.config.logging_config import get_logger
+from app.services.utils.metrics import LLM_CALL_SECONDS, LLM_REASKS, LLM_RETRIES, LLM_STREAM_ABORTS, timed
+from app.services.utils.partial_json import PartialJSONError, PartialJSONParser, SchemaGuard, SchemaViolation
+from app.services.utils.structured_output import StructuredOutputError, parse_structured_output, response_format_for
+from app.services.utils.tracing import span, start_detached_span
+from app.services.utils.usage import record_llm_usage
+
+logger = get_logger('llm')
+
+
+def create_chat_completion(client, service, method, response_model=None, **kwargs):
+    """
+    Call client.chat.completions.create(**kwargs) and record metrics.
+    `service` and `method` identify the caller (e.g. 'initiation', 'get_per_minute_summary').
+    """
+    _add_response_format(kwargs, response_model)
+    with span('llm.chat', service=service, method=method, model=kwargs.get('model')) as call_span, \
+            timed(LLM_CALL_SECONDS, service=service, method=method):
+        raw_response = client.chat.completions.with_raw_response.create(**kwargs)
+        completion = raw_response.parse()
+        if call_span is not None:
+            call_span.set_attribute('llm.retries', raw_response.retries_taken)
+            if completion.usage:
+                call_span.set_attribute('llm.prompt_tokens', completion.usage.prompt_tokens)
+                call_span.set_attribute('llm.completion_tokens', completion.usage.completion_tokens)
+
+    _record_completed_call(service, method, completion.model or kwargs.get('model'),
+                           raw_response.retries_taken, completion.usage)
+    return completion
+
+
+def stream_chat_completion(client, service, method, response_model=None, **kwargs):
+    """
+    Stream a chat completion, yielding content deltas as they arrive.
+    Latency, retries and token usage are recorded when the stream ends; closing
+    the generator early (e.g. the HTTP client went away) closes the upstream
+    stream and is counted with outcome 'cancelled'.
+    """
+    _add_response_format(kwargs, response_model)
+    call_span = start_detached_span('llm.chat', service=service, method=method,
+                                    model=kwargs.get('model'), stream=True)
+    start = time.perf_counter()
+    outcome = 'error'
+    usage = None
+    model = kwargs.get('model')
+    retries = 0
+    first_token_at = None
+    try:
+        raw_response = client.chat.completions.with_raw_response.create(
+            stream=True, stream_options={'include_usage': True}, **kwargs
+        )
+        retries = raw_response.retries_taken
+        stream = raw_response.parse()
+        try:
+            for chunk in stream:
+                model = chunk.model or model
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+        outcome = 'ok'
+    except GeneratorExit:
+        outcome = 'cancelled'
+        raise
+    finally:
+        LLM_CALL_SECONDS.labels(service=service, method=method, outcome=outcome).observe(time.perf_counter() - start)
+        if call_span is not None:
+            call_span.set_attribute('llm.retries', retries)
+            call_span.set_attribute('llm.outcome', outcome)
+            if first_token_at is not None:
+                call_span.set_attribute('llm.time_to_first_token_ms', round((first_token_at - start) * 1000, 1))
+            if usage:
+                call_span.set_attribute('llm.prompt_tokens', usage.prompt_tokens)
+                call_span.set_attribute('llm.completion_tokens', usage.completion_tokens)
+            call_span.end()
+
+    _record_completed_call(service, method, model, retries, usage)
+
+
+def create_structured_completion(client, service, method, response_model, attempts=None, **kwargs):
+    """
+    Request output constrained to `response_model` and return the validated
+    model. An answer that fails validation is repaired locally first; the
+    request is only repeated when that fails too, up to `attempts` requests
+    (STRUCTURED_OUTPUT_ATTEMPTS). Raises StructuredOutputError.
+    """
+    attempts = STRUCTURED_OUTPUT_ATTEMPTS if attempts is None else attempts
+    for attempt in range(1, attempts + 1):
+        completion = create_chat_completion(client, service, method, response_model=response_model, **kwargs)
+        message = completion.choices[0].message
+        try:
+            if getattr(message, 'refusal', None):
+                raise StructuredOutputError(f"Model refused: {message.refusal}")
+            return parse_structured_output(message.content, response_model, service, method)
+        except StructuredOutputError as e:
+            logger.warning("structured_output_invalid", service=service, method=method, attempt=attempt,
+                           finish_reason=completion.choices[0].finish_reason, reason=str(e))
+            if attempt == attempts:
+                raise
+            LLM_REASKS.labels(service=service, method=method).inc()
+
+
+def stream_structured_completion(client, service, method, response_model, attempts=None, emit_depth=2, **kwargs):
+    """
+    Stream a JSON completion for `response_model`, yielding events:
+      ('field', path, value)  a value up to `emit_depth` levels deep, as soon as it closes
+      ('retry', reason)       the attempt was abandoned; fields start over
+      ('result', model)       the validated response model (last event)
+    Each closed value is checked against the model on arrival, so an attempt
+    whose partial output is already invalid is cut off right away instead of
+    failing after the whole completion. Raises StructuredOutputError once
+    `attempts` attempts (STRUCTURED_OUTPUT_ATTEMPTS) have failed.
+    """
+    attempts = STRUCTURED_OUTPUT_ATTEMPTS if attempts is None else attempts
+    for attempt in range(1, attempts + 1):
+        parser = PartialJSONParser(max_depth=emit_depth)
+        guard = SchemaGuard(response_model)
+        chunks = stream_chat_completion(client, service, method, response_model=response_model, **kwargs)
+        try:
+            # Keep reading after the object closes so the usage chunk is recorded
+            for chunk in chunks:
+                if parser.done:
+                    continue
+                for path, value in parser.feed(chunk):
+                    guard.check(path, value)
+                    if path:
+                        yield 'field', path, value
+            result = response_model.model_validate(parser.result())
+        except (PartialJSONError, SchemaViolation, ValidationError) as e:
+            reason = str(e).splitlines()[0]
+            LLM_STREAM_ABORTS.labels(service=service, method=method).inc()
+            logger.warning("structured_stream_aborted", service=service, method=method, attempt=attempt,
+                           received_chars=parser.consumed, reason=reason)
+            if attempt == attempts:
+                raise StructuredOutputError(reason) from e
+            LLM_REASKS.labels(service=service, method=method).inc()
+            yield 'retry', reason
+            continue
+        finally:
+            chunks.close()
+        yield 'result', result
+        return
+
+
+def structured_result(events):
+    """Drain stream_structured_completion events and return the validated model"""
+    for event in events:
+        if event[0] == 'result':
+            return event[1]
+    raise StructuredOutputError("Structured stream ended without a result")
+
+
+def _add_response_format(kwargs, response_model):
+    if response_model is not None and 'response_format' not in kwargs:
+        response_format = response_format_for(kwargs.get('model'), response_model)
+        if response_format is not None:
+            kwargs['response_format'] = response_format
+
+
+def _record_completed_call(service, method, model, retries, usage):
+    if retries:
+        LLM_RETRIES.labels(service=service, method=method).inc(retries)
+    record_llm_usage(service, method, model, usage)
+    logger.debug(
+        "llm_call_completed",
+        service=service,
+        method=method,
+        model=model,
+        retries=retries,
+        prompt_tokens=getattr(usage, 'prompt_tokens', None),
+        completion_tokens=getattr(usage, 'completion_tokens', None),
+        cached_tokens=getattr(getattr(usage, 'prompt_tokens_details', None), 'cached_tokens', None),
+    )
@@ -0,0 +1,137 @@
+"""
+Prometheus Metrics
+Latency histograms for every processing stage (upload ingest, conversion,
+chunking, OCR calls, LLM calls, JSON parsing) and counters for retries,
+conversion cache lookups, token usage and structured-output repairs,
+served on GET /metrics.
+
+prometheus_client is optional: without it every metric is a no-op and
+/metrics answers 503. Set PROMETHEUS_MULTIPROC_DIR to aggregate samples from
+gunicorn workers and conversion pool processes.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# Seconds; spans sub-millisecond parsing up to multi-minute LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class _NoopMetric:
+    """Stand-in used when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, amount):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+def _histogram(name, documentation, labelnames):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return prometheus_client.Histogram(name, documentation, labelnames, buckets=LATENCY_BUCKETS)
+
+
+def _counter(name, documentation, labelnames):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return prometheus_client.Counter(name, documentation, labelnames)
+
+
+UPLOAD_INGEST_SECONDS = _histogram(
+    'upload_ingest_seconds', 'Time to stream an upload into the request workspace', ['outcome'])
+CONVERSION_SECONDS = _histogram(
+    'conversion_seconds', 'Time to convert a document to PDF, including pool queueing', ['format', 'outcome'])
+CHUNKING_SECONDS = _histogram(
+    'chunking_seconds', 'Time to split an oversized PDF or image for OCR', ['strategy', 'outcome'])
+OCR_CALL_SECONDS = _histogram(
+    'ocr_call_seconds', 'Latency of a single Document AI process call', ['mime_type', 'outcome'])
+LLM_CALL_SECONDS = _histogram(
+    'llm_call_seconds', 'Latency of a single LLM API call', ['service', 'method', 'outcome'])
+JSON_PARSE_SECONDS = _histogram(
+    'json_parse_seconds', 'Time to parse an LLM response into structured data', ['service', 'outcome'])
+DOCUMENT_EXTRACTION_SECONDS = _histogram(
+    'document_extraction_seconds', 'Time to extract the text of a stored document in the background',
+    ['outcome'])
+DOCUMENT_WAIT_SECONDS = _histogram(
+    'document_wait_seconds', 'Time a request waited for the background extraction of a document it references',
+    ['outcome'])
+
+LLM_RETRIES = _counter(
+    'llm_retries', 'Retries performed by the LLM client before a call completed', ['service', 'method'])
+CONVERSION_CACHE_REQUESTS = _counter(
+    'conversion_cache_requests', 'Converted-PDF cache lookups', ['result'])
+LLM_TOKENS = _counter(
+    'llm_tokens', 'Tokens reported by the LLM API', ['service', 'method', 'kind'])
+LLM_STREAM_ABORTS = _counter(
+    'llm_stream_aborts', 'Streamed structured completions abandoned because the partial output was invalid',
+    ['service', 'method'])
+STRUCTURED_OUTPUT_REPAIRS = _counter(
+    'structured_output_repairs', 'LLM answers that failed validation and went through local JSON repair',
+    ['service', 'method', 'outcome'])
+LLM_REASKS = _counter(
+    'llm_reasks', 'Structured completions requested again because the answer could not be used',
+    ['service', 'method'])
+DOCUMENT_PATCHES = _counter(
+    'document_patches', 'Model edit lists applied to a document (outcome=failed falls back to the full document)',
+    ['service', 'method', 'outcome'])
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """
+    Observe the duration of the block on `histogram`.
+    The `outcome` label is 'error' if the block raises; callers can also set
+    it explicitly through the yielded label dict.
+    """
+    labels.setdefault('outcome', 'ok')
+    start = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        labels['outcome'] = 'error'
+        raise
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def token_counts(usage):
+    """(prompt, completion, cached) token counts from an SDK usage object or a raw usage dict"""
+    if not usage:
+        return 0, 0, 0
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, 'model_dump') else vars(usage)
+    details = usage.get('prompt_tokens_details') or {}
+    return usage.get('prompt_tokens') or 0, usage.get('completion_tokens') or 0, details.get('cached_tokens') or 0
+
+
+def record_token_usage(service, method, usage):
+    """Count prompt/completion/cached tokens from an SDK usage object or a raw usage dict"""
+    for kind, count in zip(('prompt', 'completion', 'cached'), token_counts(usage)):
+        if count:
+            LLM_TOKENS.labels(service=service, method=method, kind=kind).inc(count)
+
+
+def metrics_available():
+    return prometheus_client is not None
+
+
+def render_metrics():
+    """Return (body, content_type) in the Prometheus text exposition format"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
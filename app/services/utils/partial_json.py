@@ -0,0 +1,256 @@
+"""
+Incremental JSON Parsing
+Consumes a JSON document chunk by chunk as the model generates it and
+reports every value the moment it closes, together with its path
+(e.g. ('impact_assessment', 'Product_Quality')). SchemaGuard checks those
+values against the pydantic response model, so output that is already
+invalid can be abandoned long before the completion finishes.
+
+Like the services' own parsing, a leading ```json fence, trailing text after
+the object and raw control characters inside strings are tolerated.
+"""
+
+import json
+import re
+import typing
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# Text allowed before the root object: whitespace and an optional code fence
+_PREFIX_PATTERN = re.compile(r'\s*(`{1,3}[a-zA-Z]*\s*)?')
+_SCALAR_CHARS = set('0123456789+-.eEtruefalsn')
+_WHITESPACE = ' \t\r\n'
+
+
+class PartialJSONError(ValueError):
+    """The text can no longer become a valid JSON object"""
+
+
+class SchemaViolation(ValueError):
+    """A completed value does not match the response model"""
+
+
+class _Frame:
+    __slots__ = ('kind', 'start', 'state', 'key', 'index')
+
+    def __init__(self, kind, start):
+        self.kind = kind  # 'object' | 'array'
+        self.start = start
+        self.state = 'key_or_end' if kind == 'object' else 'value_or_end'
+        self.key = None
+        self.index = -1
+
+    @property
+    def slot(self):
+        return self.key if self.kind == 'object' else self.index
+
+
+class PartialJSONParser:
+    """
+    Feed text with feed(); it returns (path, value) for each value completed
+    by that chunk whose path is at most `max_depth` long (the root object is
+    reported with path ()). Raises PartialJSONError on invalid syntax.
+    """
+
+    def __init__(self, max_depth=2):
+        self.max_depth = max_depth
+        self.done = False
+        self._text = ''
+        self._pos = 0
+        self._stack = []
+        self._root_start = None
+        self._root_end = None
+        self._string_start = None
+        self._string_is_key = False
+        self._escape = False
+        self._scalar_start = None
+
+    @property
+    def consumed(self):
+        return self._pos
+
+    def feed(self, chunk):
+        self._text += chunk
+        completed = []
+        text = self._text
+        while self._pos < len(text) and not self.done:
+            position = self._pos
+            char = text[position]
+
+            if self._string_start is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._end_string(position, completed)
+                self._pos += 1
+                continue
+
+            if self._scalar_start is not None:
+                if char in _SCALAR_CHARS:
+                    self._pos += 1
+                    continue
+                self._end_value(self._scalar_start, position, completed)
+                self._scalar_start = None
+                continue  # re-examine the delimiter
+
+            if self._root_start is None:
+                self._scan_prefix(position)
+                if self._root_start is None:
+                    return completed
+                continue
+
+            self._structural(char, position, completed)
+            self._pos += 1
+        return completed
+
+    def result(self):
+        """The complete root object (raises PartialJSONError if it never closed)"""
+        if not self.done:
+            raise PartialJSONError("Response ended before the JSON object was complete")
+        return self._loads(self._root_start, self._root_end)
+
+    # -- internals -------------------------------------------------------------
+
+    def _scan_prefix(self, position):
+        brace = self._text.find('{', position)
+        prefix = self._text[:brace if brace != -1 else len(self._text)]
+        if not _PREFIX_PATTERN.fullmatch(prefix):
+            raise PartialJSONError(f"Response does not start with a JSON object: {prefix[:40]!r}")
+        if brace == -1:
+            self._pos = len(self._text)
+            return
+        self._root_start = brace
+        self._stack.append(_Frame('object', brace))
+        self._pos = brace + 1
+
+    def _expecting_value(self):
+        return self._stack[-1].state in ('value', 'value_or_end')
+
+    def _begin_value(self):
+        frame = self._stack[-1]
+        if frame.kind == 'array':
+            frame.index += 1
+        frame.state = 'in_value'
+
+    def _structural(self, char, position, completed):
+        frame = self._stack[-1]
+        if char in _WHITESPACE:
+            return
+        if char == '"':
+            if frame.kind == 'object' and frame.state in ('key_or_end', 'key'):
+                self._string_is_key = True
+            elif self._expecting_value():
+                self._string_is_key = False
+                self._begin_value()
+            else:
+                self._unexpected(char, position)
+            self._string_start = position
+        elif char in '{[':
+            if not self._expecting_value():
+                self._unexpected(char, position)
+            self._begin_value()
+            self._stack.append(_Frame('object' if char == '{' else 'array', position))
+        elif char in '}]':
+            closes = 'object' if char == '}' else 'array'
+            if frame.kind != closes or frame.state not in ('key_or_end', 'value_or_end', 'comma_or_end'):
+                self._unexpected(char, position)
+            self._stack.pop()
+            self._end_value(frame.start, position + 1, completed)
+        elif char == ':':
+            if frame.state != 'colon':
+                self._unexpected(char, position)
+            frame.state = 'value'
+        elif char == ',':
+            if frame.state != 'comma_or_end':
+                self._unexpected(char, position)
+            frame.state = 'key' if frame.kind == 'object' else 'value'
+        elif char in _SCALAR_CHARS:
+            if not self._expecting_value():
+                self._unexpected(char, position)
+            self._begin_value()
+            self._scalar_start = position
+        else:
+            self._unexpected(char, position)
+
+    def _end_string(self, position, completed):
+        start, self._string_start = self._string_start, None
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame.key = self._loads(start, position + 1)
+            frame.state = 'colon'
+        else:
+            self._end_value(start, position + 1, completed)
+
+    def _end_value(self, start, end, completed):
+        if not self._stack:
+            self.done = True
+            self._root_end = end
+            if self.max_depth >= 0:
+                completed.append(((), self._loads(start, end)))
+            return
+        self._stack[-1].state = 'comma_or_end'
+        if len(self._stack) <= self.max_depth:
+            path = tuple(frame.slot for frame in self._stack)
+            completed.append((path, self._loads(start, end)))
+
+    def _loads(self, start, end):
+        try:
+            return json.loads(self._text[start:end], strict=False)
+        except json.JSONDecodeError as e:
+            raise PartialJSONError(f"Invalid JSON value at offset {start}: {e}") from e
+
+    def _unexpected(self, char, position):
+        raise PartialJSONError(f"Unexpected {char!r} at offset {position}")
+
+
+class SchemaGuard:
+    """Validate values at a path against the matching field of a pydantic model"""
+
+    def __init__(self, model):
+        self.model = model
+        self._adapters = {}
+
+    def check(self, path, value):
+        if not path:
+            return
+        annotation = self._annotation_at(path)
+        if annotation is None or annotation is Any:
+            return
+        adapter = self._adapters.get(path)
+        if adapter is None:
+            adapter = self._adapters[path] = TypeAdapter(annotation)
+        try:
+            adapter.validate_python(value)
+        except ValidationError as e:
+            raise SchemaViolation(f"{'.'.join(map(str, path))}: {e.errors()[0]['msg']}") from e
+
+    def _annotation_at(self, path):
+        """Annotation of the field at `path`, or None where the schema doesn't constrain it"""
+        annotation = self.model
+        for part in path:
+            annotation = _unwrap_optional(annotation)
+            origin = typing.get_origin(annotation)
+            args = typing.get_args(annotation)
+            if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                field = annotation.model_fields.get(part) if isinstance(part, str) else None
+                if field is None:
+                    return None  # extra keys are ignored by the models
+                annotation = field.annotation
+            elif origin is list and isinstance(part, int):
+                annotation = args[0] if args else Any
+            elif origin is dict and isinstance(part, str):
+                annotation = args[1] if args else Any
+            else:
+                return None
+        return annotation
+
+
+def _unwrap_optional(annotation):
+    if typing.get_origin(annotation) is typing.Union:
+        members = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(members) == 1:
+            return members[0]
+    return annotation
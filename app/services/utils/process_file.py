@@ -1,9 +1,16 @@
 import os
+import shutil
 import tempfile
 from pathlib import Path
 from PyPDF2 import PdfReader, PdfWriter
 from PIL import Image
 import fitz  # PyMuPDF for PDF operations (correct import, do not import frontend)
+from app.config.logging_config import get_logger
+from app.services.utils.metrics import CHUNKING_SECONDS, timed
+from app.services.utils.tracing import span
+from app.services.utils.workspace import check_work_dir_quota
+
+logger = get_logger('file_processor')
 
 class FileProcessor:
     def __init__(self):
@@ -26,14 +33,14 @@ class FileProcessor:
                 page_count = doc.page_count
                 doc.close()
             except Exception as e:
-                print(f"Error reading PDF: {e}")
+                logger.warning("pdf_page_count_failed", path=file_path, error=str(e))
                 # Fallback to PyPDF2
                 try:
                     with open(file_path, 'rb') as f:
                         reader = PdfReader(f)
                         page_count = len(reader.pages)
                 except Exception as e2:
-                    print(f"Error with PyPDF2: {e2}")
+                    logger.warning("pdf_page_count_fallback_failed", path=file_path, error=str(e2))
                     page_count = 1  # Assume single page if can't determine
         else:
             # For image files, assume single page
@@ -41,10 +48,10 @@ class FileProcessor:
             
         return file_size, page_count
     
-    def split_pdf_by_size(self, file_path, target_size_bytes):
+    def split_pdf_by_size(self, file_path, target_size_bytes, temp_dir=None):
         """Split PDF into chunks based on file size"""
         chunks = []
-        temp_dir = tempfile.mkdtemp()
+        temp_dir = temp_dir or tempfile.mkdtemp()
         
         try:
             doc = fitz.open(file_path)
@@ -102,15 +109,15 @@ class FileProcessor:
             doc.close()
             
         except Exception as e:
-            print(f"Error splitting PDF by size: {e}")
+            logger.error("split_pdf_by_size_failed", path=file_path, error=str(e))
             return [file_path]  # Return original file if splitting fails
         
         return chunks
     
-    def split_pdf_by_pages(self, file_path, max_pages):
+    def split_pdf_by_pages(self, file_path, max_pages, temp_dir=None):
         """Split PDF into chunks based on page count"""
         chunks = []
-        temp_dir = tempfile.mkdtemp()
+        temp_dir = temp_dir or tempfile.mkdtemp()
         
         try:
             doc = fitz.open(file_path)
@@ -133,15 +140,15 @@ class FileProcessor:
             doc.close()
             
         except Exception as e:
-            print(f"Error splitting PDF by pages: {e}")
+            logger.error("split_pdf_by_pages_failed", path=file_path, error=str(e))
             return [file_path]  # Return original file if splitting fails
         
         return chunks
     
-    def split_image_by_size(self, file_path, target_size_bytes):
+    def split_image_by_size(self, file_path, target_size_bytes, temp_dir=None):
         """Split image by reducing quality if it exceeds size limit"""
         chunks = []
-        temp_dir = tempfile.mkdtemp()
+        temp_dir = temp_dir or tempfile.mkdtemp()
         
         try:
             with Image.open(file_path) as img:
@@ -165,7 +172,7 @@ class FileProcessor:
                 chunks.append(chunk_path)
                 
         except Exception as e:
-            print(f"Error processing image: {e}")
+            logger.error("split_image_failed", path=file_path, error=str(e))
             return [file_path]  # Return original file if processing fails
         
         return chunks
@@ -176,80 +183,70 @@ class FileProcessor:
         pages_exceed = page_count > self.max_pages
         return size_exceeds, pages_exceed
     
-    def process_file_with_ocr(self, file_path, ocr_instance):
+    def process_file_with_ocr(self, file_path, ocr_instance, work_dir=None):
         """
         Process file by splitting if necessary and using OCR instance to extract text
-        This method is called by DocumentOCR when file exceeds limits
+        This method is called by DocumentOCR when file exceeds limits.
+        Chunks are written to a private directory (inside work_dir if given)
+        that is always removed before returning.
         """
         if not os.path.exists(file_path):
-            print(f"Error: File not found - {file_path}")
+            logger.error("file_not_found", path=file_path)
             return None
         
-        print(f"FileProcessor: Processing {os.path.basename(file_path)}")
-        
         # Get file information
         file_size, page_count = self.get_file_info(file_path)
-        print(f"FileProcessor: File size: {file_size / (1024*1024):.2f} MB, Pages: {page_count}")
+        logger.info("processing_file", file=os.path.basename(file_path), size_bytes=file_size, pages=page_count)
         
         # Check if splitting is needed
         size_exceeds, pages_exceed = self.needs_splitting(file_size, page_count)
         
         file_extension = Path(file_path).suffix.lower()
         chunks = [file_path]  # Default to original file
+        chunk_dir = tempfile.mkdtemp(prefix='chunks-', dir=work_dir)
         
-        if size_exceeds or pages_exceed:
-            print("FileProcessor: File needs splitting...")
+        try:
+            if size_exceeds or pages_exceed:
+                if file_extension == '.pdf':
+                    if pages_exceed:
+                        with span('chunking', strategy='pdf_pages'), timed(CHUNKING_SECONDS, strategy='pdf_pages'):
+                            chunks = self.split_pdf_by_pages(file_path, self.max_pages, chunk_dir)
+                    elif size_exceeds:
+                        with span('chunking', strategy='pdf_size'), timed(CHUNKING_SECONDS, strategy='pdf_size'):
+                            chunks = self.split_pdf_by_size(file_path, self.max_size_bytes, chunk_dir)
+                else:
+                    # For images, only size splitting applies
+                    if size_exceeds:
+                        with span('chunking', strategy='image_size'), timed(CHUNKING_SECONDS, strategy='image_size'):
+                            chunks = self.split_image_by_size(file_path, self.max_size_bytes, chunk_dir)
             
-            if file_extension == '.pdf':
-                if pages_exceed:
-                    print(f"FileProcessor: Splitting by pages (max {self.max_pages} pages per chunk)")
-                    chunks = self.split_pdf_by_pages(file_path, self.max_pages)
-                elif size_exceeds:
-                    print(f"FileProcessor: Splitting by size (max {self.max_size_mb} MB per chunk)")
-                    chunks = self.split_pdf_by_size(file_path, self.max_size_bytes)
-            else:
-                # For images, only size splitting applies
-                if size_exceeds:
-                    print(f"FileProcessor: Compressing image to meet size limit ({self.max_size_mb} MB)")
-                    chunks = self.split_image_by_size(file_path, self.max_size_bytes)
-        
-        print(f"FileProcessor: Processing {len(chunks)} chunk(s)...")
-        
-        # Process each chunk using the OCR instance and combine results
-        all_text = []
-        for i, chunk_path in enumerate(chunks):
-            print(f"\nFileProcessor: Processing chunk {i+1}/{len(chunks)}: {os.path.basename(chunk_path)}")
+            logger.info("file_split", file=os.path.basename(file_path), chunks=len(chunks),
+                        pages_exceed=pages_exceed, size_exceeds=size_exceeds)
+            # Chunks count against the request's disk quota like its uploads
+            check_work_dir_quota(work_dir)
             
-            try:
-                # Use the OCR instance to extract text from this chunk
-                text = ocr_instance.extract_text_from_single_file(chunk_path)
-                if text and text.strip():
-                    all_text.append(text)
-                    print(f"FileProcessor: ✓ Chunk {i+1} processed successfully ({len(text)} characters)")
-                else:
-                    print(f"FileProcessor: ⚠ Chunk {i+1} returned no text")
-            except Exception as e:
-                print(f"FileProcessor: ✗ Error processing chunk {i+1}: {e}")
-        
-        # Combine all extracted text seamlessly
-        combined_text = '\n'.join(all_text)
-        
-        # Clean up temporary files
-        for chunk_path in chunks:
-            if chunk_path != file_path and os.path.exists(chunk_path):
+            # Process each chunk using the OCR instance and combine results
+            all_text = []
+            for i, chunk_path in enumerate(chunks):
                 try:
-                    os.remove(chunk_path)
-                    # Also try to remove the temporary directory
-                    temp_dir = os.path.dirname(chunk_path)
-                    if temp_dir != os.path.dirname(file_path):
-                        try:
-                            os.rmdir(temp_dir)
-                        except:
-                            pass  # Directory might not be empty
+                    # Use the OCR instance to extract text from this chunk
+                    with span('ocr.chunk', chunk=i + 1, chunks=len(chunks)):
+                        text = ocr_instance.extract_text_from_single_file(chunk_path)
+                    if text and text.strip():
+                        all_text.append(text)
+                        logger.debug("chunk_processed", chunk=i + 1, chunks=len(chunks), characters=len(text))
+                    else:
+                        logger.warning("chunk_empty", chunk=i + 1, chunks=len(chunks))
                 except Exception as e:
-                    print(f"FileProcessor: Warning - Could not clean up temporary file {chunk_path}: {e}")
+                    logger.error("chunk_failed", chunk=i + 1, chunks=len(chunks), error=str(e))
+            
+            # Combine all extracted text seamlessly
+            combined_text = '\n'.join(all_text)
+        finally:
+            # Clean up temporary chunk files
+            shutil.rmtree(chunk_dir, ignore_errors=True)
         
-        print(f"FileProcessor: Combined {len(chunks)} chunks into {len(combined_text)} characters")
+        logger.info("chunks_combined", chunks=len(chunks), characters=len(combined_text))
         return combined_text
 
     def process_file(self, file_path):
@@ -257,6 +254,5 @@ class FileProcessor:
         Legacy method - kept for backward compatibility
         Note: This method doesn't have access to OCR, so it can't extract text
         """
-        print("FileProcessor: Warning - process_file() called without OCR instance")
-        print("FileProcessor: Use process_file_with_ocr() instead for full functionality")
+        logger.warning("process_file_without_ocr", detail="Use process_file_with_ocr() for full functionality")
         return None
\ No newline at end of file
@@ -0,0 +1,315 @@
+"""
+On-demand Request Profiling
+Any single request can be profiled in production without a redeploy by
+sending the admin token (PROFILING_ADMIN_TOKEN) as an X-Profile-Token header
+or ?profile_token= query parameter. The request runs under cProfile and the
+stats are saved under the request's trace id; the response carries
+X-Profile-Id. Conversions sent to the process pool are profiled inside the
+worker and stored as extra artifacts of the same profile.
+
+cProfile hooks the event-loop thread, so work of other requests interleaving
+on that thread during the profiled one is included. Work the request offloads
+to other threads (asyncio.to_thread calls wrapped in profiled(), report
+sections, streamed generators wrapped in profiled_iter()) is profiled on those
+threads and stored as 'thread' / 'stream' artifacts. Only one request is
+profiled at a time; others get X-Profile-Status: busy.
+
+Profiles are listed and downloaded (raw pstats or a text summary) under
+/admin/profiles, guarded by the same token.
+"""
+
+import cProfile
+import contextvars
+import functools
+import glob
+import hmac
+import io
+import itertools
+import json
+import os
+import pstats
+import re
+import secrets
+import sys
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.config.config import PROFILING_ADMIN_TOKEN, PROFILE_DIR, PROFILE_RETENTION
+from app.config.logging_config import get_logger
+from app.services.utils.tracing import current_trace_id
+
+logger = get_logger('profiling')
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{16,32}$')
+ARTIFACT_PATTERN = re.compile(r'^[0-9a-f]{16,32}(\.[a-z_]+-\d+)?\.prof$')
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+# The admin endpoints carry the token themselves and must not be profiled
+UNPROFILED_PATH_PREFIX = '/admin/profiles'
+
+
+class _ActiveProfile:
+    def __init__(self, profile_id):
+        self.profile_id = profile_id
+        self._artifact_numbers = itertools.count(1)
+
+    def next_artifact_path(self, kind):
+        return os.path.join(PROFILE_DIR, f"{self.profile_id}.{kind}-{next(self._artifact_numbers)}.prof")
+
+
+_active_profile = contextvars.ContextVar('active_profile', default=None)
+_profiler_lock = threading.Lock()
+
+
+def token_is_valid(token):
+    return bool(PROFILING_ADMIN_TOKEN and token) and hmac.compare_digest(token, PROFILING_ADMIN_TOKEN)
+
+
+def profile_artifact_path(kind):
+    """
+    Path for an extra artifact of the profile being recorded in this context
+    (e.g. a conversion profiled inside a pool worker), or None when the
+    current request is not being profiled.
+    """
+    active = _active_profile.get()
+    return active.next_artifact_path(kind) if active else None
+
+
+def _dump_artifact(profiler, path):
+    try:
+        profiler.dump_stats(path)
+    except OSError as e:
+        logger.error("profile_artifact_save_failed", path=path, error=str(e))
+
+
+def profiled(function, kind='thread'):
+    """
+    Wrap `function` so that, when it is wrapped while a request is being
+    profiled, each call runs under its own cProfile on whatever thread it
+    lands on and is stored as an extra artifact. Outside a profiled request
+    `function` is returned unchanged.
+    """
+    active = _active_profile.get()
+    if active is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if sys.getprofile() is not None:  # already under a profiler on this thread
+            return function(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _dump_artifact(profiler, active.next_artifact_path(kind))
+    return wrapper
+
+
+def profiled_iter(iterator, kind='stream'):
+    """
+    Profile a sync iterator that is advanced from a thread pool (e.g. by
+    StreamingResponse): every step runs under one shared cProfile, saved as
+    a single artifact once the iterator is exhausted or closed.
+    """
+    active = _active_profile.get()
+    if active is None:
+        return iterator
+    return _profiled_steps(iter(iterator), active, kind)
+
+
+def _profiled_steps(iterator, active, kind):
+    profiler = cProfile.Profile()
+    try:
+        while True:
+            if sys.getprofile() is not None:
+                item = next(iterator, _EXHAUSTED)
+            else:
+                profiler.enable()
+                try:
+                    item = next(iterator, _EXHAUSTED)
+                finally:
+                    profiler.disable()
+            if item is _EXHAUSTED:
+                return
+            yield item
+    finally:
+        _dump_artifact(profiler, active.next_artifact_path(kind))
+
+
+_EXHAUSTED = object()
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def _metadata_path(profile_id):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+def _artifacts(profile_id):
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(PROFILE_DIR, f"{profile_id}*.prof")))
+
+
+def save_profile(profiler, profile_id, metadata):
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    with open(_metadata_path(profile_id), 'w') as f:
+        json.dump(metadata, f)
+    prune_profiles()
+
+
+def list_profiles():
+    """Metadata of stored profiles, newest first"""
+    profiles = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, '*.json')):
+        try:
+            with open(path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        metadata['artifacts'] = _artifacts(metadata['profile_id'])
+        profiles.append(metadata)
+    profiles.sort(key=lambda m: m.get('created_at', 0), reverse=True)
+    return profiles
+
+
+def prune_profiles(keep=None):
+    """Delete all but the `keep` most recent profiles and their artifacts"""
+    keep = PROFILE_RETENTION if keep is None else keep
+    for metadata in list_profiles()[keep:]:
+        for name in metadata['artifacts'] + [f"{metadata['profile_id']}.json"]:
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name))
+            except FileNotFoundError:
+                pass
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """Run token-carrying requests under cProfile (add inside TracingMiddleware)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or not PROFILING_ADMIN_TOKEN
+                or scope['path'].startswith(UNPROFILED_PATH_PREFIX)):
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope.get('headers') or []).get(b'x-profile-token', b'').decode('latin-1')
+        if not token:
+            token = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('profile_token', [''])[0]
+        if not token:
+            await self.app(scope, receive, send)
+            return
+
+        if not token_is_valid(token):
+            await self.app(scope, receive, _with_headers(send, [(b'x-profile-status', b'unauthorized')]))
+            return
+        if not _profiler_lock.acquire(blocking=False):
+            await self.app(scope, receive, _with_headers(send, [(b'x-profile-status', b'busy')]))
+            return
+
+        profile_id = current_trace_id() or secrets.token_hex(16)
+        os.makedirs(PROFILE_DIR, exist_ok=True)  # conversion workers write artifacts here
+        status = {}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        token_var = _active_profile.set(_ActiveProfile(profile_id))
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive,
+                               _with_headers(send_with_status, [(b'x-profile-id', profile_id.encode())]))
+            finally:
+                profiler.disable()
+        finally:
+            _active_profile.reset(token_var)
+            try:
+                save_profile(profiler, profile_id, {
+                    'profile_id': profile_id,
+                    'method': scope['method'],
+                    'path': scope['path'],
+                    'status_code': status.get('code'),
+                    'duration_ms': (time.perf_counter() - started) * 1000,
+                    'created_at': time.time(),
+                })
+                logger.info("request_profiled", profile_id=profile_id, path=scope['path'])
+            except OSError as e:
+                logger.error("profile_save_failed", profile_id=profile_id, error=str(e))
+            finally:
+                _profiler_lock.release()
+
+
+def _with_headers(send, headers):
+    async def wrapped(message):
+        if message['type'] == 'http.response.start':
+            message = dict(message, headers=list(message.get('headers') or []) + headers)
+        await send(message)
+    return wrapped
+
+
+# ---------------------------------------------------------------------------
+# Admin endpoints
+# ---------------------------------------------------------------------------
+
+router = APIRouter()
+
+
+def require_profiling_admin(x_profile_token: Optional[str] = Header(None)):
+    if not PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_is_valid(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Profile-Token")
+
+
+@router.get("", dependencies=[Depends(require_profiling_admin)])
+def get_profiles(limit: int = Query(20, ge=1, le=500)):
+    """List recent request profiles, newest first."""
+    return {"profiles": list_profiles()[:limit]}
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profiling_admin)])
+def download_profile(
+    profile_id: str,
+    artifact: Optional[str] = None,
+    format: str = Query('prof', pattern='^(prof|text)$'),
+    sort: str = Query('cumulative', pattern=f"^({'|'.join(SORT_KEYS)})$"),
+    limit: int = Query(60, ge=1, le=1000),
+):
+    """
+    Download a profile as raw pstats (open with snakeviz / pstats) or, with
+    format=text, as the top functions sorted by `sort`. `artifact` selects an
+    extra artifact such as a worker-side conversion profile.
+    """
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile id")
+    name = artifact or f"{profile_id}.prof"
+    if not ARTIFACT_PATTERN.match(name) or not name.startswith(profile_id):
+        raise HTTPException(status_code=400, detail="Invalid artifact name")
+    path = os.path.join(PROFILE_DIR, name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == 'text':
+        buffer = io.StringIO()
+        pstats.Stats(path, stream=buffer).sort_stats(sort).print_stats(limit)
+        return PlainTextResponse(buffer.getvalue())
+    return FileResponse(path, media_type='application/octet-stream', filename=name)
@@ -0,0 +1,229 @@
+"""
+Report Sections
+Helpers for working on a structured report one section at a time:
+
+  - run_sections() runs one call per section concurrently on a shared thread
+    pool, each in a copy of the caller's context so trace spans, usage
+    attribution and log bindings follow it into the pool thread
+  - SectionEditor serves modify/repeat requests: a small routing call decides
+    which sections the change request affects, only those are regenerated
+    (concurrently when there are several) and every other section is copied
+    through unchanged. It returns None when the whole report should be
+    regenerated instead, and the caller falls back to its single-call path.
+"""
+
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal
+
+from pydantic import Field, ValidationError, create_model
+
+from app.config.config import REPORT_SECTION_WORKERS, SECTION_EDIT_ENABLED, SECTION_EDIT_ROUTER_MODEL
+from app.config.logging_config import get_logger
+from app.services.utils.llm import create_structured_completion
+from app.services.utils.profiling import profiled
+from app.services.utils.tracing import span
+
+logger = get_logger('report_sections')
+
+# Characters of each current section shown to the routing call
+ROUTER_EXCERPT_CHARS = 400
+
+_section_executor = None
+_section_executor_lock = threading.Lock()
+
+
+def get_section_executor():
+    """Thread pool for concurrent section calls, shared by all requests"""
+    global _section_executor
+    if _section_executor is None:
+        with _section_executor_lock:
+            if _section_executor is None:
+                _section_executor = ThreadPoolExecutor(
+                    max_workers=REPORT_SECTION_WORKERS, thread_name_prefix='report-section'
+                )
+    return _section_executor
+
+
+def run_sections(function, names):
+    """
+    Call function(name) for every name concurrently and return {name: result}.
+    The first failure is raised once every started call has finished; calls
+    that have not started yet are cancelled.
+    """
+    executor = get_section_executor()
+    futures = {name: executor.submit(contextvars.copy_context().run, profiled(function), name) for name in names}
+    try:
+        return {name: future.result() for name, future in futures.items()}
+    finally:
+        for future in futures.values():
+            future.cancel()
+
+
+def section_model(response_model, name, fields):
+    """A model with just `fields` of `response_model` (for requesting part of a report)"""
+    return create_model(
+        f'{response_model.__name__}_{name}',
+        **{field: (response_model.model_fields[field].annotation, ...) for field in fields}
+    )
+
+
+class SectionEditor:
+    """
+    Section-targeted regeneration for one report type.
+
+    `groups` maps a section name to the report fields regenerated together
+    (e.g. the root cause analysis with its fishbone diagram); `dependents`
+    maps a section to the sections that must be rewritten whenever it is
+    (e.g. the conclusion summarises the CAPA). `guidance` describes fields
+    for the regeneration prompt, `instructions` adds report-specific rules.
+    """
+
+    def __init__(self, service, method, response_model, document_kind, groups=None, dependents=None,
+                 guidance=None, instructions=''):
+        self.service = service
+        self.method = method
+        self.response_model = response_model
+        self.document_kind = document_kind
+        self.groups = groups or {field: (field,) for field in response_model.model_fields}
+        self.dependents = dependents or {}
+        self.guidance = guidance or {}
+        self.instructions = instructions
+        self.group_models = {name: section_model(response_model, name, fields) for name, fields in self.groups.items()}
+        self.router_model = create_model(
+            f'{response_model.__name__}_affected_sections',
+            sections=(List[Literal[tuple(self.groups)]], Field(..., min_length=1))
+        )
+
+    def edit(self, client, complete, existing, change_request, context=''):
+        """
+        Apply `change_request` to the `existing` report (a dict of its fields) by
+        regenerating only the affected sections. `complete(prompt, response_model,
+        method=...)` is the service's structured completion call, so sections are
+        written with the service's own model and error handling. Returns the
+        updated report, or None when every section is affected or routing failed
+        or picked no section.
+        """
+        if not SECTION_EDIT_ENABLED:
+            return None
+        affected = self.affected_sections(client, existing, change_request)
+        if affected is None:
+            return None
+        copied = {}
+        for name, fields in self.groups.items():
+            if name in affected:
+                continue
+            try:
+                copied.update(self.group_models[name].model_validate({field: existing[field] for field in fields}).model_dump())
+            except (KeyError, ValidationError):
+                # The existing value doesn't fit the report schema; rewrite it
+                affected.add(name)
+        affected = self._with_dependents(affected)
+        if len(affected) == len(self.groups):
+            logger.info("section_edit_full", service=self.service, method=self.method)
+            return None
+
+        logger.info("section_edit", service=self.service, method=self.method,
+                    regenerated=sorted(affected), copied=len(self.groups) - len(affected))
+        with span('section_edit', service=self.service, method=self.method, regenerated=len(affected)):
+            regenerated = run_sections(
+                lambda name: self.regenerate(complete, name, existing, change_request, context), sorted(affected)
+            )
+        for result in regenerated.values():
+            copied.update(result.model_dump())
+        return self.response_model.model_validate({field: copied[field] for field in self.response_model.model_fields})
+
+    def affected_sections(self, client, existing, change_request):
+        """Names of the sections the change request affects, or None if routing failed or picked none"""
+        try:
+            routed = create_structured_completion(
+                client, self.service, f'{self.method}:route', self.router_model,
+                model=SECTION_EDIT_ROUTER_MODEL,
+                messages=[{"role": "user", "content": self.create_router_prompt(existing, change_request)}],
+                temperature=0
+            )
+        except Exception as e:
+            # Routing is only an optimisation; regenerate the whole report instead
+            logger.warning("section_routing_failed", service=self.service, method=self.method, error=str(e))
+            return None
+        if not routed.sections:
+            # No section picked would drop the change request; regenerate the whole report instead
+            logger.warning("section_routing_empty", service=self.service, method=self.method)
+            return None
+        return set(routed.sections)
+
+    def regenerate(self, complete, name, existing, change_request, context):
+        return complete(
+            self.create_section_prompt(name, existing, change_request, context), self.group_models[name],
+            method=f'{self.method}:{name}'
+        )
+
+    def create_router_prompt(self, existing, change_request):
+        outline = '\n'.join(
+            f'- {name}: ' + ' | '.join(_excerpt(existing.get(field)) for field in fields)
+            for name, fields in self.groups.items()
+        )
+        return f"""
+        You route change requests for a {self.document_kind}. The report has these sections (current content, shortened):
+
+        {outline}
+
+        Change request:
+        {change_request}
+
+        Which sections have to be rewritten to apply the change request? List only sections whose content must change;
+        sections the request does not touch must not be listed. If the request affects the whole report, list every section.
+
+        Return only a JSON object: {{"sections": ["<section name>", ...]}}
+        """
+
+    def create_section_prompt(self, name, existing, change_request, context):
+        structure = json.dumps(
+            {field: self.guidance.get(field, f"<updated {field}>") for field in self.groups[name]}, indent=2
+        )
+        return f"""
+        You are revising part of an existing {self.document_kind}; the other sections are kept as they are.
+
+        Change request:
+        {change_request}
+
+        Current report (for context):
+        {json.dumps(existing, indent=2, default=str)}
+        {context}
+
+        Rewrite only the sections below so they reflect the change request, keeping everything the request
+        does not touch exactly as it is. {self.instructions}
+
+        Return only a JSON object with exactly this structure:
+        {structure}
+        """
+
+    def _with_dependents(self, affected):
+        pending = list(affected)
+        while pending:
+            for dependent in self.dependents.get(pending.pop(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+        return affected
+
+
+def existing_report(request, response_model, renamed=None):
+    """
+    The report a repeat request carries, keyed like `response_model`: each field
+    is read from `request.existing_<field>` (`renamed` maps a report field to a
+    different request name)
+    """
+    renamed = renamed or {}
+    return {
+        field: getattr(request, f'existing_{renamed.get(field, field)}')
+        for field in response_model.model_fields
+    }
+
+
+def _excerpt(value):
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    text = ' '.join(text.split())
+    return text if len(text) <= ROUTER_EXCERPT_CHARS else text[:ROUTER_EXCERPT_CHARS] + '...'
@@ -0,0 +1,79 @@
+"""
+Server-Sent Events
+Helpers for the streaming endpoint variants. For long reports, model tokens
+are forwarded as `token` events while the completion is generated; the full
+text is then parsed and validated and sent as one `result` event carrying
+the response model, or an `error` event if that fails. Per-minute endpoints
+send `field` events instead, one per JSON field as soon as it is complete.
+
+The event generators are synchronous: StreamingResponse iterates them in the
+threadpool, so the blocking OpenAI stream never runs on the event loop.
+"""
+
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.config.logging_config import get_logger
+from app.services.utils.profiling import profiled_iter
+
+logger = get_logger('streaming')
+
+# Stop proxies (nginx) from buffering the stream
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def sse_event(event, data):
+    """Format one SSE frame; `data` is JSON-encoded unless it is already a string"""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return f"event: {event}\n" + ''.join(f"data: {line}\n" for line in payload.split('\n')) + "\n"
+
+
+def report_events(chunks, finalize):
+    """
+    Yield a `token` event per text chunk, then a `result` event with
+    finalize(full_text) (a pydantic model) or an `error` event.
+    """
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event('token', {'text': chunk})
+        result = finalize(''.join(parts))
+        yield sse_event('result', result.model_dump(mode='json'))
+    except HTTPException as e:
+        yield sse_event('error', {'status_code': e.status_code, 'detail': e.detail})
+    except Exception as e:
+        logger.warning("stream_failed", error=str(e), received_chars=sum(len(p) for p in parts))
+        yield sse_event('error', {'status_code': 500, 'detail': str(e)})
+
+
+def structured_events(events):
+    """
+    SSE frames for llm.stream_structured_completion events: `field` events
+    ({"path": "impact_assessment.Product_Quality", "value": ...}), `retry` when
+    an invalid attempt was abandoned (discard the fields received so far),
+    then `result` or `error`.
+    """
+    try:
+        for event in events:
+            if event[0] == 'field':
+                yield sse_event('field', {'path': '.'.join(map(str, event[1])), 'value': event[2]})
+            elif event[0] == 'retry':
+                yield sse_event('retry', {'reason': event[1]})
+            else:
+                yield sse_event('result', event[1].model_dump(mode='json'))
+    except Exception as e:
+        logger.warning("stream_failed", error=str(e))
+        yield sse_event('error', {'status_code': 500, 'detail': str(e)})
+
+
+def sse_response(chunks, finalize):
+    """StreamingResponse for report_events (text/event-stream)"""
+    return StreamingResponse(profiled_iter(report_events(chunks, finalize)), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+def structured_sse_response(events):
+    """StreamingResponse for structured_events (text/event-stream)"""
+    return StreamingResponse(profiled_iter(structured_events(events)), media_type='text/event-stream', headers=SSE_HEADERS)
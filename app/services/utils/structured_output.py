@@ -0,0 +1,170 @@
+"""
+Structured Outputs
+Builds the `response_format` that asks the model for JSON matching a pydantic
+response model, and parses the answer with one model_validate_json pass.
+
+Models with native structured outputs (gpt-4o, gpt-4.1, ...) get the model's
+JSON schema, strict where the schema allows it (free-form Dict[str, Any]
+fields rule strict mode out); older JSON-mode models get json_object; models
+with neither (gpt-4) rely on the prompt alone.
+
+When validation fails, a single local repair pass (code fences, prose around
+the object, trailing commas, raw control characters in strings) is tried
+before giving up, so a nearly-valid answer never costs a full re-ask.
+"""
+
+import copy
+import json
+import re
+from functools import lru_cache
+
+from pydantic import ValidationError
+
+from app.services.utils.metrics import JSON_PARSE_SECONDS, STRUCTURED_OUTPUT_REPAIRS, timed
+
+# Model name prefixes by response_format support
+JSON_SCHEMA_MODELS = ('gpt-4o', 'gpt-4.1', 'gpt-5', 'o1', 'o3', 'o4')
+JSON_OBJECT_MODELS = ('gpt-4-turbo', 'gpt-4-1106', 'gpt-4-0125', 'gpt-3.5-turbo')
+# Snapshots of a JSON-schema family that predate structured outputs
+JSON_OBJECT_SNAPSHOTS = ('gpt-4o-2024-05-13',)
+
+_FENCE_PATTERN = re.compile(r'^\s*```[a-zA-Z]*\s*|\s*```\s*$')
+
+
+class StructuredOutputError(ValueError):
+    """A model answer could not be turned into the response model"""
+
+
+def response_format_mode(model):
+    """'json_schema', 'json_object' or None for a chat model name"""
+    model = (model or '').lower()
+    if model.startswith(JSON_OBJECT_SNAPSHOTS):
+        return 'json_object'
+    if model.startswith(JSON_SCHEMA_MODELS):
+        return 'json_schema'
+    if model.startswith(JSON_OBJECT_MODELS):
+        return 'json_object'
+    return None
+
+
+def response_format_for(model, response_model):
+    """The chat.completions response_format for `response_model`, or None if `model` supports none"""
+    mode = response_format_mode(model)
+    if mode == 'json_schema':
+        return json_schema_format(response_model)
+    if mode == 'json_object':
+        return {'type': 'json_object'}
+    return None
+
+
+@lru_cache(maxsize=None)
+def json_schema_format(response_model):
+    """
+    json_schema response_format for a pydantic model. Strict mode requires
+    every object to list all its properties as required and forbid extra
+    keys; schemas with free-form objects are sent non-strict instead.
+    """
+    schema = response_model.model_json_schema()
+    strict_schema = copy.deepcopy(schema)
+    strict = _make_strict(strict_schema)
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': response_model.__name__,
+            'schema': strict_schema if strict else schema,
+            'strict': strict,
+        },
+    }
+
+
+def _make_strict(node):
+    """Rewrite a JSON schema in place for strict mode; False if it has free-form objects"""
+    if isinstance(node, list):
+        return all([_make_strict(item) for item in node])
+    if not isinstance(node, dict):
+        return True
+    node.pop('default', None)
+    strict = True
+    if node.get('type') == 'object':
+        if 'properties' not in node or node.get('additionalProperties') not in (None, False):
+            strict = False
+        else:
+            node['additionalProperties'] = False
+            node['required'] = list(node['properties'])
+    for key, value in node.items():
+        if key in ('properties', '$defs'):
+            strict = all([_make_strict(child) for child in value.values()]) and strict
+        elif key in ('items', 'anyOf', 'allOf', 'prefixItems', 'additionalProperties'):
+            strict = _make_strict(value) and strict
+    return strict
+
+
+def parse_structured_output(text, response_model, service, method):
+    """
+    Validate a model answer against `response_model` in one pass, falling
+    back to a single local repair. Raises StructuredOutputError.
+    """
+    with timed(JSON_PARSE_SECONDS, service=service) as labels:
+        if not text or not text.strip():
+            raise StructuredOutputError("Empty response from the model")
+        try:
+            return response_model.model_validate_json(text)
+        except ValidationError as e:
+            error = e
+        repaired = repair_json(text)
+        try:
+            if repaired == text:
+                raise error
+            result = response_model.model_validate_json(repaired)
+        except ValidationError as e:
+            STRUCTURED_OUTPUT_REPAIRS.labels(service=service, method=method, outcome='failed').inc()
+            raise StructuredOutputError(_describe(e)) from e
+        STRUCTURED_OUTPUT_REPAIRS.labels(service=service, method=method, outcome='repaired').inc()
+        labels['outcome'] = 'repaired'
+        return result
+
+
+def repair_json(text):
+    """
+    Fix the syntax slips models make around otherwise valid JSON: code fences,
+    text before or after the object, trailing commas and unescaped control
+    characters inside strings. One linear pass; the content is not changed.
+    """
+    text = _FENCE_PATTERN.sub('', text)
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        return text
+    text = text[start:end + 1]
+
+    out = []
+    in_string = escape = False
+    pending_comma = None  # index in `out` of a comma that may turn out to be trailing
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char < ' ':
+                char = json.dumps(char)[1:-1]
+            out.append(char)
+            continue
+        if char in '}]' and pending_comma is not None:
+            out[pending_comma] = ''
+        if char == ',':
+            pending_comma = len(out)
+        elif char not in ' \t\r\n':
+            pending_comma = None
+        if char == '"':
+            in_string = True
+        out.append(char)
+    return ''.join(out)
+
+
+def _describe(error):
+    """First validation error as a one-line message"""
+    first = error.errors()[0]
+    location = '.'.join(map(str, first.get('loc', ())))
+    return f"{location}: {first['msg']}" if location else first['msg']
@@ -0,0 +1,343 @@
+"""
+Request Tracing
+Every HTTP request gets a trace id and a root span; code paths open nested
+spans with `span(...)` (upload ingest, conversion, chunking, per-chunk OCR,
+each Document AI and LLM call). When the request finishes:
+
+  - a Server-Timing header summarises time per span name, so slow requests
+    can be broken down straight from the browser / curl -v
+  - the trace is exported as OTLP/JSON (ExportTraceServiceRequest), one trace
+    per line to TRACE_EXPORT_PATH (readable by the collector's otlpjsonfile
+    receiver) and/or POSTed to an OTLP/HTTP endpoint, on a background thread
+
+Spans follow contextvars, so they nest across awaits and into threads started
+with asyncio.to_thread / contextvars.copy_context().
+"""
+
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+import structlog
+
+from app.config.config import (
+    TRACING_ENABLED,
+    TRACE_EXPORT_PATH,
+    OTLP_TRACES_ENDPOINT,
+    TRACE_SERVICE_NAME,
+    SERVER_TIMING_ENABLED,
+)
+from app.config.logging_config import get_logger
+
+logger = get_logger('tracing')
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Server-Timing entries beyond this are dropped (headers must stay small)
+MAX_SERVER_TIMING_ENTRIES = 20
+EXPORT_QUEUE_SIZE = 1000
+OTLP_EXPORT_TIMEOUT_SECONDS = 5
+
+# Probes and scrapes would drown real traffic in the export
+UNTRACED_PATHS = {'/health', '/metrics'}
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    def __init__(self, trace, name, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.end_ns = None
+        self.duration = None
+        self.status = STATUS_OK
+        self.status_message = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.duration = time.perf_counter() - self._start
+            self.end_ns = self.start_ns + int(self.duration * 1e9)
+            self.trace.add(self)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': self.status},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+
+class Trace:
+    """Spans finished so far for one request (spans may end on other threads)"""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def finished_spans(self):
+        with self._lock:
+            return list(self.spans)
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': str(value)}
+    return {'key': key, 'value': encoded}
+
+
+# ---------------------------------------------------------------------------
+# Span API
+# ---------------------------------------------------------------------------
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Record a nested span for the block. Outside a traced request this is a
+    no-op that yields None, so library code can call it unconditionally.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(trace, name, parent.span_id if parent else None, attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def start_detached_span(name, **attributes):
+    """
+    Start a child of the current span that the caller ends explicitly with
+    .end(). For generators: a streaming response resumes them on different
+    threadpool threads, so a span() block cannot stay open across yields.
+    Returns None outside a traced request.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    parent = _current_span.get()
+    return Span(trace, name, parent.span_id if parent else None, attributes=attributes)
+
+
+@contextmanager
+def start_trace(name, trace_id=None, parent_id=None, **attributes):
+    """Open a new trace with a root span (used by the middleware and background jobs)"""
+    trace = Trace(trace_id)
+    root = Span(trace, name, parent_id, kind=SPAN_KIND_SERVER, attributes=attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.set_error(e)
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        root.end()
+        get_exporter().export(trace)
+
+
+def server_timing_header(trace, root):
+    """Sum finished span durations per name into a Server-Timing header value"""
+    totals = {}
+    for finished in trace.finished_spans():
+        if finished is root:
+            continue
+        duration, count = totals.get(finished.name, (0.0, 0))
+        totals[finished.name] = (duration + finished.duration, count + 1)
+    entries = [f'total;dur={(time.perf_counter() - root._start) * 1000:.1f}']
+    for name, (duration, count) in sorted(totals.items(), key=lambda item: item[1][0], reverse=True):
+        entry = f'{name};dur={duration * 1000:.1f}'
+        if count > 1:
+            entry += f';desc="{count} spans"'
+        entries.append(entry)
+    return ', '.join(entries[:MAX_SERVER_TIMING_ENTRIES])
+
+
+def _parse_traceparent(value):
+    """W3C traceparent '00-<trace_id>-<parent_id>-<flags>' -> (trace_id, parent_id)"""
+    parts = (value or '').split('-')
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and parts[1] != '0' * 32:
+        return parts[1], parts[2]
+    return None, None
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+class TraceExporter:
+    """Serialises traces to OTLP/JSON and writes/posts them from a daemon thread"""
+
+    def __init__(self, path=None, endpoint=None, service_name=TRACE_SERVICE_NAME):
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.path or self.endpoint)
+
+    def export(self, trace):
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning("trace_export_queue_full", trace_id=trace.trace_id)
+
+    def to_otlp(self, trace):
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    _otlp_attribute('service.name', self.service_name),
+                    _otlp_attribute('process.pid', os.getpid()),
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [s.to_otlp() for s in trace.finished_spans()],
+                }],
+            }]
+        }
+
+    def flush(self, timeout=5.0):
+        """Wait until queued traces are written (used by tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            try:
+                payload = json.dumps(self.to_otlp(trace), separators=(',', ':'))
+                if self.path:
+                    with open(self.path, 'a') as f:
+                        f.write(payload + '\n')
+                if self.endpoint:
+                    request = urllib.request.Request(
+                        self.endpoint, data=payload.encode(), method='POST',
+                        headers={'Content-Type': 'application/json'}
+                    )
+                    urllib.request.urlopen(request, timeout=OTLP_EXPORT_TIMEOUT_SECONDS).close()
+            except Exception as e:
+                logger.warning("trace_export_failed", trace_id=trace.trace_id, error=str(e))
+            finally:
+                self._queue.task_done()
+
+
+_exporter = None
+def get_exporter():
+    global _exporter
+    if _exporter is None:
+        _exporter = TraceExporter(TRACE_EXPORT_PATH, OTLP_TRACES_ENDPOINT)
+    return _exporter
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+class TracingMiddleware:
+    """
+    Wrap each HTTP request in a trace. Adds X-Trace-Id and Server-Timing
+    response headers and binds trace_id into structured log events.
+    An incoming W3C traceparent header continues the caller's trace.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not TRACING_ENABLED or scope['path'] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        trace_id, parent_id = _parse_traceparent(headers.get(b'traceparent', b'').decode('latin-1'))
+        name = f"{scope['method']} {scope['path']}"
+
+        with start_trace(name, trace_id, parent_id, **{'http.method': scope['method'],
+                                                         'http.target': scope['path']}) as root:
+            async def send_with_headers(message):
+                if message['type'] == 'http.response.start':
+                    root.set_attribute('http.status_code', message['status'])
+                    if message['status'] >= 500:
+                        root.status = STATUS_ERROR
+                    extra = [(b'x-trace-id', root.trace.trace_id.encode())]
+                    if SERVER_TIMING_ENABLED:
+                        extra.append((b'server-timing', server_timing_header(root.trace, root).encode()))
+                    message = dict(message, headers=list(message.get('headers') or []) + extra)
+                await send(message)
+
+            with structlog.contextvars.bound_contextvars(trace_id=root.trace.trace_id):
+                await self.app(scope, receive, send_with_headers)
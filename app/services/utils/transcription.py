@@ -7,14 +7,22 @@ Now includes grammar correction while preserving original meaning
 
 import os
 import sys
+import asyncio
 from typing import Optional
-import requests
 
 # Add the app directory to Python path for imports
 app_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, app_dir)
 
-from app.config.config import OPENAI_API_KEY
+from app.config.config import OPENAI_API_KEY, OPENAI_BASE_URL
+from app.services.utils.http_client import get_http_client
+from app.services.utils.metrics import LLM_CALL_SECONDS, timed
+from app.services.utils.tracing import span
+from app.config.logging_config import get_logger
+
+logger = get_logger('voice_transcriber')
+
+OPENAI_TRANSCRIPTIONS_URL = f'{OPENAI_BASE_URL}/audio/transcriptions'
 
 class VoiceTranscriber:
     """
@@ -24,11 +32,12 @@ class VoiceTranscriber:
     def __init__(self):
         self.openai_api_key = OPENAI_API_KEY
         if not self.openai_api_key:
-            print("⚠️  OpenAI API key not found. Transcription features will be limited.")
+            logger.warning("openai_api_key_missing", detail="Transcription features will be limited")
     
-    def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
+    async def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
         """
-        Transcribe audio file using OpenAI Whisper API
+        Transcribe audio file using OpenAI Whisper API.
+        The file is streamed from disk as a multipart upload over the shared HTTP client.
         
         Args:
             audio_file_path (str): Path to audio file
@@ -38,53 +47,60 @@ class VoiceTranscriber:
         """
         try:
             if not self.openai_api_key:
-                print("❌ OpenAI API key required for transcription")
+                logger.error("openai_api_key_missing", detail="OpenAI API key required for transcription")
                 return None
                 
             if not os.path.exists(audio_file_path):
-                print(f"❌ Audio file not found: {audio_file_path}")
+                logger.error("audio_file_not_found", path=audio_file_path)
                 return None
             
             # Check file size (Whisper has 25MB limit)
             file_size = os.path.getsize(audio_file_path)
             if file_size > 25 * 1024 * 1024:  # 25MB
-                print("❌ File too large for Whisper API (max 25MB)")
+                logger.error("audio_file_too_large", path=audio_file_path, size_bytes=file_size)
                 return None
             
-            print(f"🎤 Transcribing audio file: {audio_file_path}")
+            logger.info("transcription_started", path=audio_file_path, size_bytes=file_size)
             
             headers = {
                 'Authorization': f'Bearer {self.openai_api_key}'
             }
             
-            with open(audio_file_path, 'rb') as audio_file:
+            client = get_http_client()
+            with open(audio_file_path, 'rb') as audio_file, \
+                    span('llm.transcription', service='voice_transcriber', size_bytes=file_size), \
+                    timed(LLM_CALL_SECONDS, service='voice_transcriber', method='transcribe_audio') as labels:
                 files = {
-                    'file': audio_file,
-                    'model': (None, 'whisper-1'),
-                    'response_format': (None, 'text')
+                    'file': (os.path.basename(audio_file_path), audio_file)
+                }
+                data = {
+                    'model': 'whisper-1',
+                    'response_format': 'text'
                 }
                 
-                response = requests.post(
-                    'https://api.openai.com/v1/audio/transcriptions',
+                response = await client.post(
+                    OPENAI_TRANSCRIPTIONS_URL,
                     headers=headers,
                     files=files,
+                    data=data,
                     timeout=120
                 )
+                if response.status_code != 200:
+                    labels['outcome'] = 'error'
             
             if response.status_code == 200:
                 transcription = response.text.strip()
-                print("✅ Transcription completed successfully")
+                logger.info("transcription_completed", length=len(transcription))
                 return transcription
             else:
-                print(f"❌ Transcription failed: {response.status_code}")
-                print(response.text)
+                logger.error("transcription_failed", status_code=response.status_code, response=response.text[:500])
                 return None
                 
         except Exception as e:
-            print(f"❌ Error during transcription: {str(e)}")
+            logger.exception("transcription_error", error=str(e))
             return None
 
-    def process_file_with_results(self, audio_file_path: str):
+    async def process_file_with_results(self, audio_file_path: str):
         """
         Process audio file and return both original and polished transcription
         Args:
@@ -93,14 +109,14 @@ class VoiceTranscriber:
             tuple: (original_transcription, polished_transcription) or (None, None) if failed
         """
         try:
-            original = self.transcribe_audio(audio_file_path)
+            original = await self.transcribe_audio(audio_file_path)
             if original:
                 # For now, return the same text for both
                 # In a full implementation, you might want to add text polishing
                 return original, original
             return None, None
         except Exception as e:
-            print(f"❌ Error processing file: {str(e)}")
+            logger.exception("transcription_processing_error", error=str(e))
             return None, None
 
 def transcribe_audio(audio_file_path: str) -> Optional[str]:
@@ -115,7 +131,7 @@ def transcribe_audio(audio_file_path: str) -> Optional[str]:
     """
     try:
         transcriber = VoiceTranscriber()
-        return transcriber.transcribe_audio(audio_file_path)
+        return asyncio.run(transcriber.transcribe_audio(audio_file_path))
     except ValueError as e:
-        print(f"Error: {e}")
+        logger.error("transcriber_unavailable", error=str(e))
         return None
\ No newline at end of file
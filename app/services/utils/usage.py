@@ -0,0 +1,340 @@
+"""
+LLM Token Accounting
+Every LLM call reports its prompt, completion and cached tokens here, tagged
+with the API route and meeting id of the request that made it (set by
+UsageContextMiddleware from the X-Meeting-Id / X-Session-Id header or the
+?meeting_id= query parameter; ids longer than the column are ignored) and
+the calling service method.
+
+Usage is aggregated in memory and flushed to the llm_usage table every
+TOKEN_USAGE_FLUSH_SECONDS from a background thread, so request handlers
+never wait on the database. SQLAlchemy and the models are imported on the
+first flush, not at app import, to keep cold starts short. /usage/endpoints
+reports per-endpoint token rates and /usage/meetings/{meeting_id} the cost of
+one meeting.
+"""
+
+import atexit
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+import structlog
+from fastapi import APIRouter, HTTPException
+
+from app.config.config import LLM_PRICING_JSON, TOKEN_RATE_WINDOW_SECONDS, TOKEN_USAGE_FLUSH_SECONDS
+from app.config.logging_config import get_logger
+from app.services.utils.metrics import record_token_usage, token_counts
+
+logger = get_logger('usage')
+
+# USD per 1M tokens; looked up by longest model-name prefix so dated
+# snapshots (e.g. gpt-4.1-2025-04-14) resolve to their family
+MODEL_PRICES = {
+    'gpt-4.1-mini': {'prompt': 0.40, 'cached': 0.10, 'completion': 1.60},
+    'gpt-4.1': {'prompt': 2.00, 'cached': 0.50, 'completion': 8.00},
+    'gpt-4o': {'prompt': 2.50, 'cached': 1.25, 'completion': 10.00},
+    'gpt-4-turbo': {'prompt': 10.00, 'cached': 10.00, 'completion': 30.00},
+    'gpt-4': {'prompt': 30.00, 'cached': 30.00, 'completion': 60.00},
+}
+if LLM_PRICING_JSON:
+    MODEL_PRICES.update(json.loads(LLM_PRICING_JSON))
+
+# Calls made outside an HTTP request (startup, scripts)
+NO_ROUTE = 'background'
+MAX_RECENT_CALLS = 10000
+COUNTER_FIELDS = ('calls', 'prompt_tokens', 'cached_tokens', 'completion_tokens', 'cost_usd')
+# Length of llm_usage.meeting_id; longer client-supplied ids are ignored
+MAX_MEETING_ID_LENGTH = 128
+
+_route = contextvars.ContextVar('usage_route', default=None)
+_meeting_id = contextvars.ContextVar('usage_meeting_id', default=None)
+
+
+def call_cost(model, prompt_tokens, completion_tokens, cached_tokens):
+    """USD cost of one call (cached tokens are a subset of prompt tokens); 0 for unknown models"""
+    matches = [name for name in MODEL_PRICES if (model or '').startswith(name)]
+    if not matches:
+        return 0.0
+    prices = MODEL_PRICES[max(matches, key=len)]
+    return (
+        (prompt_tokens - cached_tokens) * prices['prompt']
+        + cached_tokens * prices['cached']
+        + completion_tokens * prices['completion']
+    ) / 1_000_000
+
+
+def _empty_counters():
+    return dict.fromkeys(COUNTER_FIELDS, 0)
+
+
+def _add(counters, calls, prompt_tokens, cached_tokens, completion_tokens, cost):
+    counters['calls'] += calls
+    counters['prompt_tokens'] += prompt_tokens
+    counters['cached_tokens'] += cached_tokens
+    counters['completion_tokens'] += completion_tokens
+    counters['cost_usd'] += cost
+
+
+class TokenAccountant:
+    def __init__(self, flush_interval=TOKEN_USAGE_FLUSH_SECONDS, rate_window=TOKEN_RATE_WINDOW_SECONDS):
+        """Initialize the accountant (the flush thread starts with the first recorded call)"""
+        self.flush_interval = flush_interval
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._window_start = datetime.now(timezone.utc)
+        self._totals = {}
+        self._recent = deque(maxlen=MAX_RECENT_CALLS)
+        self._started = time.monotonic()
+        self._thread = None
+        self._stop = threading.Event()
+        self._table_ready = False
+
+    def record(self, service, method, model, usage):
+        """Account one call's usage under the current request's route and meeting"""
+        prompt_tokens, completion_tokens, cached_tokens = token_counts(usage)
+        if not (prompt_tokens or completion_tokens):
+            return
+        route = _route.get() or NO_ROUTE
+        model = model or 'unknown'
+        cost = call_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        key = (route, service, method, _meeting_id.get(), model)
+        with self._lock:
+            _add(self._pending.setdefault(key, _empty_counters()),
+                 1, prompt_tokens, cached_tokens, completion_tokens, cost)
+            _add(self._totals.setdefault((route, service, method), _empty_counters()),
+                 1, prompt_tokens, cached_tokens, completion_tokens, cost)
+            self._recent.append((time.monotonic(), route, prompt_tokens + completion_tokens, cost))
+        self._ensure_thread()
+
+    # -- persistence ---------------------------------------------------------
+
+    def flush(self):
+        """Write the aggregated usage since the last flush to the database"""
+        from sqlalchemy.exc import OperationalError
+        from app.database.database_connection import SessionLocal
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                window_start = self._window_start
+                window_end = self._window_start = datetime.now(timezone.utc)
+            if not pending:
+                return
+            try:
+                self._ensure_table()
+                with SessionLocal() as db:
+                    db.add_all(_usage_rows(pending, window_start, window_end))
+                    db.commit()
+            except OperationalError as e:
+                # Database unreachable: keep the counts for the next attempt rather than losing them
+                with self._lock:
+                    for key, counters in pending.items():
+                        current = self._pending.setdefault(key, _empty_counters())
+                        _add(current, *(counters[field] for field in COUNTER_FIELDS))
+                    self._window_start = window_start
+                logger.warning("token_usage_flush_failed", rows=len(pending), error=str(e))
+            except Exception as e:
+                # A row the database rejects would fail every retry; write the others one by one
+                logger.warning("token_usage_flush_rejected", rows=len(pending), error=str(e))
+                self._write_individually(pending, window_start, window_end)
+
+    def _write_individually(self, pending, window_start, window_end):
+        from app.database.database_connection import SessionLocal
+
+        with SessionLocal() as db:
+            for key, counters in pending.items():
+                try:
+                    db.add_all(_usage_rows({key: counters}, window_start, window_end))
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    route, service, method, meeting_id, model = key
+                    logger.error("token_usage_row_dropped", route=route, service=service, method=method,
+                                 model=model, calls=counters['calls'], error=str(e))
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            from app.database.database_connection import Base, engine
+            from app.database.models import LLMUsage
+
+            Base.metadata.create_all(bind=engine, tables=[LLMUsage.__table__])
+            self._table_ready = True
+
+    def _ensure_thread(self):
+        if self._thread is None and self.flush_interval > 0:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='token-usage-flush', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def shutdown(self):
+        """Stop the flush thread and write out what is still pending"""
+        self._stop.set()
+        self.flush()
+
+    # -- reporting -----------------------------------------------------------
+
+    def endpoint_rates(self):
+        """Per-route token and cost rates over the rate window, plus totals by service method"""
+        now = time.monotonic()
+        window = min(self.rate_window, max(now - self._started, 1.0))
+        routes = {}
+        with self._lock:
+            for timestamp, route, tokens, cost in self._recent:
+                if now - timestamp <= window:
+                    recent = routes.setdefault(route, {'window_calls': 0, 'window_tokens': 0, 'window_cost_usd': 0.0})
+                    recent['window_calls'] += 1
+                    recent['window_tokens'] += tokens
+                    recent['window_cost_usd'] += cost
+            totals = {key: dict(counters) for key, counters in self._totals.items()}
+
+        endpoints = {}
+        for (route, service, method), counters in totals.items():
+            endpoint = endpoints.setdefault(route, {'route': route, **_empty_counters(), 'methods': []})
+            _add(endpoint, *(counters[field] for field in COUNTER_FIELDS))
+            endpoint['methods'].append({'service': service, 'method': method, **counters})
+
+        for route, endpoint in endpoints.items():
+            recent = routes.get(route, {'window_calls': 0, 'window_tokens': 0, 'window_cost_usd': 0.0})
+            endpoint['tokens_per_minute'] = recent['window_tokens'] * 60 / window
+            endpoint['cost_usd_per_hour'] = recent['window_cost_usd'] * 3600 / window
+            endpoint['calls_per_minute'] = recent['window_calls'] * 60 / window
+            endpoint['avg_tokens_per_call'] = (
+                (endpoint['prompt_tokens'] + endpoint['completion_tokens']) / endpoint['calls']
+            )
+            endpoint['methods'].sort(key=lambda m: m['prompt_tokens'] + m['completion_tokens'], reverse=True)
+
+        return {
+            'window_seconds': window,
+            'endpoints': sorted(endpoints.values(), key=lambda e: e['tokens_per_minute'], reverse=True),
+        }
+
+    def meeting_summary(self, meeting_id):
+        """Total tokens and cost of one meeting, broken down by endpoint, method and model"""
+        from sqlalchemy import func
+        from app.database.database_connection import SessionLocal
+        from app.database.models import LLMUsage
+
+        self.flush()
+        self._ensure_table()
+        with SessionLocal() as db:
+            rows = (
+                db.query(
+                    LLMUsage.route, LLMUsage.service, LLMUsage.method, LLMUsage.model,
+                    func.sum(LLMUsage.calls), func.sum(LLMUsage.prompt_tokens),
+                    func.sum(LLMUsage.cached_tokens), func.sum(LLMUsage.completion_tokens),
+                    func.sum(LLMUsage.cost_usd), func.min(LLMUsage.window_start), func.max(LLMUsage.window_end),
+                )
+                .filter(LLMUsage.meeting_id == meeting_id)
+                .group_by(LLMUsage.route, LLMUsage.service, LLMUsage.method, LLMUsage.model)
+                .all()
+            )
+        if not rows:
+            return None
+
+        summary = {'meeting_id': meeting_id, **_empty_counters(), 'breakdown': []}
+        for route, service, method, model, *counts, first_seen, last_seen in rows:
+            counters = dict(zip(COUNTER_FIELDS, counts))
+            _add(summary, *counts)
+            summary['breakdown'].append({'route': route, 'service': service, 'method': method,
+                                         'model': model, **counters})
+        summary['first_seen'] = min(row[-2] for row in rows).isoformat()
+        summary['last_seen'] = max(row[-1] for row in rows).isoformat()
+        summary['breakdown'].sort(key=lambda b: b['cost_usd'], reverse=True)
+        return summary
+
+
+def _usage_rows(pending, window_start, window_end):
+    from app.database.models import LLMUsage
+
+    return [
+        LLMUsage(window_start=window_start, window_end=window_end, route=route,
+                 service=service, method=method, meeting_id=meeting_id, model=model, **counters)
+        for (route, service, method, meeting_id, model), counters in pending.items()
+    ]
+
+
+# Shared accountant instance
+_token_accountant = None
+def get_token_accountant():
+    global _token_accountant
+    if _token_accountant is None:
+        _token_accountant = TokenAccountant()
+        atexit.register(_token_accountant.shutdown)
+    return _token_accountant
+
+
+def record_llm_usage(service, method, model, usage):
+    """Record an LLM call's token usage in the Prometheus counters and the accountant"""
+    record_token_usage(service, method, usage)
+    get_token_accountant().record(service, method, model, usage)
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+class UsageContextMiddleware:
+    """Tag LLM usage with the request's route and meeting id (also bound into log events)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        meeting_id = (headers.get(b'x-meeting-id') or headers.get(b'x-session-id') or b'').decode('latin-1')
+        if not meeting_id:
+            meeting_id = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('meeting_id', [''])[0]
+        meeting_id = meeting_id.strip()
+        if len(meeting_id) > MAX_MEETING_ID_LENGTH:
+            logger.warning("meeting_id_ignored", reason='too_long', length=len(meeting_id))
+            meeting_id = ''
+
+        route_token = _route.set(scope['path'])
+        meeting_token = _meeting_id.set(meeting_id or None)
+        try:
+            if meeting_id:
+                with structlog.contextvars.bound_contextvars(meeting_id=meeting_id):
+                    await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            _route.reset(route_token)
+            _meeting_id.reset(meeting_token)
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+router = APIRouter()
+
+
+@router.get("/endpoints")
+def get_endpoint_usage():
+    """Token and cost rates per API endpoint, heaviest first."""
+    return get_token_accountant().endpoint_rates()
+
+
+@router.get("/meetings/{meeting_id}")
+def get_meeting_usage(meeting_id: str):
+    """Token usage and cost of one meeting (requests sent with X-Meeting-Id)."""
+    summary = get_token_accountant().meeting_summary(meeting_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No LLM usage recorded for meeting {meeting_id}")
+    return summary
@@ -0,0 +1,180 @@
+"""
+Per-request Workspaces
+Every request gets its own scratch directory for uploads, converted PDFs and
+OCR chunks, so concurrent requests never share file paths. Workspaces are
+size-limited and removed deterministically when the request finishes.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+from fastapi import HTTPException, UploadFile
+
+from app.services.utils.metrics import UPLOAD_INGEST_SECONDS, timed
+from app.services.utils.tracing import span
+
+from app.config.config import (
+    WORKSPACE_ROOT,
+    WORKSPACE_USE_TMPFS,
+    WORKSPACE_QUOTA_MB,
+    WORKSPACE_STALE_SECONDS,
+)
+
+TMPFS_PATH = '/dev/shm'
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+WORKSPACE_PREFIX = 'ws-'
+
+
+class WorkspaceQuotaExceeded(HTTPException):
+    """Raised when a workspace grows beyond its disk quota"""
+
+    def __init__(self, quota_bytes):
+        super().__init__(
+            status_code=413,
+            detail=f"Request exceeds the workspace disk quota ({quota_bytes // (1024 * 1024)} MB)"
+        )
+
+
+def _safe_filename(filename):
+    """Strip directory components and unsafe characters from a client filename"""
+    name = os.path.basename(filename or '') or 'upload'
+    return re.sub(r'[^A-Za-z0-9._ -]', '_', name)
+
+
+class Workspace:
+    def __init__(self, root, quota_bytes):
+        """Wrap an existing scratch directory"""
+        self.root = root
+        self.quota_bytes = quota_bytes
+
+    def path(self, filename='file', subdir=True):
+        """
+        Return a collision-free path for `filename` inside the workspace.
+        With subdir=True the original basename is kept inside a unique
+        sub-directory, otherwise a unique prefix is added to the name.
+        """
+        filename = _safe_filename(filename)
+        if subdir:
+            return os.path.join(self.mkdtemp(), filename)
+        return os.path.join(self.root, f"{uuid.uuid4().hex[:12]}_{filename}")
+
+    def mkdtemp(self, prefix=''):
+        """Create a unique sub-directory inside the workspace"""
+        return tempfile.mkdtemp(prefix=prefix, dir=self.root)
+
+    def usage_bytes(self):
+        """Current disk usage of the workspace"""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+        return total
+
+    def check_quota(self, extra_bytes=0):
+        """Raise WorkspaceQuotaExceeded if usage (plus extra_bytes) is over quota"""
+        if self.quota_bytes and self.usage_bytes() + extra_bytes > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(self.quota_bytes)
+
+    async def save_upload(self, upload: UploadFile, filename=None):
+        """Stream an uploaded file to disk in chunks, enforcing the quota as it goes"""
+        target_path = self.path(filename or upload.filename)
+        used = self.usage_bytes()
+        with span('upload.ingest', file=os.path.basename(target_path)), \
+                timed(UPLOAD_INGEST_SECONDS), open(target_path, 'wb') as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                used += len(chunk)
+                if self.quota_bytes and used > self.quota_bytes:
+                    raise WorkspaceQuotaExceeded(self.quota_bytes)
+                f.write(chunk)
+        return target_path
+
+    def save_bytes(self, content, filename):
+        """Write an in-memory payload to a new file in the workspace"""
+        self.check_quota(len(content))
+        target_path = self.path(filename)
+        with open(target_path, 'wb') as f:
+            f.write(content)
+        return target_path
+
+    def cleanup(self):
+        """Remove the workspace and everything in it"""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+
+
+class WorkspaceManager:
+    def __init__(self, root=None, use_tmpfs=None, quota_mb=None):
+        """Initialize the directory that holds all request workspaces"""
+        use_tmpfs = WORKSPACE_USE_TMPFS if use_tmpfs is None else use_tmpfs
+        if root is None:
+            if use_tmpfs and os.path.isdir(TMPFS_PATH) and os.access(TMPFS_PATH, os.W_OK):
+                root = os.path.join(TMPFS_PATH, 'kelz_workspaces')
+            else:
+                root = WORKSPACE_ROOT or os.path.join(tempfile.gettempdir(), 'kelz_workspaces')
+        self.root = root
+        quota_mb = WORKSPACE_QUOTA_MB if quota_mb is None else quota_mb
+        self.quota_bytes = quota_mb * 1024 * 1024
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self):
+        """Create a new isolated workspace"""
+        path = tempfile.mkdtemp(prefix=f"{WORKSPACE_PREFIX}{os.getpid()}-", dir=self.root)
+        return Workspace(path, self.quota_bytes)
+
+    def purge_stale(self, max_age_seconds=None):
+        """Remove workspaces left behind by crashed or killed workers"""
+        max_age_seconds = WORKSPACE_STALE_SECONDS if max_age_seconds is None else max_age_seconds
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for entry in os.scandir(self.root):
+            if not entry.name.startswith(WORKSPACE_PREFIX) or not entry.is_dir():
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+# Shared manager instance
+_workspace_manager = None
+def get_workspace_manager():
+    global _workspace_manager
+    if _workspace_manager is None:
+        _workspace_manager = WorkspaceManager()
+    return _workspace_manager
+
+
+def check_work_dir_quota(work_dir):
+    """
+    Enforce the workspace quota on a scratch directory that is only known by
+    path (the work_dir handed to conversion / OCR); no-op without a work_dir
+    """
+    if work_dir:
+        Workspace(work_dir, get_workspace_manager().quota_bytes).check_quota()
+
+
+async def request_workspace():
+    """FastAPI dependency: a workspace that lives exactly as long as the request"""
+    workspace = get_workspace_manager().create()
+    try:
+        yield workspace
+    finally:
+        workspace.cleanup()
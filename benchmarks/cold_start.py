@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Cold-start Benchmark Suite
+Measures what a freshly scheduled pod pays before it is useful:
+
+  - per-module import cost of `import app.main` (parsed from `-X importtime`)
+  - RSS after import
+  - time to the first successful /health
+  - time to the first /extract-text/ and first per-minute initiation call,
+    served by the local stand-ins in benchmarks/standins.py
+
+Results are written as JSON so they can be diffed between commits.
+
+Usage:
+    python -m benchmarks.cold_start [--runs 3] [--top 25] [--output cold_start.json]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from benchmarks.standins import StandInServer
+from benchmarks.startup import (
+    REPO_ROOT,
+    benchmark_env,
+    free_port,
+    measure_import,
+    process_rss_mb,
+    start_server,
+    stop_server,
+    summarize,
+    wait_for_response,
+)
+
+SCHEMA_VERSION = 1
+REQUEST_TIMEOUT_SECONDS = 120
+
+SAMPLE_TEXT = (
+    "Deviation DEV-001: during filling of batch 42 the line stopped for 20 minutes.\n"
+    "Operators segregated the affected vials and notified QA.\n"
+)
+
+PER_MINUTE_PAYLOAD = {
+    "transcribed_text": "John from QA reported that batch 42 filling stopped for twenty minutes "
+                        "and the affected vials were segregated.",
+}
+
+
+# ---------------------------------------------------------------------------
+# Import-time breakdown
+# ---------------------------------------------------------------------------
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into {module: (self_us, cumulative_us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def measure_importtime(extra_env=None):
+    """Run `python -X importtime -c 'import app.main'` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app.main'],
+        cwd=REPO_ROOT, env=benchmark_env(extra_env),
+        capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def import_breakdown(samples, top=25):
+    """Median self/cumulative time per module and per top-level package, in ms"""
+    names = set().union(*samples)
+
+    def median_ms(name, index):
+        return statistics.median(s.get(name, (0, 0))[index] for s in samples) / 1000
+
+    modules = [
+        {'module': name, 'self_ms': median_ms(name, 0), 'cumulative_ms': median_ms(name, 1)}
+        for name in names
+    ]
+    packages = {}
+    for entry in modules:
+        package = entry['module'].split('.')[0]
+        packages[package] = packages.get(package, 0.0) + entry['self_ms']
+
+    modules.sort(key=lambda m: m['cumulative_ms'], reverse=True)
+    return {
+        'total_ms': median_ms('app.main', 1),
+        'modules_imported': len(names),
+        'top_modules_by_cumulative': modules[:top],
+        'top_packages_by_self': [
+            {'package': name, 'self_ms': ms}
+            for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# First-request timings against the stand-ins
+# ---------------------------------------------------------------------------
+
+def encode_multipart(field, files):
+    """Build a multipart/form-data body for [(filename, bytes, content_type)]"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for filename, content, content_type in files:
+        parts.append(
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def timed_request(url, body, content_type):
+    """POST once and return (seconds, status, parsed JSON or None)"""
+    request = urllib.request.Request(url, data=body, method='POST', headers={'Content-Type': content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload, status = e.read(), e.code
+    elapsed = time.perf_counter() - start
+    try:
+        return elapsed, status, json.loads(payload)
+    except ValueError:
+        return elapsed, status, None
+
+
+def first_extract_text(base_url):
+    body, content_type = encode_multipart('files', [('cold_start.txt', SAMPLE_TEXT.encode(), 'text/plain')])
+    elapsed, status, payload = timed_request(f'{base_url}/extract-text/', body, content_type)
+    texts = list(((payload or {}).get('results') or {}).values())
+    ok = status == 200 and bool(texts) and not any(str(t).startswith('Error:') for t in texts)
+    return {'seconds': elapsed, 'status': status, 'ok': ok}
+
+
+def first_per_minute(base_url):
+    body = json.dumps(PER_MINUTE_PAYLOAD).encode()
+    elapsed, status, payload = timed_request(
+        f'{base_url}/initiation/per_minute_initiation', body, 'application/json'
+    )
+    ok = status == 200 and isinstance(payload, dict) and 'incident_title' in payload
+    return {'seconds': elapsed, 'status': status, 'ok': ok}
+
+
+def measure_cold_start(standin_env, timeout=60.0, extra_env=None):
+    """Launch a server and time its first /health, /extract-text/ and per-minute call"""
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(standin_env)
+    env.update(extra_env or {})
+
+    launched = time.perf_counter()
+    process = start_server(port, env)
+    try:
+        if wait_for_response(f'{base_url}/health', launched + timeout) is None:
+            raise RuntimeError('Server did not answer /health in time')
+        result = {
+            'health': {'seconds_since_launch': time.perf_counter() - launched,
+                       'rss_mb': process_rss_mb(process.pid)},
+        }
+        for name, probe in (('extract_text', first_extract_text), ('per_minute_initiation', first_per_minute)):
+            sample = probe(base_url)
+            sample['seconds_since_launch'] = time.perf_counter() - launched
+            sample['rss_mb'] = process_rss_mb(process.pid)
+            result[name] = sample
+        return result
+    finally:
+        stop_server(process)
+
+
+def summarize_cold_starts(samples):
+    summary = {}
+    for stage in samples[0]:
+        stage_samples = [s[stage] for s in samples]
+        summary[stage] = {
+            key: summarize([s[key] for s in stage_samples if s.get(key) is not None] or [0])
+            for key in ('seconds', 'seconds_since_launch', 'rss_mb')
+            if key in stage_samples[0]
+        }
+        if 'ok' in stage_samples[0]:
+            summary[stage]['ok_runs'] = sum(1 for s in stage_samples if s['ok'])
+            summary[stage]['statuses'] = sorted({s['status'] for s in stage_samples})
+    return summary
+
+
+def run(runs=3, top=25, extra_env=None):
+    importtime_samples = [measure_importtime(extra_env) for _ in range(runs)]
+    imports = [measure_import(extra_env) for _ in range(runs)]
+    with StandInServer() as standin:
+        cold_starts = [measure_cold_start(standin.app_env(), extra_env=extra_env) for _ in range(runs)]
+
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': runs,
+        'import': {
+            'seconds': summarize([r['import_seconds'] for r in imports]),
+            'max_rss_mb': summarize([r['max_rss_mb'] for r in imports]),
+            'breakdown': import_breakdown(importtime_samples, top),
+        },
+        'cold_start': summarize_cold_starts(cold_starts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=25, help='Number of modules/packages to report')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    results = run(args.runs, args.top)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
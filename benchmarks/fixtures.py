@@ -0,0 +1,143 @@
+"""
+Benchmark Fixtures
+Deterministic, generated input documents so benchmarks never depend on files
+checked into the repo or on customer data.
+"""
+
+import csv
+import io
+import os
+import random
+
+SAMPLE_PARAGRAPH = (
+    "During in-process weight checks on Line 5, tablets from batch 42 were found below "
+    "specification. Operators quarantined the affected material, stopped compression and "
+    "notified QA. The supplier's quality technical agreement requires notification within "
+    "24 hours of any deviation affecting released product."
+)
+
+
+def text_bytes(paragraphs=5):
+    """Plain UTF-8 text"""
+    return "\n\n".join(f"{i + 1}. {SAMPLE_PARAGRAPH}" for i in range(paragraphs)).encode()
+
+
+def docx_bytes(paragraphs=20, headings_every=5, tables=0, table_rows=20, table_cols=4):
+    """A DOCX document with numbered sections and optional tables"""
+    from docx import Document
+
+    document = Document()
+    document.add_heading("Quality Technical Agreement", level=0)
+    table_every = max(1, paragraphs // tables) if tables else 0
+    for i in range(paragraphs):
+        if headings_every and i % headings_every == 0:
+            document.add_heading(f"Section {i // headings_every + 1}", level=1)
+        document.add_paragraph(f"{i + 1}. {SAMPLE_PARAGRAPH}")
+        if table_every and i % table_every == 0 and i // table_every < tables:
+            table = document.add_table(rows=table_rows, cols=table_cols)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"R{r + 1}C{c + 1}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _noise_image(width, height, seed=0):
+    """An RGB image of pseudo-random pixels (compresses poorly, like a scan)"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    return Image.frombytes('RGB', (width, height), rng.randbytes(width * height * 3))
+
+
+def pdf_bytes(pages=2, lines_per_page=40, density='text'):
+    """
+    A PDF rendered with reportlab. density:
+      'sparse'  a few lines per page
+      'text'    lines_per_page lines per page
+      'dense'   small font, page filled edge to edge
+      'scanned' one full-page raster image per page (large, like scanned paperwork)
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    if density == 'sparse':
+        lines_per_page = 5
+    font_size, spacing = (6, 7) if density == 'dense' else (10, 16)
+    if density == 'dense':
+        lines_per_page = int((height - 72) // spacing)
+    for page in range(pages):
+        if density == 'scanned':
+            # JPEG data is embedded as-is, which keeps generation fast
+            scan = io.BytesIO(image_bytes(850, 1100, 'JPEG', seed=page))
+            pdf.drawImage(ImageReader(scan), 0, 0, width=width, height=height)
+        else:
+            pdf.setFont('Helvetica', font_size)
+            y = height - 36
+            for line in range(lines_per_page):
+                text = f"Page {page + 1} line {line + 1}: batch 42 weight check below specification"
+                pdf.drawString(36, y, text * (3 if density == 'dense' else 1))
+                y -= spacing
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def image_bytes(width=2000, height=1500, image_format='PNG', seed=0):
+    """A large, poorly compressible image"""
+    buffer = io.BytesIO()
+    _noise_image(width, height, seed).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def xlsx_bytes(sheets=3, rows=1000, cols=8):
+    """An XLSX workbook written in openpyxl's streaming mode"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    for s in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{s + 1}")
+        sheet.append([f"Column {c + 1}" for c in range(cols)])
+        for r in range(rows):
+            sheet.append([f"Batch {r}" if c == 0 else r * c for c in range(cols)])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def csv_bytes(rows=10000, cols=8):
+    """A CSV file with a header row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([f"column_{c + 1}" for c in range(cols)])
+    for r in range(rows):
+        writer.writerow([f"batch-{r}" if c == 0 else r * c for c in range(cols)])
+    return buffer.getvalue().encode()
+
+
+def pptx_bytes(slides=20):
+    """A PPTX deck with a title and bullet text on every slide"""
+    from pptx import Presentation
+
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]
+    for i in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Deviation review {i + 1}"
+        slide.placeholders[1].text = SAMPLE_PARAGRAPH
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
+
+def write_fixture(directory, filename, content):
+    """Write generated bytes to directory/filename and return the path"""
+    path = os.path.join(directory, filename)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+End-to-end Load Test
+Drives the real API (uvicorn + app.main) against the local LLM/OCR stand-ins
+with a production-like traffic mix:
+
+  per_minute_initiation   frequent JSON ticks on /initiation/per_minute_initiation
+  final_qta_review        occasional /qta-review/final-qta-review uploads with a DOCX reference
+  ocr_documents           batches of mixed documents on /ocr/documents
+
+A fixed number of concurrent virtual users each send one request at a time
+for the configured duration. Per endpoint the report gives p50/p95/p99
+latency, throughput and error rate as JSON.
+
+Usage:
+    python -m benchmarks.load_test [--concurrency 16] [--duration 60] [--warmup 5]
+        [--mix per_minute_initiation=85,final_qta_review=5,ocr_documents=10]
+        [--server-workers 1] [--server-url http://host:port] [--chat-latency lognormal:0.8,0.4]
+        [--seed 1] [--output load.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import random
+import statistics
+import time
+
+import httpx
+
+from benchmarks import fixtures
+from benchmarks.standins import StandInServer, add_standin_arguments, config_from_args
+from benchmarks.startup import running_server
+
+SCHEMA_VERSION = 1
+DEFAULT_MIX = 'per_minute_initiation=85,final_qta_review=5,ocr_documents=10'
+
+TRANSCRIPT_TICK = (
+    "John from QA reported that filling of batch 42 stopped for twenty minutes. "
+    "Maria from production segregated the affected vials and opened a deviation."
+)
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+class Scenario:
+    """One kind of request in the traffic mix"""
+
+    name = None
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    async def send(self, client):
+        """Send one request; returns (status_code, error_kind or None)"""
+        raise NotImplementedError
+
+
+class PerMinuteInitiation(Scenario):
+    name = 'per_minute_initiation'
+
+    async def send(self, client):
+        response = await client.post('/initiation/per_minute_initiation',
+                                     json={'transcribed_text': TRANSCRIPT_TICK})
+        if response.status_code != 200:
+            return response.status_code, f'http_{response.status_code}'
+        if 'incident_title' not in response.json():
+            return response.status_code, 'invalid_body'
+        return response.status_code, None
+
+
+class FinalQTAReview(Scenario):
+    name = 'final_qta_review'
+
+    async def send(self, client):
+        response = await client.post(
+            '/qta-review/final-qta-review',
+            data={'transcribed_text': TRANSCRIPT_TICK, 'original_document': self.payloads['text'].decode()},
+            files={'file': ('reference.docx', self.payloads['docx'],
+                            'application/vnd.openxmlformats-officedocument.wordprocessingml.document')},
+        )
+        if response.status_code != 200:
+            return response.status_code, f'http_{response.status_code}'
+        return response.status_code, None
+
+
+class OCRDocuments(Scenario):
+    name = 'ocr_documents'
+
+    def __init__(self, payloads, batch_size=3):
+        super().__init__(payloads)
+        self.batch_size = batch_size
+
+    async def send(self, client):
+        kinds = [('txt', 'text/plain', 'text'), ('docx', 'application/octet-stream', 'docx'),
+                 ('pdf', 'application/pdf', 'pdf')]
+        files = []
+        for i in range(self.batch_size):
+            extension, content_type, key = kinds[i % len(kinds)]
+            files.append(('files', (f'document_{i}.{extension}', self.payloads[key], content_type)))
+        response = await client.post('/ocr/documents', files=files)
+        if response.status_code != 200:
+            return response.status_code, f'http_{response.status_code}'
+        # The endpoint reports per-file failures inside a 200 response
+        if any(str(text).startswith('Error:') for text in response.json().get('results', {}).values()):
+            return response.status_code, 'file_error'
+        return response.status_code, None
+
+
+SCENARIOS = {cls.name: cls for cls in (PerMinuteInitiation, FinalQTAReview, OCRDocuments)}
+
+
+def parse_mix(spec):
+    """'a=85,b=5' -> {'a': 85.0, 'b': 5.0}"""
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'. Expected one of: {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, scenario, seconds, status, error):
+        self.samples.setdefault(scenario, []).append((seconds, status, error))
+
+    def report(self, measured_seconds):
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = sorted(s[0] * 1000 for s in samples)
+            errors = {}
+            for _, _, error in samples:
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+            error_count = sum(errors.values())
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': error_count,
+                'error_rate': error_count / len(samples),
+                'errors_by_kind': errors,
+                'throughput_rps': len(samples) / measured_seconds,
+                'latency_ms': {
+                    'p50': percentile(latencies, 50),
+                    'p95': percentile(latencies, 95),
+                    'p99': percentile(latencies, 99),
+                    'mean': statistics.fmean(latencies),
+                    'max': latencies[-1],
+                },
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        total_errors = sum(e['errors'] for e in endpoints.values())
+        return {
+            'endpoints': endpoints,
+            'overall': {
+                'requests': total,
+                'errors': total_errors,
+                'error_rate': total_errors / total if total else 0.0,
+                'throughput_rps': total / measured_seconds,
+            },
+        }
+
+
+async def virtual_user(client, scenarios, weights, rng, stop_at, measure_from, recorder):
+    while time.perf_counter() < stop_at:
+        scenario = rng.choices(scenarios, weights)[0]
+        start = time.perf_counter()
+        try:
+            status, error = await scenario.send(client)
+        except httpx.TimeoutException:
+            status, error = None, 'timeout'
+        except httpx.HTTPError as e:
+            status, error = None, type(e).__name__
+        if start >= measure_from:
+            recorder.record(scenario.name, time.perf_counter() - start, status, error)
+
+
+async def generate_load(base_url, mix, concurrency, duration, warmup, seed, request_timeout, ocr_batch_size):
+    payloads = {
+        'text': fixtures.text_bytes(),
+        'docx': fixtures.docx_bytes(),
+        'pdf': fixtures.pdf_bytes(),
+    }
+    scenarios = [
+        OCRDocuments(payloads, ocr_batch_size) if name == OCRDocuments.name else SCENARIOS[name](payloads)
+        for name in mix
+    ]
+    weights = list(mix.values())
+    recorder = Recorder()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=request_timeout, limits=limits) as client:
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+        await asyncio.gather(*(
+            virtual_user(client, scenarios, weights, random.Random(f'{seed}-{i}'), stop_at, measure_from, recorder)
+            for i in range(concurrency)
+        ))
+        # Requests in flight at stop_at finish late; measure over the real window
+        measured_seconds = max(time.perf_counter() - measure_from, 1e-9)
+    return recorder.report(measured_seconds), measured_seconds
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    standin = None
+    base_url = args.server_url
+    with contextlib.ExitStack() as stack:
+        if base_url is None:
+            standin = stack.enter_context(StandInServer(config=config_from_args(args)))
+            base_url = stack.enter_context(running_server(standin.app_env(), workers=args.server_workers))
+
+        report, measured_seconds = asyncio.run(generate_load(
+            base_url, mix, args.concurrency, args.duration, args.warmup,
+            args.seed, args.request_timeout, args.ocr_batch_size
+        ))
+        standin_stats = standin.stats.snapshot() if standin is not None else None
+
+    report.update({
+        'schema_version': SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'base_url': base_url,
+            'concurrency': args.concurrency,
+            'duration_seconds': args.duration,
+            'measured_seconds': measured_seconds,
+            'warmup_seconds': args.warmup,
+            'mix': mix,
+            'server_workers': args.server_workers if args.server_url is None else None,
+            'ocr_batch_size': args.ocr_batch_size,
+            'seed': args.seed,
+        },
+    })
+    if standin is not None:
+        report['config']['standin'] = {name: repr(dist) for name, dist in standin.httpd.config.latency.items()}
+        report['config']['standin'].update(rate_limit_rate=args.rate_limit_rate, timeout_rate=args.timeout_rate)
+        report['standin_requests'] = standin_stats
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60.0, help='Measured seconds of load')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds of unrecorded load first')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Scenario weights')
+    parser.add_argument('--ocr-batch-size', type=int, default=3)
+    parser.add_argument('--request-timeout', type=float, default=120.0)
+    parser.add_argument('--server-url', help='Target an already running API instead of starting one')
+    parser.add_argument('--server-workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+    if args.seed is None:
+        args.seed = 1
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
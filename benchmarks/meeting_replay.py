@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Meeting Replay Benchmark
+Replays a timestamped meeting transcript against the per-minute endpoints at
+the real 10-second cadence, the way the meeting UI calls them:
+
+  per_minute_initiation        /initiation/per_minute_initiation
+  per_minute_investigation     /investigation/per_minute_investigation
+  per_minute_qta_review        /qta-review/per-minute-qta-review
+  per_minute_qta_revision      /qta-revision/per-minute-qta-revision
+
+Every tick sends the cumulative transcript so far plus the previous tick's
+results (the "existing_*" fields) to all four endpoints concurrently, and
+records latency, prompt tokens and output tokens per endpoint. The report
+contains every tick and a latency-versus-meeting-minute curve.
+
+Transcript formats:
+  .json / .jsonl   [{"start": 12.5, "speaker": "John", "text": "..."}]  ("start" may be "mm:ss")
+  text             one utterance per line: "[00:01:23] John: ..." or "00:01:23 ..."
+Without --transcript a synthetic meeting of --minutes length is generated.
+
+Token counts come from the bundled stand-in (tiktoken if installed, else an
+estimate); they are null when replaying against --server-url.
+
+Usage:
+    python -m benchmarks.meeting_replay [--transcript meeting.jsonl | --minutes 30]
+        [--speed 1] [--cadence 10] [--chat-latency lognormal:0.8,0.4]
+        [--output replay.json] [--csv curve.csv]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import platform
+import re
+import statistics
+import time
+
+import httpx
+
+from benchmarks.standins import StandInServer, add_standin_arguments, config_from_args
+from benchmarks.startup import running_server
+
+SCHEMA_VERSION = 1
+
+# endpoint name -> (path, response model the stand-in answers with)
+ENDPOINTS = {
+    'per_minute_initiation': ('/initiation/per_minute_initiation', 'PerMinuteInitiationResponse'),
+    'per_minute_investigation': ('/investigation/per_minute_investigation', 'InvestigationResponse'),
+    'per_minute_qta_review': ('/qta-review/per-minute-qta-review', 'per_minute_qta_review_response'),
+    'per_minute_qta_revision': ('/qta-revision/per-minute-qta-revision', 'per_minute_qta_revision_response'),
+}
+
+SYNTHETIC_SPEAKERS = ['John (QA)', 'Maria (Production)', 'Ahmed (Engineering)', 'Lena (Regulatory)']
+SYNTHETIC_LINES = [
+    "Filling of batch {n} stopped for twenty minutes after the stopper feeder jammed.",
+    "We segregated the affected vials and tagged them as quarantined.",
+    "The environmental monitoring for the filling room was within limits during the stop.",
+    "The operator followed SOP-114 but the line clearance record was signed late.",
+    "Section {n} of the quality agreement requires supplier notification within 24 hours.",
+    "I suggest a fishbone analysis; the machine and method branches look most likely.",
+    "Retraining on the feeder adjustment procedure should be part of the CAPA.",
+    "Please update clause {n} so that change notifications include the validation impact.",
+]
+
+
+# ---------------------------------------------------------------------------
+# Transcript loading
+# ---------------------------------------------------------------------------
+
+TIMESTAMP_LINE = re.compile(r'^\[?(?P<ts>\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?)\]?\s*(?P<rest>.*)$')
+
+
+def parse_timestamp(value):
+    """'hh:mm:ss', 'mm:ss' or seconds -> seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for part in str(value).split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def load_transcript(path):
+    """Return a time-ordered list of {'start', 'speaker', 'text'}"""
+    with open(path, encoding='utf-8') as f:
+        raw = f.read()
+
+    segments = []
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.json', '.jsonl'):
+        items = json.loads(raw) if extension == '.json' else [json.loads(l) for l in raw.splitlines() if l.strip()]
+        for item in items:
+            start = item.get('start', item.get('timestamp', item.get('t', 0)))
+            segments.append({'start': parse_timestamp(start), 'speaker': item.get('speaker'),
+                             'text': item['text']})
+    else:
+        for line in raw.splitlines():
+            match = TIMESTAMP_LINE.match(line.strip())
+            if not match:
+                continue
+            speaker, _, text = match.group('rest').partition(': ')
+            if not text:
+                speaker, text = None, match.group('rest')
+            segments.append({'start': parse_timestamp(match.group('ts')), 'speaker': speaker, 'text': text})
+    return sorted(segments, key=lambda s: s['start'])
+
+
+def synthetic_transcript(minutes, seconds_per_utterance=5.0):
+    """A deterministic meeting with one utterance every few seconds"""
+    segments = []
+    count = int(minutes * 60 / seconds_per_utterance)
+    for i in range(count):
+        line = SYNTHETIC_LINES[i % len(SYNTHETIC_LINES)].format(n=40 + i % 7)
+        segments.append({'start': i * seconds_per_utterance,
+                         'speaker': SYNTHETIC_SPEAKERS[i % len(SYNTHETIC_SPEAKERS)], 'text': line})
+    return segments
+
+
+def transcript_until(segments, seconds):
+    return "\n".join(
+        f"{s['speaker']}: {s['text']}" if s['speaker'] else s['text']
+        for s in segments if s['start'] <= seconds
+    )
+
+
+# ---------------------------------------------------------------------------
+# Per-endpoint request bodies (carry the previous tick's results forward)
+# ---------------------------------------------------------------------------
+
+def build_payload(endpoint, transcript, previous):
+    previous = previous or {}
+    if endpoint == 'per_minute_initiation':
+        return {
+            'transcribed_text': transcript,
+            'existing_incident_title': previous.get('incident_title'),
+            'existing_background_details': previous.get('background_details'),
+            'existing_background_attendee': previous.get('background_attendee'),
+            'existing_impact_assessment': previous.get('impact_assessment'),
+            'existing_criticality': previous.get('criticality'),
+        }
+    if endpoint == 'per_minute_investigation':
+        return {
+            'transcript': transcript,
+            'existing_background': previous.get('background'),
+            'existing_discussion': previous.get('discussion'),
+            'existing_root_cause_analysis': previous.get('root_cause_analysis'),
+            'existing_final_assessment': previous.get('final_assessment'),
+            'existing_historic_review': previous.get('historic_review'),
+            'existing_capa': previous.get('capa'),
+        }
+    if endpoint == 'per_minute_qta_review':
+        return {
+            'transcribed_text': transcript,
+            'quality_review': previous.get('quality_review'),
+            'change_summary': previous.get('change_summary'),
+            'review_summary': previous.get('review_summary'),
+        }
+    return {
+        'transcribed_text': transcript,
+        'changed_details': previous.get('changed_details'),
+        'action_summary': previous.get('action_summary'),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+async def call_endpoint(client, endpoint, payload):
+    path = ENDPOINTS[endpoint][0]
+    start = time.perf_counter()
+    try:
+        response = await client.post(path, json=payload)
+        status = response.status_code
+        body = response.json() if status == 200 else None
+        error = None if status == 200 else f'http_{status}'
+    except httpx.HTTPError as e:
+        status, body, error = None, None, type(e).__name__
+    return {'latency_ms': (time.perf_counter() - start) * 1000, 'status': status, 'error': error}, body
+
+
+def attribute_usage(records):
+    """Sum stand-in usage records per endpoint via the response model each one answered with"""
+    by_model = {model: endpoint for endpoint, (_, model) in ENDPOINTS.items()}
+    usage = {}
+    for record in records:
+        endpoint = by_model.get(record['response_model'])
+        if endpoint is None:
+            continue
+        totals = usage.setdefault(endpoint, {'prompt_tokens': 0, 'completion_tokens': 0})
+        totals['prompt_tokens'] += record['prompt_tokens']
+        totals['completion_tokens'] += record['completion_tokens']
+    return usage
+
+
+async def replay(base_url, segments, cadence, speed, endpoints, standin=None, request_timeout=120.0):
+    duration = segments[-1]['start'] if segments else 0.0
+    tick_count = int(duration // cadence) + 1
+    previous = {}
+    ticks = []
+    usage_index = standin.stats.usage_since()[1] if standin else 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=request_timeout) as client:
+        started = time.perf_counter()
+        for tick in range(tick_count):
+            meeting_seconds = (tick + 1) * cadence
+            # Wait for the tick's wall-clock slot; late ticks fire immediately
+            delay = started + tick * cadence / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            fired_late_ms = max(0.0, -delay * 1000)
+
+            transcript = transcript_until(segments, meeting_seconds)
+            results = await asyncio.gather(*(
+                call_endpoint(client, endpoint, build_payload(endpoint, transcript, previous.get(endpoint)))
+                for endpoint in endpoints
+            ))
+
+            usage = {}
+            if standin is not None:
+                records, usage_index = standin.stats.usage_since(usage_index)
+                usage = attribute_usage(records)
+
+            tick_record = {
+                'tick': tick,
+                'meeting_seconds': meeting_seconds,
+                'transcript_chars': len(transcript),
+                'fired_late_ms': fired_late_ms,
+                'endpoints': {},
+            }
+            for endpoint, (sample, body) in zip(endpoints, results):
+                if body is not None:
+                    previous[endpoint] = body
+                sample.update(usage.get(endpoint, {'prompt_tokens': None, 'completion_tokens': None}))
+                tick_record['endpoints'][endpoint] = sample
+            ticks.append(tick_record)
+    return ticks
+
+
+def latency_curve(ticks, endpoints):
+    """Per meeting minute and endpoint: median/max latency and mean token counts"""
+    minutes = {}
+    for tick in ticks:
+        minute = int((tick['meeting_seconds'] - 1e-9) // 60) + 1
+        for endpoint, sample in tick['endpoints'].items():
+            minutes.setdefault(minute, {}).setdefault(endpoint, []).append(sample)
+
+    def mean_or_none(values):
+        values = [v for v in values if v is not None]
+        return statistics.fmean(values) if values else None
+
+    curve = []
+    for minute in sorted(minutes):
+        row = {'minute': minute}
+        for endpoint in endpoints:
+            samples = minutes[minute].get(endpoint, [])
+            latencies = [s['latency_ms'] for s in samples]
+            row[endpoint] = {
+                'latency_ms_median': statistics.median(latencies) if latencies else None,
+                'latency_ms_max': max(latencies) if latencies else None,
+                'prompt_tokens_mean': mean_or_none(s['prompt_tokens'] for s in samples),
+                'completion_tokens_mean': mean_or_none(s['completion_tokens'] for s in samples),
+                'errors': sum(1 for s in samples if s['error']),
+            }
+        curve.append(row)
+    return curve
+
+
+def write_curve_csv(path, curve, endpoints):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['minute', 'endpoint', 'latency_ms_median', 'latency_ms_max',
+                         'prompt_tokens_mean', 'completion_tokens_mean', 'errors'])
+        for row in curve:
+            for endpoint in endpoints:
+                point = row[endpoint]
+                writer.writerow([row['minute'], endpoint, point['latency_ms_median'], point['latency_ms_max'],
+                                 point['prompt_tokens_mean'], point['completion_tokens_mean'], point['errors']])
+
+
+def run(args):
+    segments = load_transcript(args.transcript) if args.transcript else synthetic_transcript(args.minutes)
+    if not segments:
+        raise ValueError('Transcript contains no timestamped utterances')
+    endpoints = args.endpoints.split(',') if args.endpoints else list(ENDPOINTS)
+    for endpoint in endpoints:
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{endpoint}'. Expected one of: {', '.join(ENDPOINTS)}")
+
+    standin = None
+    base_url = args.server_url
+    with contextlib.ExitStack() as stack:
+        if base_url is None:
+            standin = stack.enter_context(StandInServer(config=config_from_args(args)))
+            base_url = stack.enter_context(running_server(standin.app_env()))
+        ticks = asyncio.run(replay(base_url, segments, args.cadence, args.speed, endpoints,
+                                   standin, args.request_timeout))
+
+    curve = latency_curve(ticks, endpoints)
+    if args.csv:
+        write_curve_csv(args.csv, curve, endpoints)
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'base_url': base_url,
+            'transcript': args.transcript or f'synthetic:{args.minutes}min',
+            'utterances': len(segments),
+            'cadence_seconds': args.cadence,
+            'speed': args.speed,
+            'endpoints': endpoints,
+        },
+        'curve': curve,
+        'ticks': ticks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transcript', help='Timestamped transcript (.json, .jsonl or text)')
+    parser.add_argument('--minutes', type=float, default=10.0, help='Length of the synthetic meeting')
+    parser.add_argument('--cadence', type=float, default=10.0, help='Seconds of meeting time per tick')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed-up (1 = real time)')
+    parser.add_argument('--endpoints', help='Comma-separated subset of endpoints')
+    parser.add_argument('--request-timeout', type=float, default=120.0)
+    parser.add_argument('--server-url', help='Target an already running API instead of starting one')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--csv', help='Write the latency-vs-minute curve as CSV')
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+File Processing Micro-benchmarks
+Times the document plumbing that runs before any OCR call, in isolation:
+
+  FileProcessor   get_file_info, split_pdf_by_pages, split_pdf_by_size, split_image_by_size
+  FileConverter   every *_to_pdf conversion (called directly, so the conversion cache is bypassed)
+
+Inputs are generated by benchmarks/fixtures.py: PDFs of varying density
+(sparse text, dense text, scanned raster pages), large images, DOCX with
+paragraphs and tables, XLSX with many sheets and rows, large CSVs and PPTX.
+
+Every case runs warmup rounds, then timed rounds, then one extra round under
+tracemalloc for peak Python heap usage. tracemalloc does not see memory
+allocated inside C libraries (PyMuPDF, Pillow), so peak_kb is a lower bound
+for those cases.
+
+Baselines:
+    --save-baseline              write results to benchmarks/baselines/micro.json
+    --compare                    compare medians against that baseline and exit
+                                 non-zero if any case is slower than --max-regression
+
+Usage:
+    python -m benchmarks.micro [--size small|medium|large] [--rounds 5] [--filter split_pdf]
+        [--output micro.json] [--save-baseline [PATH]] [--compare [PATH]] [--max-regression 0.25]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import fixtures
+
+SCHEMA_VERSION = 1
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'micro.json')
+
+# Fixture dimensions per size profile
+SIZES = {
+    'small': {
+        'pdf_pages': 10, 'scanned_pages': 4, 'image': (1200, 900),
+        'docx_paragraphs': 100, 'docx_tables': 2,
+        'xlsx_sheets': 2, 'xlsx_rows': 300, 'csv_rows': 2000,
+        'txt_paragraphs': 100, 'pptx_slides': 10,
+    },
+    'medium': {
+        'pdf_pages': 40, 'scanned_pages': 12, 'image': (3000, 2000),
+        'docx_paragraphs': 400, 'docx_tables': 8,
+        'xlsx_sheets': 5, 'xlsx_rows': 1500, 'csv_rows': 10000,
+        'txt_paragraphs': 500, 'pptx_slides': 30,
+    },
+    'large': {
+        'pdf_pages': 120, 'scanned_pages': 30, 'image': (6000, 4000),
+        'docx_paragraphs': 1500, 'docx_tables': 20,
+        'xlsx_sheets': 10, 'xlsx_rows': 5000, 'csv_rows': 50000,
+        'txt_paragraphs': 2000, 'pptx_slides': 100,
+    },
+}
+
+# Converters with no fixture we can generate here
+SKIPPED_CONVERTERS = {
+    'convert.doc': 'legacy .doc files cannot be generated without Microsoft Word',
+    'convert.xls': 'legacy .xls files need xlwt, which is not a project dependency',
+    'convert.ppt': 'FileConverter.ppt_to_pdf is not implemented',
+}
+
+
+# ---------------------------------------------------------------------------
+# Fixtures and cases
+# ---------------------------------------------------------------------------
+
+def build_fixtures(directory, size):
+    """Generate every input file once and return {key: path}"""
+    dims = SIZES[size]
+    width, height = dims['image']
+    generated = {
+        'sparse.pdf': lambda: fixtures.pdf_bytes(dims['pdf_pages'], density='sparse'),
+        'dense.pdf': lambda: fixtures.pdf_bytes(dims['pdf_pages'], density='dense'),
+        'scanned.pdf': lambda: fixtures.pdf_bytes(dims['scanned_pages'], density='scanned'),
+        'large.png': lambda: fixtures.image_bytes(width, height, 'PNG'),
+        'large.jpg': lambda: fixtures.image_bytes(width, height, 'JPEG'),
+        'report.docx': lambda: fixtures.docx_bytes(dims['docx_paragraphs'], tables=dims['docx_tables']),
+        'workbook.xlsx': lambda: fixtures.xlsx_bytes(dims['xlsx_sheets'], dims['xlsx_rows']),
+        'table.csv': lambda: fixtures.csv_bytes(dims['csv_rows']),
+        'notes.txt': lambda: fixtures.text_bytes(dims['txt_paragraphs']),
+        'deck.pptx': lambda: fixtures.pptx_bytes(dims['pptx_slides']),
+    }
+    return {name: fixtures.write_fixture(directory, name, build()) for name, build in generated.items()}
+
+
+class Case:
+    """One benchmarked call: func(input_path, out_dir) with a fresh out_dir per round"""
+
+    def __init__(self, name, func, input_path):
+        self.name = name
+        self.func = func
+        self.input_path = input_path
+
+    def call(self):
+        """Run once; returns elapsed seconds (output cleanup is not timed)"""
+        out_dir = tempfile.mkdtemp(prefix='micro_')
+        try:
+            start = time.perf_counter()
+            self.func(self.input_path, out_dir)
+            return time.perf_counter() - start
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def peak_kb(self):
+        """Peak traced Python allocations during one call, in KB"""
+        gc.collect()
+        tracemalloc.start()
+        try:
+            self.call()
+            return tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+
+def build_cases(paths):
+    # FileProcessor/FileConverter log through structlog; below WARNING their
+    # events are dropped before formatting, so logging stays out of the timings
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from app.services.utils.convert_file import FileConverter
+    from app.services.utils.process_file import FileProcessor
+
+    processor = FileProcessor()
+    converter = FileConverter()
+
+    def quarter_of(path):
+        return max(1, os.path.getsize(path) // 4)
+
+    cases = []
+    for density in ('sparse', 'dense', 'scanned'):
+        pdf = paths[f'{density}.pdf']
+        cases.append(Case(f'get_file_info.pdf_{density}',
+                          lambda p, _: processor.get_file_info(p), pdf))
+        cases.append(Case(f'split_pdf_by_pages.{density}',
+                          lambda p, out: processor.split_pdf_by_pages(p, processor.max_pages, out), pdf))
+        # Target a quarter of the file so every PDF splits into several chunks
+        cases.append(Case(f'split_pdf_by_size.{density}',
+                          lambda p, out: processor.split_pdf_by_size(p, quarter_of(p), out), pdf))
+    for extension in ('png', 'jpg'):
+        image = paths[f'large.{extension}']
+        cases.append(Case(f'get_file_info.{extension}', lambda p, _: processor.get_file_info(p), image))
+        cases.append(Case(f'split_image_by_size.{extension}',
+                          lambda p, out: processor.split_image_by_size(p, quarter_of(p), out), image))
+
+    conversions = {
+        'docx': (converter.docx_to_pdf, 'report.docx'),
+        'xlsx': (converter.xlsx_to_pdf, 'workbook.xlsx'),
+        'csv': (converter.csv_to_pdf, 'table.csv'),
+        'txt': (converter.txt_to_pdf, 'notes.txt'),
+        'pptx': (converter.pptx_to_pdf, 'deck.pptx'),
+    }
+    for extension, (method, fixture) in conversions.items():
+        cases.append(Case(f'convert.{extension}',
+                          lambda p, out, method=method: method(p, os.path.join(out, 'converted.pdf')),
+                          paths[fixture]))
+    return cases
+
+
+# ---------------------------------------------------------------------------
+# Running and comparing
+# ---------------------------------------------------------------------------
+
+def measure(case, rounds, warmup):
+    for _ in range(warmup):
+        case.call()
+    timings = []
+    for _ in range(rounds):
+        gc.collect()
+        timings.append(case.call())
+    ms = [t * 1000 for t in timings]
+    return {
+        'input_kb': os.path.getsize(case.input_path) / 1024,
+        'rounds': rounds,
+        'min_ms': min(ms),
+        'max_ms': max(ms),
+        'mean_ms': statistics.fmean(ms),
+        'median_ms': statistics.median(ms),
+        'stddev_ms': statistics.stdev(ms) if len(ms) > 1 else 0.0,
+        'peak_kb': case.peak_kb(),
+    }
+
+
+def run(size='medium', rounds=5, warmup=1, name_filter=None):
+    work_dir = tempfile.mkdtemp(prefix='micro_fixtures_')
+    try:
+        started = time.perf_counter()
+        paths = build_fixtures(work_dir, size)
+        fixture_seconds = time.perf_counter() - started
+
+        results = {}
+        for case in build_cases(paths):
+            if name_filter and name_filter not in case.name:
+                continue
+            print(f"micro: {case.name}", file=sys.stderr)
+            results[case.name] = measure(case, rounds, warmup)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size': size,
+        'fixture_seconds': fixture_seconds,
+        'cases': results,
+        'skipped': {name: reason for name, reason in SKIPPED_CONVERTERS.items()
+                    if not name_filter or name_filter in name},
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Median-vs-baseline ratio per case; regressions are ratios above 1 + max_regression"""
+    if baseline.get('size') != results['size']:
+        raise ValueError(f"Baseline was recorded with --size {baseline.get('size')}, not {results['size']}")
+    comparison = {}
+    regressions = []
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if previous is None:
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else None
+        comparison[name] = {
+            'baseline_median_ms': previous['median_ms'],
+            'median_ms': current['median_ms'],
+            'ratio': ratio,
+            'baseline_peak_kb': previous.get('peak_kb'),
+            'peak_kb': current['peak_kb'],
+        }
+        if ratio is not None and ratio > 1 + max_regression:
+            regressions.append(name)
+    return comparison, regressions
+
+
+def write_json(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(json.dumps(data, indent=2) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=sorted(SIZES), default='medium', help='Fixture size profile')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed rounds per case')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed rounds per case')
+    parser.add_argument('--filter', help='Only run cases whose name contains this string')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help='Store results as the baseline')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help='Compare against a stored baseline')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='Allowed median slowdown before --compare fails (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = run(args.size, args.rounds, args.warmup, args.filter)
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        results['comparison'], regressions = compare(results, baseline, args.max_regression)
+        results['regressions'] = regressions
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        write_json(args.output, results)
+    if args.save_baseline:
+        write_json(args.save_baseline, {k: v for k, v in results.items() if k not in ('comparison', 'regressions')})
+    if regressions:
+        print(f"micro: {len(regressions)} case(s) regressed more than {args.max_regression:.0%}: "
+              f"{', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
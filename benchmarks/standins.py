@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Local Stand-in Server
+A small HTTP server that answers the upstream calls the API makes, so
+benchmarks and load tests can exercise real request paths without network
+access or quota:
+
+  POST /v1/chat/completions        canned JSON valid for the requested response model (built from
+                                   a json_schema response_format, else guessed from the prompt;
+                                   streamed as SSE chunks when stream=true)
+  POST /v1/audio/transcriptions    fixed transcript (response_format=text)
+  POST /v1/{processor}:process     Document AI (REST transport) with fixed OCR text
+  GET  /stats                      request / injected-error counters per route
+  GET  /usage?since=N              token usage of chat completions from index N on
+
+Latency is drawn per request from a configurable distribution, and a share of
+requests can be answered with 429s or left hanging to simulate timeouts.
+
+Point the app at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+    DOCUMENTAI_API_ENDPOINT=http://127.0.0.1:<port> DOCUMENTAI_TRANSPORT=rest
+
+Usage:
+    python -m benchmarks.standins [--port 9100] [--chat-latency lognormal:0.8,0.4]
+                                  [--rate-limit-rate 0.05] [--timeout-rate 0.01] [--seed 1]
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import typing
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from pydantic import BaseModel
+
+from app.services.deviation.initiation.initiation_schema import (
+    PerMinuteInitiationResponse,
+    IncidentReportSections,
+)
+from app.services.deviation.investigation.investigation_schema import (
+    InvestigationResponse,
+    FinalInvestigationReportResponse,
+)
+from app.services.deviation.quality_review.quality_review_schema import (
+    PerMinuteResponse,
+    FinalQualityReviewResponse,
+)
+from app.services.QTA.QTA_review.qta_review_schema import (
+    per_minute_qta_review_response,
+    final_qta_review_response,
+    final_qta_review_patch,
+    final_qta_review_summary,
+)
+from app.services.QTA.QTA_revision.QTA_revision_schema import (
+    per_minute_qta_revision_response,
+    final_qta_revision_response,
+    final_qta_revision_patch,
+    final_qta_revision_summary,
+)
+from app.services.utils.document_sections import RevisedSection
+
+# Response models the stand-in can answer with when the request carries no
+# json_schema response_format. The model whose field names (including nested
+# ones) best match the prompt is chosen; prompts matching none of them get a
+# line-oriented or plain-text answer.
+RESPONSE_MODELS = [
+    PerMinuteInitiationResponse,
+    IncidentReportSections,
+    InvestigationResponse,
+    FinalInvestigationReportResponse,
+    PerMinuteResponse,
+    FinalQualityReviewResponse,
+    per_minute_qta_review_response,
+    final_qta_review_response,
+    per_minute_qta_revision_response,
+    final_qta_revision_response,
+    final_qta_revision_patch,
+    final_qta_review_patch,
+    final_qta_revision_summary,
+    final_qta_review_summary,
+    RevisedSection,
+]
+
+PLAIN_TEXT_ANSWER = "Stand-in analysis: no issues found."
+
+# Line-oriented prompts ("INCIDENT_TITLE: [...]") are answered line by line
+LINE_FIELD_PATTERN = re.compile(r'^\s*([A-Z][A-Z_]+):\s*\[', re.MULTILINE)
+TRANSCRIPT_TEXT = (
+    "John from QA reported that filling of batch 42 stopped for twenty minutes. "
+    "The affected vials were segregated and production notified."
+)
+# Paragraph anchors of documents sent for patch-style revision
+ANCHOR_PATTERN = re.compile(r'^\s*\[(P\d+)\] ', re.MULTILINE)
+OCR_TEXT = "Stand-in OCR text.\nBatch 42 was released after the deviation was closed."
+# Streamed completions are cut into pieces of roughly a few tokens
+STREAM_CHUNK_CHARS = 16
+
+
+# ---------------------------------------------------------------------------
+# Canned responses
+# ---------------------------------------------------------------------------
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+    TOKEN_COUNTER = 'tiktoken'
+except Exception:  # optional dependency (or encoding unavailable offline)
+    _encoding = None
+    TOKEN_COUNTER = 'chars/4'
+
+
+def count_tokens(text):
+    """Token count with tiktoken when installed, else the usual ~4 chars/token estimate"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def example_value(annotation):
+    """Build a schema-valid placeholder value for a type annotation"""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Literal:
+        return next((a for a in args if a != ""), args[0])
+    if origin is typing.Union:
+        return example_value(next(a for a in args if a is not type(None)))
+    if origin in (list, typing.List):
+        return [example_value(args[0])] if args else []
+    if origin in (dict, typing.Dict):
+        return {"item": "stand-in"} if args and args[1] is typing.Any else {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return example_instance(annotation)
+    if annotation is bool:
+        return False
+    if annotation is int:
+        return 1
+    if annotation is float:
+        return 1.0
+    if annotation is str:
+        return "stand-in"
+    return None
+
+
+def example_instance(model):
+    """A dict that validates against `model`"""
+    return {name: example_value(field.annotation) for name, field in model.model_fields.items()}
+
+
+def _field_names(model, nested=True):
+    names = set()
+    for name, field in model.model_fields.items():
+        names.add(name)
+        annotation = field.annotation
+        if nested and isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            names |= _field_names(annotation)
+    return names
+
+
+def pick_model(prompt):
+    """
+    Choose the response model whose quoted field names best match the prompt.
+    Ties go to a model named in the prompt, then to the one with more nested
+    field names mentioned. Returns None when no model field appears at all.
+    """
+    def score(model):
+        top_level = _field_names(model, nested=False)
+        matched = sum(1 for name in top_level if f'"{name}"' in prompt or f"'{name}'" in prompt)
+        named = model.__name__ in prompt
+        nested_matched = sum(1 for name in _field_names(model) if name in prompt)
+        return matched / len(top_level), named, nested_matched
+
+    best = max(RESPONSE_MODELS, key=score)
+    return best if score(best)[0] > 0 else None
+
+
+def schema_example(schema, root=None):
+    """A placeholder value matching a (pydantic-generated) JSON schema"""
+    root = root or schema
+    if '$ref' in schema:
+        return schema_example(root['$defs'][schema['$ref'].rsplit('/', 1)[-1]], root)
+    if 'enum' in schema:
+        return next((value for value in schema['enum'] if value != ""), schema['enum'][0])
+    if 'anyOf' in schema:
+        return schema_example(next(s for s in schema['anyOf'] if s.get('type') != 'null'), root)
+    kind = schema.get('type')
+    if kind == 'object':
+        if 'properties' not in schema:
+            return {"item": "stand-in"}
+        return {name: schema_example(prop, root) for name, prop in schema['properties'].items()}
+    if kind == 'array':
+        return [schema_example(schema['items'], root)] if 'items' in schema else []
+    return {'string': "stand-in", 'integer': 1, 'number': 1.0, 'boolean': False}.get(kind)
+
+
+def requested_schema(body):
+    """(name, schema) of a json_schema response_format, or None"""
+    response_format = body.get('response_format') or {}
+    if response_format.get('type') != 'json_schema':
+        return None
+    json_schema = response_format.get('json_schema', {})
+    return json_schema.get('name'), json_schema.get('schema', {})
+
+
+def with_prompt_anchors(value, prompt):
+    """Point placeholder document edits at the first paragraph anchor ([P1]) of the prompt, if any"""
+    anchor = ANCHOR_PATTERN.search(prompt)
+    if anchor and isinstance(value, dict) and isinstance(value.get('edits'), list):
+        value['edits'] = [{**edit, 'anchor': anchor.group(1)} for edit in value['edits'] if isinstance(edit, dict)]
+    return value
+
+
+def chat_completion(body, stats=None):
+    """OpenAI-shaped chat completion carrying canned JSON for the prompt"""
+    prompt = "\n".join(str(m.get('content', '')) for m in body.get('messages', []))
+    requested = requested_schema(body)
+    model = None if requested else pick_model(prompt)
+    line_fields = LINE_FIELD_PATTERN.findall(prompt)
+    if requested:
+        model_name = requested[0]
+        content = json.dumps(with_prompt_anchors(schema_example(requested[1]), prompt))
+    elif model:
+        model_name = model.__name__
+        content = json.dumps(with_prompt_anchors(example_instance(model), prompt))
+    elif line_fields:
+        model_name = None
+        content = "\n".join(f"{name}: stand-in" for name in dict.fromkeys(line_fields))
+    else:
+        model_name = None
+        content = PLAIN_TEXT_ANSWER
+    prompt_tokens = count_tokens(prompt)
+    completion_tokens = count_tokens(content)
+    if stats is not None:
+        stats.record_usage(model_name, prompt_tokens, completion_tokens)
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'gpt-4o'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chat_completion_chunks(completion, include_usage=False, chunk_chars=STREAM_CHUNK_CHARS):
+    """Split a chat completion into OpenAI-shaped chat.completion.chunk events"""
+    content = completion['choices'][0]['message']['content']
+    base = {'id': completion['id'], 'object': 'chat.completion.chunk',
+            'created': completion['created'], 'model': completion['model']}
+    for start in range(0, len(content), chunk_chars):
+        delta = {'content': content[start:start + chunk_chars]}
+        if start == 0:
+            delta['role'] = 'assistant'
+        yield {**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]}
+    yield {**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+    if include_usage:
+        yield {**base, 'choices': [], 'usage': completion['usage']}
+
+
+# ---------------------------------------------------------------------------
+# Latency and error injection
+# ---------------------------------------------------------------------------
+
+class LatencyDistribution:
+    """
+    Per-request latency in seconds, parsed from a spec string:
+      fixed:0.2 (or just 0.2) | uniform:low,high | normal:mean,stddev
+      lognormal:median,sigma | exponential:mean
+    """
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, kind='fixed', params=(0.0,)):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}'. Expected one of: {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+
+    @classmethod
+    def parse(cls, spec):
+        spec = (spec or '0').strip()
+        if ':' not in spec:
+            return cls('fixed', (spec,))
+        kind, _, params = spec.partition(':')
+        return cls(kind.strip(), [p for p in params.split(',') if p.strip()])
+
+    def sample(self, rng):
+        p = self.params
+        if self.kind == 'fixed':
+            value = p[0]
+        elif self.kind == 'uniform':
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == 'lognormal':
+            value = rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        else:
+            value = rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class StandInConfig:
+    def __init__(self, chat_latency='0', transcription_latency='0', ocr_latency='0',
+                 rate_limit_rate=0.0, timeout_rate=0.0, timeout_seconds=120.0,
+                 retry_after_seconds=1, stream_chunk_seconds=0.0, seed=None):
+        """Latency specs per upstream plus the share of requests that fail"""
+        self.latency = {
+            'chat': LatencyDistribution.parse(chat_latency),
+            'transcription': LatencyDistribution.parse(transcription_latency),
+            'ocr': LatencyDistribution.parse(ocr_latency),
+        }
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.stream_chunk_seconds = stream_chunk_seconds  # delay between streamed chat chunks
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def draw(self, route):
+        """Decide the fate of one request: ('ok' | 'rate_limit' | 'timeout', delay_seconds)"""
+        with self._rng_lock:
+            roll = self._rng.random()
+            delay = self.latency[route].sample(self._rng)
+        if roll < self.rate_limit_rate:
+            return 'rate_limit', 0.0
+        if roll < self.rate_limit_rate + self.timeout_rate:
+            return 'timeout', self.timeout_seconds
+        return 'ok', delay
+
+
+class StandInStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._usage = []
+
+    def record(self, route, outcome):
+        with self._lock:
+            per_route = self._counts.setdefault(route, {})
+            per_route[outcome] = per_route.get(outcome, 0) + 1
+
+    def record_usage(self, response_model, prompt_tokens, completion_tokens):
+        with self._lock:
+            self._usage.append({
+                'response_model': response_model,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+            })
+
+    def usage_since(self, index=0):
+        """Usage records from position `index` on, plus the next index to ask for"""
+        with self._lock:
+            return self._usage[index:], len(self._usage)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: dict(counts) for route, counts in self._counts.items()}
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, data, content_type, status=200, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, payload, status=200, headers=None):
+        self._send(json.dumps(payload).encode(), 'application/json', status, headers)
+
+    def _send_event_stream(self, events, delay=0.0):
+        """Write events as SSE and close the connection (no Content-Length)"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_rate_limited(self, route):
+        retry_after = str(self.server.config.retry_after_seconds)
+        if route == 'ocr':
+            payload = {'error': {'code': 429, 'message': 'Quota exceeded (stand-in)', 'status': 'RESOURCE_EXHAUSTED'}}
+        else:
+            payload = {'error': {'message': 'Rate limit reached (stand-in)', 'type': 'requests',
+                                 'code': 'rate_limit_exceeded'}}
+        self._send_json(payload, 429, {'Retry-After': retry_after})
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json({'status': 'ok'})
+        elif self.path == '/stats':
+            self._send_json(self.server.stats.snapshot())
+        elif self.path.startswith('/usage'):
+            since = int(parse_qs(urlparse(self.path).query).get('since', ['0'])[0])
+            records, next_index = self.server.stats.usage_since(since)
+            self._send_json({'records': records, 'next': next_index, 'token_counter': TOKEN_COUNTER})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        raw = self._read_body()
+        path = self.path.split('?', 1)[0]
+        if path.endswith('/chat/completions'):
+            route = 'chat'
+        elif path.endswith('/audio/transcriptions'):
+            route = 'transcription'
+        elif path.endswith(':process'):
+            route = 'ocr'
+        else:
+            self._send_json({'error': {'message': f'Unknown path {path}'}}, 404)
+            return
+
+        outcome, delay = self.server.config.draw(route)
+        self.server.stats.record(route, outcome)
+        if outcome == 'rate_limit':
+            self._send_rate_limited(route)
+            return
+        time.sleep(delay)
+        if outcome == 'timeout':
+            # Hang up without answering; the client sees a timeout/disconnect
+            self.close_connection = True
+            return
+
+        if route == 'chat':
+            body = json.loads(raw or b'{}')
+            completion = chat_completion(body, self.server.stats)
+            if body.get('stream'):
+                include_usage = bool((body.get('stream_options') or {}).get('include_usage'))
+                self._send_event_stream(chat_completion_chunks(completion, include_usage),
+                                        self.server.config.stream_chunk_seconds)
+            else:
+                self._send_json(completion)
+        elif route == 'transcription':
+            self._send(TRANSCRIPT_TEXT.encode(), 'text/plain; charset=utf-8')
+        else:
+            self._send_json({'document': {'text': OCR_TEXT}})
+
+
+class StandInServer:
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        """Bind the server (port 0 picks a free port)"""
+        self.httpd = ThreadingHTTPServer((host, port), StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or StandInConfig()
+        self.httpd.stats = StandInStats()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    def app_env(self):
+        """Environment variables that point the API at this stand-in"""
+        return {
+            'OPENAI_BASE_URL': f"{self.url}/v1",
+            'DOCUMENTAI_API_ENDPOINT': self.url,
+            'DOCUMENTAI_TRANSPORT': 'rest',
+            'PROJECT_ID': 'stand-in',
+            'LOCATION': 'us',
+            'PROCESSOR_ID': 'stand-in',
+            'PROCESSOR_VERSION': 'stand-in',
+        }
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def add_standin_arguments(parser):
+    """Stand-in options shared by the benchmark scripts"""
+    parser.add_argument('--chat-latency', default='0', help='e.g. lognormal:0.8,0.4')
+    parser.add_argument('--transcription-latency', default='0')
+    parser.add_argument('--ocr-latency', default='0')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Share of requests left hanging')
+    parser.add_argument('--timeout-seconds', type=float, default=120.0)
+    parser.add_argument('--stream-chunk-seconds', type=float, default=0.0,
+                        help='Delay between streamed chat completion chunks')
+    parser.add_argument('--seed', type=int)
+
+
+def config_from_args(args):
+    return StandInConfig(
+        chat_latency=args.chat_latency,
+        transcription_latency=args.transcription_latency,
+        ocr_latency=args.ocr_latency,
+        rate_limit_rate=args.rate_limit_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        stream_chunk_seconds=args.stream_chunk_seconds,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, config_from_args(args))
+    print(f"Stand-in listening on {server.url}")
+    for key, value in server.app_env().items():
+        print(f"  {key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures how long a fresh API process takes to import the app and to answer
+its first request, plus the resident memory of the server once it is up.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--output startup.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import json, resource, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_seconds": elapsed,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def benchmark_env(extra_env=None):
+    """Environment for child processes: repo on the path, dummy key if none is set"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    env.setdefault('PYTHONUNBUFFERED', '1')
+    env.update(extra_env or {})
+    return env
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_rss_mb(pid):
+    """Resident set size of a process in MB (Linux /proc, psutil fallback)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def measure_import(extra_env=None):
+    """Time `import app.main` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET],
+        cwd=REPO_ROOT, env=benchmark_env(extra_env),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def wait_for_response(url, deadline, method='GET', body=None, headers=None):
+    """Poll url until it answers with 2xx; returns seconds waited or None on timeout"""
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        try:
+            request = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                if 200 <= response.status < 300:
+                    return time.perf_counter() - start
+        except Exception:
+            time.sleep(0.02)
+    return None
+
+
+def start_server(port, extra_env=None, workers=1):
+    """Launch uvicorn serving app.main:app in a subprocess"""
+    command = [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1',
+               '--port', str(port), '--log-level', 'warning']
+    if workers > 1:
+        command += ['--workers', str(workers)]
+    return subprocess.Popen(
+        command,
+        cwd=REPO_ROOT, env=benchmark_env(extra_env),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+@contextlib.contextmanager
+def running_server(extra_env=None, workers=1, timeout=60.0):
+    """Start the API, wait until /health answers and yield its base URL"""
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    process = start_server(port, extra_env, workers=workers)
+    try:
+        if wait_for_response(f'{base_url}/health', time.perf_counter() + timeout) is None:
+            raise RuntimeError('Server did not answer /health in time')
+        yield base_url
+    finally:
+        stop_server(process)
+
+
+def measure_first_request(timeout=60.0, extra_env=None):
+    """Time from process launch to the first successful /health response"""
+    port = free_port()
+    launched = time.perf_counter()
+    process = start_server(port, extra_env)
+    try:
+        waited = wait_for_response(f'http://127.0.0.1:{port}/health', launched + timeout)
+        if waited is None:
+            raise RuntimeError('Server did not answer /health in time')
+        return {
+            'time_to_first_request_seconds': time.perf_counter() - launched,
+            'server_rss_mb': process_rss_mb(process.pid),
+        }
+    finally:
+        stop_server(process)
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def run(runs=5, extra_env=None):
+    imports = [measure_import(extra_env) for _ in range(runs)]
+    first = [measure_first_request(extra_env=extra_env) for _ in range(runs)]
+    return {
+        'runs': runs,
+        'import_seconds': summarize([r['import_seconds'] for r in imports]),
+        'import_max_rss_mb': summarize([r['max_rss_mb'] for r in imports]),
+        'time_to_first_request_seconds': summarize([r['time_to_first_request_seconds'] for r in first]),
+        'server_rss_mb': summarize([r['server_rss_mb'] for r in first if r['server_rss_mb'] is not None] or [0]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()